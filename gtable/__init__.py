@@ -1,9 +1,13 @@
 from .table import Table
 from .column import Column
 from .version import __version__
-from .joins import inner_join, full_outer_join
+from .joins import inner_join, full_outer_join, left_join, right_join, \
+    semi_join, anti_join
 from .lib import merge_table as _merge_table
 from .reductions import reduce_by_key
+from .readers import read_csv, iter_csv
+from .fast import set_num_threads, get_num_threads
+from .pool import set_workers, get_workers
 
 
 def merge(table_left, table_right, key):
@@ -12,10 +16,10 @@ def merge(table_left, table_right, key):
 
     :param table_left:
     :param table_right:
-    :param key:
+    :param key: Name of the column, or list of names
     :return:
     """
     t = Table()
-    t.data, t.keys, t.index = _merge_table(table_right, table_left, key)
+    t.data, t.keys, t.bitmaps = _merge_table(table_right, table_left, key)
 
     return t
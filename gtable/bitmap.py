@@ -0,0 +1,644 @@
+"""
+Bit-packed validity index. Every column of a table owns a bitmap where a
+set bit means that the row holds a value. Rows are packed 64 per machine
+word, so the kernels can process the index a word at a time, skipping runs
+of empty rows and copying runs of full rows in a single step.
+
+Bits are stored in little-endian order: row ``i`` is the bit ``i % 64`` of
+the word ``i // 64``. The padding bits of the last word are always zero.
+
+Indices made of a few contiguous blocks of rows, like the columns added
+with an alignment or stacked from chunks, are stored as runs instead. A run
+is a pair ``[start, stop)`` of rows, and the runs of a bitmap are sorted,
+disjoint and never adjacent. When there are so many runs that they take
+more memory than the words, the bitmap falls back to the packed words.
+"""
+
+import numpy as np
+from numba import jit
+
+
+WORD_BITS = 64
+# Words per block of the rank directory
+BLOCK_WORDS = 8
+EMPTY_WORD = np.uint64(0)
+FULL_WORD = np.uint64(0xFFFFFFFFFFFFFFFF)
+ONE = np.uint64(1)
+
+# Constants for the SWAR popcount
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+_S1 = np.uint64(1)
+_S2 = np.uint64(2)
+_S4 = np.uint64(4)
+_S56 = np.uint64(56)
+
+
+def n_words(length):
+    """Number of words needed to store length rows"""
+    return (length + WORD_BITS - 1) // WORD_BITS
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def popcount(word):
+    """Number of set bits of a word"""
+    word = word - ((word >> _S1) & _M1)
+    word = (word & _M2) + ((word >> _S2) & _M2)
+    word = (word + (word >> _S4)) & _M4
+    return np.int64((word * _H01) >> _S56)
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def count_words(words):
+    """Number of set bits of a bitmap"""
+    total = 0
+    for word in words:
+        if word == FULL_WORD:
+            total += WORD_BITS
+        elif word:
+            total += popcount(word)
+
+    return total
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def test_bit(words, position):
+    """True if the bit at position is set"""
+    return (words[position >> 6] >> np.uint64(position & 63)) & ONE == ONE
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def set_bit(words, position):
+    """Sets the bit at position inplace"""
+    words[position >> 6] |= ONE << np.uint64(position & 63)
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def set_range(words, start, count):
+    """Sets count bits from position start inplace, count is at most 64"""
+    offset = np.uint64(start & 63)
+    if count == WORD_BITS:
+        bits = FULL_WORD
+    else:
+        bits = (ONE << np.uint64(count)) - ONE
+
+    words[start >> 6] |= bits << offset
+    if offset and offset + np.uint64(count) > np.uint64(WORD_BITS):
+        words[(start >> 6) + 1] |= bits >> (np.uint64(WORD_BITS) - offset)
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def build_rank(words):
+    """
+    Rank directory of a bitmap: the number of set bits before each block of
+    BLOCK_WORDS words. The last element is the total number of set bits.
+    """
+    blocks = np.empty((len(words) + BLOCK_WORDS - 1) // BLOCK_WORDS + 1,
+                      dtype=np.int64)
+    total = 0
+    for w in range(len(words)):
+        if w % BLOCK_WORDS == 0:
+            blocks[w // BLOCK_WORDS] = total
+        total += popcount(words[w])
+    blocks[-1] = total
+
+    return blocks
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def rank_block(words, blocks, position):
+    """Number of set bits before position, using the rank directory"""
+    word = position >> 6
+    total = blocks[word // BLOCK_WORDS]
+    for w in range(word - word % BLOCK_WORDS, word):
+        total += popcount(words[w])
+
+    offset = position & 63
+    if offset:
+        total += popcount(words[word] & ((ONE << np.uint64(offset)) - ONE))
+
+    return total
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def rank_many(words, blocks, positions):
+    """Number of set bits before each position"""
+    result = np.empty(len(positions), dtype=np.int64)
+    for i, position in enumerate(positions):
+        result[i] = rank_block(words, blocks, position)
+
+    return result
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def select_block(words, blocks, k):
+    """Position of the k-th set bit (zero based), using the rank directory"""
+    # Last block that starts with at most k set bits before it
+    lo = 0
+    hi = len(blocks) - 2
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if blocks[mid] <= k:
+            lo = mid
+        else:
+            hi = mid - 1
+
+    total = blocks[lo]
+    for w in range(lo * BLOCK_WORDS, len(words)):
+        count = popcount(words[w])
+        if k < total + count:
+            word = words[w]
+            for b in range(WORD_BITS):
+                if (word >> np.uint64(b)) & ONE:
+                    if total == k:
+                        return w * WORD_BITS + b
+                    total += 1
+        total += count
+
+    return -1
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def select_many(words, blocks, ks):
+    """Position of each k-th set bit"""
+    result = np.empty(len(ks), dtype=np.int64)
+    for i, k in enumerate(ks):
+        result[i] = select_block(words, blocks, k)
+
+    return result
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def test_many(words, positions):
+    """True for each position whose bit is set"""
+    result = np.empty(len(positions), dtype=np.bool_)
+    for i, position in enumerate(positions):
+        result[i] = test_bit(words, position)
+
+    return result
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def positions_words(words):
+    """Positions of the set bits of a bitmap, in increasing order"""
+    result = np.empty(count_words(words), dtype=np.int64)
+    cursor = 0
+
+    for w, word in enumerate(words):
+        base = w * WORD_BITS
+        if word == FULL_WORD:
+            for k in range(WORD_BITS):
+                result[cursor + k] = base + k
+            cursor += WORD_BITS
+
+        elif word:
+            for k in range(WORD_BITS):
+                if (word >> np.uint64(k)) & ONE:
+                    result[cursor] = base + k
+                    cursor += 1
+
+    return result
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def concatenate_words(words_top, length_top, words_bottom, length_bottom):
+    """Bitmap with the rows of words_bottom after the rows of words_top"""
+    length = length_top + length_bottom
+    result = np.zeros((length + WORD_BITS - 1) // WORD_BITS, dtype=np.uint64)
+    top_words = (length_top + WORD_BITS - 1) // WORD_BITS
+    result[:top_words] = words_top[:top_words]
+
+    shift = length_top & 63
+    first = length_top >> 6
+
+    if shift == 0:
+        result[first:first + len(words_bottom)] = words_bottom
+    else:
+        left = np.uint64(shift)
+        right = np.uint64(WORD_BITS - shift)
+        for i, word in enumerate(words_bottom):
+            result[first + i] |= word << left
+            if first + i + 1 < len(result):
+                result[first + i + 1] |= word >> right
+
+    return result
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def runs_to_words(runs, length):
+    """Pack runs of rows into words"""
+    words = np.zeros((length + WORD_BITS - 1) // WORD_BITS, dtype=np.uint64)
+    for r in range(len(runs)):
+        start = runs[r, 0]
+        stop = runs[r, 1]
+        first = start >> 6
+        last = (stop - 1) >> 6
+        if first == last:
+            words[first] |= (FULL_WORD >> np.uint64(WORD_BITS - stop + start)
+                             ) << np.uint64(start & 63)
+        else:
+            words[first] |= FULL_WORD << np.uint64(start & 63)
+            for w in range(first + 1, last):
+                words[w] = FULL_WORD
+            words[last] |= FULL_WORD >> np.uint64(WORD_BITS - 1 -
+                                                  ((stop - 1) & 63))
+
+    return words
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def intersect_runs(runs_left, runs_right):
+    """Runs of rows present in both lists of runs"""
+    result = np.empty((len(runs_left) + len(runs_right), 2), dtype=np.int64)
+    cursor_result = 0
+    cursor_left = 0
+    cursor_right = 0
+
+    while cursor_left < len(runs_left) and cursor_right < len(runs_right):
+        start = max(runs_left[cursor_left, 0], runs_right[cursor_right, 0])
+        stop = min(runs_left[cursor_left, 1], runs_right[cursor_right, 1])
+        if start < stop:
+            result[cursor_result, 0] = start
+            result[cursor_result, 1] = stop
+            cursor_result += 1
+
+        # Advance the run that finishes first
+        if runs_left[cursor_left, 1] < runs_right[cursor_right, 1]:
+            cursor_left += 1
+        else:
+            cursor_right += 1
+
+    return result[:cursor_result]
+
+
+def index_to_runs(index):
+    """Runs of rows of an index array of zeros and ones"""
+    edges = np.flatnonzero(np.diff(np.concatenate(
+        [[False], np.asarray(index, dtype=np.bool_), [False]]
+    ).astype(np.int8)))
+    return edges.reshape(-1, 2).astype(np.int64)
+
+
+def normalize_runs(runs):
+    """Drop the empty runs and merge the adjacent ones"""
+    runs = runs[runs[:, 1] > runs[:, 0]]
+    if len(runs) > 1:
+        # A run continues the previous one if it starts where it stops
+        breaks = np.flatnonzero(runs[1:, 0] != runs[:-1, 1]) + 1
+        starts = np.concatenate([[0], breaks])
+        stops = np.concatenate([breaks, [len(runs)]]) - 1
+        runs = np.stack([runs[starts, 0], runs[stops, 1]], axis=1)
+
+    return runs
+
+
+def rank_runs(runs, positions, before=None):
+    """
+    Number of rows present before each position. before is the cumulative
+    length of the runs, computed if not given.
+    """
+    if not len(runs):
+        return np.zeros_like(positions)
+
+    lengths = runs[:, 1] - runs[:, 0]
+    if before is None:
+        before = np.concatenate([[0], np.cumsum(lengths)])
+    run = np.maximum(np.searchsorted(runs[:, 0], positions, side='right') - 1,
+                     0)
+    inside = np.clip(positions - runs[run, 0], 0, lengths[run])
+    return before[run] + inside
+
+
+def pack_index(index):
+    """Pack an index array of zeros and ones into words"""
+    packed = np.packbits(np.asarray(index, dtype=np.bool_), bitorder='little')
+    padding = -len(packed) % 8
+    if padding:
+        packed = np.concatenate([packed, np.zeros(padding, dtype=np.uint8)])
+
+    return packed.view(np.uint64)
+
+
+def unpack_words(words, length):
+    """Unpack words to an index array of zeros and ones"""
+    return np.unpackbits(words.view(np.uint8), count=length,
+                         bitorder='little')
+
+
+class Bitmap:
+    """
+    Bit-packed index of a column. Stores one bit per row of the table.
+
+    A bitmap made of a few blocks of contiguous rows stores runs instead of
+    words. A dense bitmap, with all the rows present, is a single run, and
+    an empty bitmap has no runs. The words of a bitmap stored as runs are
+    only built when a kernel asks for them.
+
+    Rank (values before a row) and select (row of a value) queries use a
+    directory of cumulative counts that is built with the first query.
+    """
+    __slots__ = ('_words', '_runs', '_rank', 'length', 'version')
+
+    def __init__(self, words, length, runs=None):
+        self._words = words
+        self._runs = runs
+        self._rank = None
+        self.length = length
+        # Number of inplace updates, to validate views built from it
+        self.version = 0
+
+    @classmethod
+    def from_index(cls, index):
+        """Build a bitmap from an array of zeros and ones"""
+        if isinstance(index, Bitmap):
+            return index
+        index = np.asarray(index)
+        if index.ndim != 1:
+            raise ValueError("Only 1D indices supported")
+
+        runs = index_to_runs(index)
+        if len(runs) > 1 and 2 * len(runs) > n_words(len(index)):
+            return cls(pack_index(index), len(index))
+        return cls(None, len(index), runs)
+
+    @classmethod
+    def from_runs(cls, runs, length):
+        """
+        Build a bitmap from an array of runs with shape (nruns, 2). Falls
+        back to words if the runs are too fragmented.
+        """
+        runs = normalize_runs(np.asarray(runs, dtype=np.int64).reshape(-1, 2))
+        return cls._from_normal_runs(runs, length)
+
+    @classmethod
+    def from_words(cls, words, length):
+        """
+        Build a bitmap from packed words, as returned by the kernels. A
+        bitmap with all the rows present is stored as a single run.
+        """
+        if count_words(words) == length:
+            return cls.ones(length)
+        return cls(words, length)
+
+    @classmethod
+    def _from_normal_runs(cls, runs, length):
+        if len(runs) > 1 and 2 * len(runs) > n_words(length):
+            return cls(runs_to_words(runs, length), length)
+        return cls(None, length, runs)
+
+    @classmethod
+    def ones(cls, length):
+        """Bitmap with all the rows present"""
+        return cls.from_range(0, length, length)
+
+    @classmethod
+    def zeros(cls, length):
+        """Bitmap with all the rows empty"""
+        return cls(None, length, np.empty((0, 2), dtype=np.int64))
+
+    @classmethod
+    def from_range(cls, start, stop, length):
+        """Bitmap with the rows in [start, stop) present"""
+        start, stop = max(start, 0), min(stop, length)
+        if stop <= start:
+            return cls.zeros(length)
+        return cls(None, length, np.array([[start, stop]], dtype=np.int64))
+
+    @property
+    def runs(self):
+        """Runs of rows present, or None if the bitmap is stored as words"""
+        return self._runs
+
+    @property
+    def dense(self):
+        """True if all the rows are present"""
+        return self._runs is not None and self.count() == self.length
+
+    @property
+    def words(self):
+        """Packed words of the bitmap"""
+        if self._words is None:
+            return runs_to_words(self._runs, self.length)
+        return self._words
+
+    def to_index(self):
+        """Unpack to an array of zeros and ones of type uint8"""
+        if self._words is None:
+            steps = np.zeros(self.length + 1, dtype=np.int8)
+            steps[self._runs[:, 0]] += 1
+            steps[self._runs[:, 1]] -= 1
+            return np.cumsum(steps[:-1], dtype=np.int8).view(np.uint8)
+        return unpack_words(self._words, self.length)
+
+    def count(self):
+        """Number of rows present"""
+        if self._words is None:
+            return int(np.sum(self._runs[:, 1] - self._runs[:, 0]))
+        return count_words(self._words)
+
+    def update(self, index):
+        """Replace the rows of the bitmap inplace with the given index"""
+        bitmap = Bitmap.from_index(index)
+        self._words = bitmap._words
+        self._runs = bitmap._runs
+        self._rank = None
+        self.length = bitmap.length
+        self.version += 1
+
+    def rank_directory(self):
+        """Cumulative counts used by rank and select, built lazily"""
+        if self._rank is None:
+            if self._words is None:
+                lengths = self._runs[:, 1] - self._runs[:, 0]
+                self._rank = np.concatenate([[0], np.cumsum(lengths)])
+            else:
+                self._rank = build_rank(self._words)
+        return self._rank
+
+    def rank(self, position):
+        """
+        Number of rows present before position, that is the position in the
+        values of the row if it is present. Position may be an array.
+        """
+        directory = self.rank_directory()
+        if self._words is None:
+            if np.ndim(position):
+                return rank_runs(self._runs, np.asarray(position), directory)
+            return int(rank_runs(self._runs, position, directory))
+
+        if np.ndim(position):
+            return rank_many(self._words, directory,
+                             np.asarray(position, dtype=np.int64))
+        return rank_block(self._words, directory, position)
+
+    def select(self, k):
+        """
+        Row of the k-th value (zero based), the inverse of rank. k may be an
+        array.
+        """
+        directory = self.rank_directory()
+        if self._words is None:
+            run = np.searchsorted(directory[1:], k, side='right')
+            return self._runs[run, 0] + k - directory[run]
+
+        if np.ndim(k):
+            return select_many(self._words, directory,
+                               np.asarray(k, dtype=np.int64))
+        return select_block(self._words, directory, k)
+
+    def present(self, positions):
+        """Boolean array, True for the positions whose row is present"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if self._words is None:
+            run = np.searchsorted(self._runs[:, 0], positions,
+                                  side='right') - 1
+            inside = run >= 0
+            inside[inside] = positions[inside] < self._runs[run[inside], 1]
+            return inside
+        return test_many(self._words, positions)
+
+    def positions(self):
+        """Rows present, in increasing order"""
+        if self._words is None:
+            lengths = self._runs[:, 1] - self._runs[:, 0]
+            before = np.cumsum(lengths) - lengths
+            return np.arange(lengths.sum()) + np.repeat(
+                self._runs[:, 0] - before, lengths)
+        return positions_words(self._words)
+
+    def copy(self):
+        if self._words is None:
+            return Bitmap(None, self.length, self._runs.copy())
+        return Bitmap(self._words.copy(), self.length)
+
+    def slice(self, start, stop):
+        """Bitmap with the rows from start to stop"""
+        start, stop, _ = slice(start, stop).indices(self.length)
+        stop = max(start, stop)
+
+        if self._words is None:
+            runs = intersect_runs(self._runs,
+                                  np.array([[start, stop]], dtype=np.int64))
+            return Bitmap._from_normal_runs(runs - start, stop - start)
+
+        first = start // WORD_BITS
+        words = self._words[first:n_words(stop)]
+        index = unpack_words(words, len(words) * WORD_BITS)
+        return Bitmap.from_index(index[start - first * WORD_BITS:
+                                       stop - first * WORD_BITS])
+
+    def concatenate(self, other):
+        """Bitmap with the rows of other appended after the rows of self"""
+        if self._words is None and other._words is None:
+            runs = other._runs + self.length
+            # Only the last run of the top and the first of the bottom
+            # may have to be merged
+            if (len(self._runs) and len(runs) and
+                    self._runs[-1, 1] == runs[0, 0]):
+                runs[0, 0] = self._runs[-1, 0]
+                runs = np.concatenate([self._runs[:-1], runs])
+            elif len(self._runs):
+                runs = np.concatenate([self._runs, runs])
+
+            return Bitmap._from_normal_runs(runs, self.length + other.length)
+
+        return Bitmap.from_words(concatenate_words(self.words, self.length,
+                                                   other.words, other.length),
+                                 self.length + other.length)
+
+    def resize(self, length):
+        """Grow or crop the bitmap to length rows. New rows are empty"""
+        if self._words is None:
+            return Bitmap.from_runs(np.minimum(self._runs, length), length)
+
+        if length <= self.length:
+            return Bitmap.from_index(self.to_index()[:length])
+
+        words = np.zeros(n_words(length), dtype=np.uint64)
+        words[:len(self._words)] = self._words
+        return Bitmap(words, length)
+
+    @property
+    def nbytes(self):
+        if self._words is None:
+            return self._runs.nbytes
+        return self._words.nbytes
+
+    def __and__(self, other):
+        if self._words is None and other._words is None:
+            return Bitmap.from_runs(intersect_runs(self._runs, other._runs),
+                                    self.length)
+        return Bitmap.from_words(self.words & other.words, self.length)
+
+    def __or__(self, other):
+        if self.dense:
+            return self
+        if other.dense:
+            return other
+        return Bitmap.from_words(self.words | other.words, self.length)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self.length
+        if not 0 <= position < self.length:
+            raise IndexError("Bitmap index out of range")
+        if self._words is None:
+            run = np.searchsorted(self._runs[:, 0], position, side='right')
+            return bool(run > 0 and position < self._runs[run - 1, 1])
+        return bool(test_bit(self._words, position))
+
+    def __len__(self):
+        return self.length
+
+    def __eq__(self, other):
+        if not isinstance(other, Bitmap) or self.length != other.length:
+            return False
+        if self is other:
+            return True
+        if self._words is None and other._words is None:
+            return np.array_equal(self._runs, other._runs)
+        return np.array_equal(self.words, other.words)
+
+    def __repr__(self):
+        return "<Bitmap[ {}/{} ] object at {}>".format(
+            self.count(), self.length, hex(id(self)))
+
+
+def concatenate_bitmaps(bitmaps):
+    """
+    Bitmap with the rows of each bitmap after the rows of the previous
+    one, built in a single pass over their words or runs.
+
+    :param bitmaps: List of bitmaps
+    :return:
+    """
+    offsets = np.cumsum([0] + [len(bitmap) for bitmap in bitmaps])
+    length = int(offsets[-1])
+
+    if all(bitmap.runs is not None for bitmap in bitmaps):
+        return Bitmap.from_runs(np.concatenate(
+            [bitmap.runs + offset for bitmap, offset in zip(bitmaps, offsets)]
+            + [np.empty((0, 2), dtype=np.int64)]), length)
+
+    words = np.zeros(n_words(length), dtype=np.uint64)
+    for bitmap, offset in zip(bitmaps, offsets):
+        chunk = bitmap.words[:n_words(len(bitmap))]
+        first = int(offset) // WORD_BITS
+        shift = int(offset) % WORD_BITS
+        if shift == 0:
+            words[first:first + len(chunk)] |= chunk
+        else:
+            # Each word spills its high bits to the next one
+            words[first:first + len(chunk)] |= chunk << np.uint64(shift)
+            spill = min(len(chunk), len(words) - first - 1)
+            words[first + 1:first + 1 + spill] |= (
+                chunk[:spill] >> np.uint64(WORD_BITS - shift))
+
+    return Bitmap.from_words(words, length)
+
+
+def to_bitmap(index):
+    """Build a bitmap out of a bitmap or an array of zeros and ones"""
+    return Bitmap.from_index(index)
@@ -0,0 +1,89 @@
+"""
+Over-allocated storage for the values of the columns, so that appending
+rows to a table copies only the appended rows most of the time.
+
+The data of a table is a view of the first rows of a larger buffer. A view
+can grow in place only if it ends at the last row written to the buffer;
+any other view of the same buffer (a previous version of the column, or
+the column of another table sharing the array) is left untouched and is
+copied to a new buffer if it is the one that grows.
+"""
+import numpy as np
+from weakref import WeakValueDictionary
+
+
+class Buffer(np.ndarray):
+    """
+    Array with capacity for more rows than the ones written. The number of
+    written rows is stored in used.
+    """
+    pass
+
+
+# Buffers alive indexed by the address of their first element
+_buffers = WeakValueDictionary()
+
+
+def _address(values):
+    return values.__array_interface__['data'][0]
+
+
+def capacity(values):
+    """
+    Number of rows that values can hold without reallocation. It is the
+    length of the array if it can not grow in place.
+
+    :param values: A one-dimensional numpy array
+    :return:
+    """
+    buffer = _buffers.get(_address(values))
+
+    if (buffer is not None and
+            buffer.dtype == values.dtype and
+            buffer.used == len(values) and
+            values.flags.c_contiguous):
+        return len(buffer)
+
+    return len(values)
+
+
+def allocate(values, size):
+    """
+    Copy values to a new buffer with capacity for size rows.
+
+    :param values: A one-dimensional numpy array
+    :param size: Capacity of the buffer
+    :return: A view of the buffer with the rows of values
+    """
+    buffer = np.empty(max(size, 1), dtype=values.dtype).view(Buffer)
+    buffer[:len(values)] = values
+    buffer.used = len(values)
+    _buffers[_address(buffer)] = buffer
+
+    return buffer[:len(values)].view(np.ndarray)
+
+
+def append(values, other):
+    """
+    Array with the rows of other after the rows of values. The rows of
+    values are not copied if the buffer has room for the new rows,
+    otherwise the capacity of the new buffer is doubled.
+
+    :param values: A one-dimensional numpy array
+    :param other: A one-dimensional numpy array
+    :return:
+    """
+    length = len(values) + len(other)
+    dtype = np.result_type(values, other)
+
+    if dtype == values.dtype and capacity(values) >= length:
+        buffer = _buffers[_address(values)]
+    else:
+        values = allocate(values.astype(dtype, copy=False),
+                          max(length, 2 * len(values)))
+        buffer = _buffers[_address(values)]
+
+    buffer[len(values):length] = other
+    buffer.used = length
+
+    return buffer[:length].view(np.ndarray)
@@ -1,108 +1,277 @@
 import numpy as np
 import operator
-from gtable.lib import fillna_column
+from functools import wraps
+from gtable.bitmap import Bitmap, intersect_runs, rank_runs
+from gtable.lib import fillna_column, monotonic_order, set_order
 from gtable.fast import apply_fast_add, apply_fast_mul, apply_fast_truediv, \
     apply_fast_sub, apply_fast_floordiv, apply_fast_and, apply_fast_or, \
     apply_fast_xor, apply_fast_pow, apply_fast_mod, apply_fast_ge, \
     apply_fast_gt, apply_fast_le, apply_fast_lt, apply_fast_eq, apply_fast_ne, \
-    apply_mask_column, reindex_column
+    apply_mask_column, reindex_column, result_type, parallel_version
+
+
+def defer_to_lazy(method):
+    """
+    Return NotImplemented from an operator if the operand is a lazy
+    expression, so that the expression builds the result.
+    """
+    @wraps(method)
+    def operator_method(self, y):
+        if getattr(y, 'lazy', False) is True:
+            return NotImplemented
+        return method(self, y)
+
+    return operator_method
 
 
 class Column:
     """
     Indexed column view of the table
     """
-    def __init__(self, values, index):
+    def __init__(self, values, index, owner=None):
         self.values = values
-        self.index = index
+        self.bitmap = Bitmap.from_index(index)
+        # Table the column comes from. The in-place operators only write on
+        # the values if the table owns them.
+        self.owner = owner
+
+    @property
+    def index(self):
+        """Index of the column as an array of zeros and ones"""
+        return self.bitmap.to_index()
+
+    @index.setter
+    def index(self, index):
+        self.bitmap = Bitmap.from_index(index)
 
     def __repr__(self):
         return "<Column[ {} ] object at {}>".format(self.values.dtype,
                                                     hex(id(self)))
 
+    @defer_to_lazy
     def __add__(self, y):
         return apply_add(self, y)
 
+    @defer_to_lazy
     def __radd__(self, y):
         return apply_add(self, y)
 
+    @defer_to_lazy
     def __sub__(self, y):
-        return apply_truediv(self, y)
+        return apply_sub(self, y)
 
+    @defer_to_lazy
     def __rsub__(self, y):
-        return apply_truediv(self, y)
+        return apply_reflected(np.subtract, self, y)
 
+    @defer_to_lazy
     def __mul__(self, y):
         return apply_mul(self, y)
 
+    @defer_to_lazy
     def __rmul__(self, y):
         return apply_mul(self, y)
 
+    @defer_to_lazy
     def __truediv__(self, y):
         return apply_truediv(self, y)
 
+    @defer_to_lazy
     def __rtruediv__(self, y):
-        return apply_truediv(self, y)
+        return apply_reflected(np.true_divide, self, y)
     
+    @defer_to_lazy
     def __floordiv__(self, y):
         return apply_floordiv(self, y)
 
+    @defer_to_lazy
     def __rfloordiv__(self, y):
-        return apply_floordiv(self, y)
+        return apply_reflected(np.floor_divide, self, y)
 
+    @defer_to_lazy
     def __pow__(self, y):
         return apply_pow(self, y)
 
+    @defer_to_lazy
+    def __rpow__(self, y):
+        return apply_reflected(np.power, self, y)
+
+    @defer_to_lazy
     def __mod__(self, y):
         return apply_mod(self, y)
 
+    @defer_to_lazy
+    def __rmod__(self, y):
+        return apply_reflected(np.mod, self, y)
+
+    @defer_to_lazy
     def __lt__(self, y):
         return apply_lt(self, y)
 
+    @defer_to_lazy
     def __le__(self, y):
         return apply_le(self, y)
 
+    @defer_to_lazy
     def __gt__(self, y):
         return apply_gt(self, y)
 
+    @defer_to_lazy
     def __ge__(self, y):
         return apply_ge(self, y)
 
+    @defer_to_lazy
     def __eq__(self, y):
         return apply_eq(self, y)
 
+    @defer_to_lazy
     def __ne__(self, y):
         return apply_ne(self, y)
 
+    @defer_to_lazy
     def __and__(self, y):
         return apply_and(self, y)
 
+    @defer_to_lazy
     def __or__(self, y):
         return apply_or(self, y)
 
+    @defer_to_lazy
     def __xor__(self, y):
         return apply_xor(self, y)
 
+    def __iadd__(self, y):
+        return self._inplace('add', y)
+
+    def __isub__(self, y):
+        return self._inplace('sub', y)
+
+    def __imul__(self, y):
+        return self._inplace('mul', y)
+
+    def __itruediv__(self, y):
+        return self._inplace('truediv', y)
+
+    def __ifloordiv__(self, y):
+        return self._inplace('floordiv', y)
+
+    def __ipow__(self, y):
+        return self._inplace('pow', y)
+
+    def __imod__(self, y):
+        return self._inplace('mod', y)
+
+    def _inplace(self, op, y):
+        """
+        In-place operator. The result is written over the values of the
+        column if the table of the column owns them, it has the same rows
+        and its dtype can be cast to the dtype of the values. Otherwise it
+        is a new column like with the binary operator, and the table owns
+        its values, so that the next operators write on them.
+        """
+        apply, ufunc = INPLACE_OPERATORS[op]
+        values = self.values
+        owned = self.owner is not None and self.owner._owns(values)
+
+        if getattr(y, 'lazy', False) is True:
+            expression = self.lazy()._binary(op, y)
+            if (owned and values.flags.writeable and
+                    expression.bitmap() == self.bitmap and
+                    np.can_cast(expression.dtype, values.dtype, 'same_kind')):
+                expression.evaluate(out=values)
+                self._forget_order()
+                return self
+            if self.owner is None:
+                return expression
+            return self._owned_result(expression.evaluate())
+
+        if type(y) == Column:
+            dtype = ufunc(values[:0], y.values[:0]).dtype
+            same_rows = (self.bitmap & y.bitmap) == self.bitmap
+        else:
+            dtype = ufunc(values[:0], y).dtype
+            same_rows = True
+
+        if (owned and same_rows and values.flags.writeable and
+                np.can_cast(dtype, values.dtype, 'same_kind')):
+            apply(self, y, out=values)
+            self._forget_order()
+            return self
+
+        return self._owned_result(apply(self, y))
+
+    def _write(self, values, bitmap=None):
+        """
+        Write new values, and a new bitmap, over the column. The values are
+        written in place only if the table of the column owns them.
+        Otherwise the table gets new arrays, so that the tables and the
+        projections that share the values do not change. The bitmap is
+        always replaced, since it may be shared too.
+        """
+        old_values, old_bitmap = self.values, self.bitmap
+        if (self.owner is not None and self.owner._owns(old_values) and
+                old_values.flags.writeable):
+            old_values[:] = values
+            values = old_values
+        else:
+            values = values.astype(old_values.dtype, copy=False)
+            if self.owner is not None:
+                self.owner._own(values)
+
+        self.values = values
+        self.bitmap = old_bitmap if bitmap is None else bitmap
+
+        if self.owner is not None:
+            owner = self.owner
+            for i, (column_values, column_bitmap) in enumerate(
+                    zip(owner.data, owner.bitmaps)):
+                if column_values is old_values and column_bitmap is old_bitmap:
+                    owner.data[i] = self.values
+                    owner.bitmaps[i] = self.bitmap
+
+        self._forget_order()
+
+    def _forget_order(self):
+        """Forget the order of the values in the table after a write"""
+        if self.owner is not None:
+            for key, values in zip(self.owner.keys, self.owner.data):
+                if values is self.values:
+                    set_order(self.owner.keys, key, None)
+
+    def _owned_result(self, result):
+        """Give the new values of an out of place result to the table"""
+        if self.owner is not None:
+            self.owner._own(result.values)
+            result.owner = self.owner
+        return result
+
+    def lazy(self):
+        """
+        Lazy version of the column. Its operators build an expression
+        that is computed by a single fused kernel with evaluate().
+        """
+        from gtable.expression import Expression
+        return Expression.from_column(self)
+
     def __neg__(self):
-        return Column(-self.values, self.index)
+        return Column(-self.values, self.bitmap)
 
     def __getitem__(self, i):
-        # TODO: This algorithm makes getitem O(N)
-        if self.index[i]:
-            return self.values[int(self.index[:i+1].sum()) - 1]
+        if self.bitmap[i]:
+            return self.values[self.bitmap.rank(i % len(self.bitmap))]
         else:
             return None
 
     def __len__(self):
-        return len(self.index)
+        return len(self.bitmap)
 
     def copy(self):
         """Return a copy of the column"""
-        return Column(self.values[:], self.index[:])
+        return Column(self.values[:], self.bitmap.copy())
 
     def astype(self, dtype):
         """Changes the (numpy) datatype of the values"""
-        self.values[:] = self.values.astype(dtype)
+        self._write(self.values.astype(dtype))
 
     @property
     def dtype(self):
@@ -114,8 +283,8 @@ class Column:
         Fills the non available value sequentially with the previous
         available position. Operates inplace.
         """
-        self.values, self.index = fillna_column(self.values, self.index,
-                                                reverse, fillvalue)
+        self.values, self.bitmap = fillna_column(self.values, self.bitmap,
+                                                 reverse, fillvalue)
 
     def fill(self, fillvalue):
         """
@@ -123,7 +292,7 @@ class Column:
         :param fillvalue:
         :return:
         """
-        new_values = np.empty(len(self.index), dtype=self.values.dtype)
+        new_values = np.empty(len(self.bitmap), dtype=self.values.dtype)
         bool_index = self.index.astype(np.bool_)
 
         if np.any(bool_index):
@@ -132,7 +301,7 @@ class Column:
         new_values[~bool_index] = fillvalue
 
         self.values = new_values
-        self.index = np.ones(len(self.index))
+        self.bitmap = Bitmap.ones(len(self.bitmap))
 
     def reorder(self, order):
         """
@@ -140,9 +309,30 @@ class Column:
         :param order:
         :return:
         """
-        self.values[:] = self.values[(np.cumsum(self.index) - np.array(1)
-                                      )[order[self.index.astype(np.bool)]]]
-        self.index[:] = self.index[order]
+        if self.bitmap.dense:
+            self._write(self.values[order])
+        else:
+            present = self.bitmap.present(order)
+            self._write(self.values[self.bitmap.rank(order[present])],
+                        Bitmap.from_index(present))
+
+    def take(self, positions):
+        """
+        Column with the rows at the given positions. Negative positions
+        count from the end.
+
+        :param positions: Array of row positions
+        :return:
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        length = len(self.bitmap)
+        if np.any((positions < -length) | (positions >= length)):
+            raise IndexError("Column index out of range")
+        positions = np.where(positions < 0, positions + length, positions)
+
+        present = self.bitmap.present(positions)
+        return Column(self.values[self.bitmap.rank(positions[present])],
+                      Bitmap.from_index(present))
 
     def mask(self, mask):
         """
@@ -150,7 +340,9 @@ class Column:
         :param mask:
         :return:
         """
-        return Column(*apply_mask_column(self.values, self.index, mask))
+        values, words = sparse_kernel(apply_mask_column, self)(
+            self.values, self.bitmap.words, mask)
+        return Column(values, Bitmap.from_words(words, len(self.bitmap)))
 
     def reindex(self, index):
         """
@@ -159,7 +351,7 @@ class Column:
         :param index:
         :return:
         """
-        return Column(*reindex_column(self.values, self.index, index))
+        return Column(*reindex_column(self.values, self.bitmap, index))
 
     def date_range(self, fr='1970-01-01', to='2262-01-01', include_fr=True,
                    include_to=True):
@@ -192,7 +384,7 @@ class Column:
         else:
             after = self.values < to
 
-        return Column(before & after, self.index)
+        return Column(before & after, self.bitmap)
 
     def is_empty(self):
         """
@@ -204,10 +396,11 @@ class Column:
 
     def is_sorted(self):
         """
-        True if the column is sorted
+        True if the values of the column are in ascending order, checked
+        in a single pass.
         :return:
         """
-        return np.sort(self.values) == self.values
+        return monotonic_order(self.values)['order'] == 'asc'
 
     def contains(self, item):
         """
@@ -217,170 +410,281 @@ class Column:
         :return:
         """
         if isinstance(item, np.ndarray):
-            return Column(np.in1d(self.values, item), self.index)
+            return Column(np.in1d(self.values, item), self.bitmap)
         elif type(item) == Column:
-            return Column(np.in1d(self.values, item.values), self.index)
+            return Column(np.in1d(self.values, item.values), self.bitmap)
         else:
             raise ValueError('Argument must be an array or a column.')
 
 
-def apply_add(left: Column, right):
+def vectorized(left: Column, right: Column):
+    """
+    True if an operator on both columns can be computed with vectorized
+    operations on the values: the columns have the same index, or both
+    indices are stored as runs of rows.
+    """
+    return (left.bitmap == right.bitmap or
+            (left.bitmap.runs is not None and right.bitmap.runs is not None))
+
+
+def sparse_kernel(kernel, column: Column):
+    """Serial or parallel version of a kernel for the length of a column"""
+    return parallel_version(kernel, len(column.bitmap))
+
+
+def apply_vectorized(op, left: Column, right: Column, dtype=None,
+                     out=None):
+    """
+    Apply an operator on two columns with the same index or with indices
+    stored as runs. Operates on the slices of values of the runs present in
+    both columns, and the empty runs are skipped. If out is given, op must
+    be a ufunc and the result is written in out.
+    """
+    if dtype is None:
+        dtype = result_type(op, left.values.dtype, right.values.dtype)
+
+    if left.bitmap == right.bitmap:
+        if out is not None:
+            return Column(op(left.values, right.values, out=out), left.bitmap)
+        return Column(op(left.values, right.values).astype(dtype, copy=False),
+                      left.bitmap)
+
+    runs = intersect_runs(left.bitmap.runs, right.bitmap.runs)
+    starts_left = rank_runs(left.bitmap.runs, runs[:, 0])
+    starts_right = rank_runs(right.bitmap.runs, runs[:, 0])
+    if out is None:
+        result = np.empty(np.sum(runs[:, 1] - runs[:, 0]), dtype=dtype)
+    else:
+        result = out
+
+    cursor = 0
+    for (start, stop), start_left, start_right in zip(runs, starts_left,
+                                                      starts_right):
+        length = stop - start
+        result[cursor:cursor + length] = op(
+            left.values[start_left:start_left + length],
+            right.values[start_right:start_right + length])
+        cursor += length
+
+    return Column(result, Bitmap(None, len(left.bitmap), runs))
+
+
+def apply_add(left: Column, right, out=None):
     if type(right) == Column:
-        result, index = apply_fast_add(left.values, right.values,
-                                       left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(np.add, left, right, out=out)
+        result, index = sparse_kernel(apply_fast_add, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words,
+            out)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
+
     else:
-        return Column(operator.add(left.values, right), left.index)
+        return Column(np.add(left.values, right, out=out), left.bitmap)
 
 
-def apply_sub(left: Column, right):
+def apply_reflected(op, right: Column, left):
+    """
+    Apply a binary operator with a scalar or an array as the left operand,
+    for the reflected operators of a column.
+    """
+    return Column(op(left, right.values), right.bitmap)
+
+
+def apply_sub(left: Column, right, out=None):
     if type(right) == Column:
-        result, index = apply_fast_sub(left.values, right.values,
-                                       left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(np.subtract, left, right, out=out)
+        result, index = sparse_kernel(apply_fast_sub, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words,
+            out)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.sub(left.values, right), left.index)
+        return Column(np.subtract(left.values, right, out=out), left.bitmap)
 
     
-def apply_mul(left: Column, right):
+def apply_mul(left: Column, right, out=None):
     if type(right) == Column:
-        result, index = apply_fast_mul(left.values, right.values,
-                                       left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(np.multiply, left, right, out=out)
+        result, index = sparse_kernel(apply_fast_mul, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words,
+            out)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.mul(left.values, right), left.index)
+        return Column(np.multiply(left.values, right, out=out), left.bitmap)
 
 
-def apply_truediv(left: Column, right):
+def apply_truediv(left: Column, right, out=None):
     if type(right) == Column:
-        result, index = apply_fast_truediv(left.values, right.values,
-                                           left.index, right.index)
-        return Column(result, index)
-        
+        if vectorized(left, right):
+            return apply_vectorized(np.true_divide, left, right, out=out)
+        result, index = sparse_kernel(apply_fast_truediv, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words,
+            out)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
+
     else:
-        return Column(operator.truediv(left.values, right), left.index)
+        return Column(np.true_divide(left.values, right, out=out), left.bitmap)
     
     
-def apply_floordiv(left: Column, right):
+def apply_floordiv(left: Column, right, out=None):
     if type(right) == Column:
-        result, index = apply_fast_floordiv(left.values, right.values,
-                                            left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(np.floor_divide, left, right, out=out)
+        result, index = sparse_kernel(apply_fast_floordiv, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words,
+            out)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.floordiv(left.values, right), left.index)
+        return Column(np.floor_divide(left.values, right, out=out),
+                      left.bitmap)
 
 
-def apply_pow(left: Column, right):
+def apply_pow(left: Column, right, out=None):
     if type(right) == Column:
-        result, index = apply_fast_pow(left.values, right.values,
-                                       left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(np.power, left, right, out=out)
+        result, index = sparse_kernel(apply_fast_pow, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words,
+            out)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.pow(left.values, right), left.index)
+        return Column(np.power(left.values, right, out=out), left.bitmap)
 
 
-def apply_mod(left: Column, right):
+def apply_mod(left: Column, right, out=None):
     if type(right) == Column:
-        result, index = apply_fast_mod(left.values, right.values,
-                                       left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(np.mod, left, right, out=out)
+        result, index = sparse_kernel(apply_fast_mod, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words,
+            out)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.mod(left.values, right), left.index)
+        return Column(np.mod(left.values, right, out=out), left.bitmap)
     
 
 def apply_gt(left: Column, right):
     if type(right) == Column:
-        result, index = apply_fast_gt(left.values, right.values,
-                                      left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(operator.gt, left, right, np.bool_)
+        result, index = sparse_kernel(apply_fast_gt, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.gt(left.values, right), left.index)
+        return Column(operator.gt(left.values, right), left.bitmap)
 
 
 def apply_ge(left: Column, right):
     if type(right) == Column:
-        result, index = apply_fast_ge(left.values, right.values,
-                                      left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(operator.ge, left, right, np.bool_)
+        result, index = sparse_kernel(apply_fast_ge, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.ge(left.values, right), left.index)
+        return Column(operator.ge(left.values, right), left.bitmap)
 
     
 def apply_lt(left: Column, right):
     if type(right) == Column:
-        result, index = apply_fast_lt(left.values, right.values,
-                                      left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(operator.lt, left, right, np.bool_)
+        result, index = sparse_kernel(apply_fast_lt, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.lt(left.values, right), left.index)
+        return Column(operator.lt(left.values, right), left.bitmap)
 
     
 def apply_le(left: Column, right):
     if type(right) == Column:
-        result, index = apply_fast_le(left.values, right.values,
-                                      left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(operator.le, left, right, np.bool_)
+        result, index = sparse_kernel(apply_fast_le, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.le(left.values, right), left.index)
+        return Column(operator.le(left.values, right), left.bitmap)
 
     
 def apply_and(left: Column, right):
     if type(right) == Column:
-        result, index = apply_fast_and(left.values, right.values,
-                                       left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(np.logical_and, left, right, np.bool_)
+        result, index = sparse_kernel(apply_fast_and, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
         return Column(operator.and_(left.values.astype(np.bool), right),
-                      left.index)
+                      left.bitmap)
 
     
 def apply_or(left: Column, right):
     if type(right) == Column:
-        result, index = apply_fast_or(left.values, right.values,
-                                      left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(np.logical_or, left, right, np.bool_)
+        result, index = sparse_kernel(apply_fast_or, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
         return Column(operator.or_(left.values.astype(np.bool), right),
-                      left.index)
+                      left.bitmap)
     
 
 def apply_xor(left: Column, right):
     if type(right) == Column:
-        result, index = apply_fast_xor(left.values, right.values,
-                                       left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(np.logical_xor, left, right, np.bool_)
+        result, index = sparse_kernel(apply_fast_xor, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
         return Column(operator.xor(left.values.astype(np.bool), right),
-                      left.index)
+                      left.bitmap)
 
     
 def apply_eq(left: Column, right):
     if type(right) == Column:
-        result, index = apply_fast_eq(left.values, right.values,
-                                      left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(operator.eq, left, right, np.bool_)
+        result, index = sparse_kernel(apply_fast_eq, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.eq(left.values, right), left.index)
+        return Column(operator.eq(left.values, right), left.bitmap)
 
     
 def apply_ne(left: Column, right):
     if type(right) == Column:
-        result, index = apply_fast_ne(left.values, right.values,
-                                      left.index, right.index)
-        return Column(result, index)
+        if vectorized(left, right):
+            return apply_vectorized(operator.ne, left, right, np.bool_)
+        result, index = sparse_kernel(apply_fast_ne, left)(
+            left.values, right.values, left.bitmap.words, right.bitmap.words)
+        return Column(result, Bitmap.from_words(index, len(left.bitmap)))
 
     else:
-        return Column(operator.ne(left.values, right), left.index)
+        return Column(operator.ne(left.values, right), left.bitmap)
+
+
+# Kernels and ufuncs of the in-place operators
+INPLACE_OPERATORS = {'add': (apply_add, np.add),
+                     'sub': (apply_sub, np.subtract),
+                     'mul': (apply_mul, np.multiply),
+                     'truediv': (apply_truediv, np.true_divide),
+                     'floordiv': (apply_floordiv, np.floor_divide),
+                     'pow': (apply_pow, np.power),
+                     'mod': (apply_mod, np.mod)}
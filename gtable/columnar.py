@@ -0,0 +1,301 @@
+"""
+Compressed columnar file format. The rows of the table are split in row
+groups, and each column of a row group is stored as a compressed chunk
+with its bitmap and its present values. A JSON footer at the end of the
+file keeps the schema, the offsets of the chunks and the minimum, maximum
+and null count of each chunk, so that a reader can skip the row groups
+that can not satisfy a predicate.
+"""
+import json
+import lzma
+import operator
+import struct
+import zlib
+from functools import reduce
+
+import numpy as np
+
+from gtable.bitmap import Bitmap, n_words, concatenate_bitmaps
+from gtable.column import Column
+from gtable.expression import Expression
+from gtable.lib import select_columns
+from gtable.schema import Schema
+
+MAGIC = b'GTABLE01'
+FORMAT_VERSION = 1
+ROW_GROUP_SIZE = 65536
+
+CODECS = {
+    None: (lambda b: b, lambda b: b),
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def _statistics(values):
+    """Minimum and maximum of the values of a chunk, or None"""
+    kind = values.dtype.kind
+    if kind in 'mM':
+        values = values[~np.isnat(values)]
+    elif kind == 'f':
+        values = values[~np.isnan(values)]
+    elif kind not in 'biu':
+        return None, None
+
+    if not len(values):
+        return None, None
+
+    if kind in 'mM':
+        return (int(values.min().astype(np.int64)),
+                int(values.max().astype(np.int64)))
+
+    return values.min().item(), values.max().item()
+
+
+def _statistic_value(value, dtype):
+    if value is not None and dtype.kind in 'mM':
+        return np.array(value, dtype=np.int64).view(dtype)[()]
+    return value
+
+
+def _may_satisfy(chunk, op, value, dtype):
+    """False if the statistics of the chunk prove no row satisfies op"""
+    if chunk['count'] == 0:
+        return False
+
+    minimum = _statistic_value(chunk['min'], dtype)
+    maximum = _statistic_value(chunk['max'], dtype)
+    if minimum is None:
+        return True
+
+    try:
+        if op == '==':
+            return bool(minimum <= value <= maximum)
+        elif op == '<':
+            return bool(minimum < value)
+        elif op == '<=':
+            return bool(minimum <= value)
+        elif op == '>':
+            return bool(maximum > value)
+        elif op == '>=':
+            return bool(maximum >= value)
+    except TypeError:
+        # Not comparable with the statistics, the chunk has to be read.
+        pass
+
+    return True
+
+
+def _parse_where(where):
+    """List of (column, op, value) clauses"""
+    if where is None:
+        return []
+    if isinstance(where, tuple):
+        where = [where]
+
+    for column, op, value in where:
+        if op not in OPERATORS:
+            raise ValueError('Operator {} not supported'.format(op))
+
+    return list(where)
+
+
+def write_table(table, path, row_group_size=ROW_GROUP_SIZE,
+                compression='zlib'):
+    """
+    Write a table to a compressed columnar file.
+
+    :param table: a Table.
+    :param path: Path of the file.
+    :param row_group_size: Number of rows of each row group.
+    :param compression: 'zlib', 'lzma' or None.
+    :return:
+    """
+    if compression not in CODECS:
+        raise ValueError('Compression {} not supported'.format(compression))
+    compress = CODECS[compression][0]
+
+    for key, values in zip(table.keys, table.data):
+        if values.dtype.hasobject:
+            raise ValueError(
+                "Column {} of objects can not be written".format(key))
+
+    length = len(table)
+    # Position of the first value of each column in the current row group
+    offsets = [0 for _ in table.keys]
+    row_groups = list()
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+
+        for start in range(0, max(length, 1), row_group_size):
+            stop = min(start + row_group_size, length)
+            chunks = list()
+
+            for i, (values, column_bitmap) in enumerate(
+                    zip(table.data, table.bitmaps)):
+                bitmap = column_bitmap.slice(start, stop)
+                count = bitmap.count()
+                chunk_values = values[offsets[i]:offsets[i] + count]
+                offsets[i] += count
+
+                if bitmap.runs is not None:
+                    storage, bitmap_array = 'runs', bitmap.runs
+                else:
+                    storage, bitmap_array = 'words', bitmap.words
+
+                bitmap_bytes = compress(
+                    np.ascontiguousarray(bitmap_array).tobytes())
+                values_bytes = compress(
+                    np.ascontiguousarray(chunk_values).tobytes())
+                minimum, maximum = _statistics(chunk_values)
+
+                chunks.append({'bitmap': storage,
+                               'nruns': (len(bitmap_array)
+                                         if storage == 'runs' else None),
+                               'bitmap_offset': f.tell(),
+                               'bitmap_size': len(bitmap_bytes),
+                               'values_offset': f.tell() + len(bitmap_bytes),
+                               'values_size': len(values_bytes),
+                               'count': count,
+                               'null_count': (stop - start) - count,
+                               'min': minimum,
+                               'max': maximum})
+                f.write(bitmap_bytes)
+                f.write(values_bytes)
+
+            row_groups.append({'start': start,
+                               'rows': stop - start,
+                               'chunks': chunks})
+
+        footer = json.dumps({
+            'version': FORMAT_VERSION,
+            'length': length,
+            'compression': compression,
+            'columns': [{'name': key,
+                         'dtype': values.dtype.str,
+                         'metadata': table.keys.metadata.get(key)}
+                        for key, values in zip(table.keys, table.data)],
+            'row_groups': row_groups
+        }).encode()
+        f.write(footer)
+        f.write(struct.pack('<Q', len(footer)))
+        f.write(MAGIC)
+
+
+def read_footer(f):
+    """Read the footer of an open columnar file"""
+    f.seek(0)
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Not a gtable columnar file')
+
+    f.seek(-len(MAGIC) - 8, 2)
+    footer_size, = struct.unpack('<Q', f.read(8))
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Truncated gtable columnar file')
+
+    f.seek(-len(MAGIC) - 8 - footer_size, 2)
+    footer = json.loads(f.read(footer_size).decode())
+    if footer['version'] > FORMAT_VERSION:
+        raise ValueError('Unsupported format version {}'.format(
+            footer['version']))
+
+    return footer
+
+
+def _read_chunk(f, chunk, rows, dtype, decompress):
+    f.seek(chunk['bitmap_offset'])
+    bitmap_bytes = decompress(f.read(chunk['bitmap_size']))
+    f.seek(chunk['values_offset'])
+    values = np.frombuffer(decompress(f.read(chunk['values_size'])),
+                           dtype=dtype)
+
+    if chunk['bitmap'] == 'runs':
+        runs = np.frombuffer(bitmap_bytes, dtype=np.int64).reshape(-1, 2)
+        bitmap = Bitmap(None, rows, runs)
+    else:
+        words = np.frombuffer(bitmap_bytes, dtype=np.uint64)[:n_words(rows)]
+        bitmap = Bitmap(words, rows)
+
+    return values, bitmap
+
+
+def read_table(path, columns=None, where=None):
+    """
+    Read a table from a compressed columnar file.
+
+    :param path: Path of the file.
+    :param columns: List with the names of the columns to read. All the
+      columns are read if None.
+    :param where: Predicate as a (column, op, value) tuple, or a list of
+      them that have to be satisfied together. op is one of ==, !=, <, <=,
+      > or >=. The row groups whose statistics can not satisfy the
+      predicate are not read.
+    :return: data, keys and bitmaps of the table
+    """
+    clauses = _parse_where(where)
+
+    with open(path, 'rb') as f:
+        footer = read_footer(f)
+        names = [column['name'] for column in footer['columns']]
+        positions = {name: i for i, name in enumerate(names)}
+        dtypes = [np.dtype(column['dtype']) for column in footer['columns']]
+
+        if columns is None:
+            columns = names
+        for column in list(columns) + [c[0] for c in clauses]:
+            if column not in positions:
+                raise ValueError('{} not in table'.format(column))
+
+        # The predicate columns are read even if they are not projected
+        selected = list(columns) + [c[0] for c in clauses
+                                    if c[0] not in columns]
+        selected = list(dict.fromkeys(selected))
+
+        row_groups = [
+            row_group for row_group in footer['row_groups']
+            if all(_may_satisfy(row_group['chunks'][positions[column]],
+                                op, value, dtypes[positions[column]])
+                   for column, op, value in clauses)]
+
+        decompress = CODECS[footer['compression']][1]
+        data = list()
+        bitmaps = list()
+        for column in selected:
+            position = positions[column]
+            chunks = [_read_chunk(f, row_group['chunks'][position],
+                                  row_group['rows'], dtypes[position],
+                                  decompress)
+                      for row_group in row_groups]
+
+            bitmap = concatenate_bitmaps([chunk[1] for chunk in chunks])
+            data.append(np.concatenate(
+                [chunk[0] for chunk in chunks] +
+                [np.empty(0, dtype=dtypes[position])]))
+            bitmaps.append(bitmap)
+
+    if clauses:
+        predicate = reduce(operator.and_, [
+            OPERATORS[op](Expression.from_column(
+                Column(data[selected.index(column)],
+                       bitmaps[selected.index(column)])), value)
+            for column, op, value in clauses])
+        data, bitmaps = select_columns(data, bitmaps, predicate.select())
+
+    keys = Schema()
+    for column in columns:
+        keys.append(column)
+        metadata = footer['columns'][positions[column]]['metadata']
+        if metadata is not None:
+            keys.metadata[column] = metadata
+
+    return data[:len(columns)], keys, bitmaps[:len(columns)]
@@ -0,0 +1,457 @@
+"""
+Lazy expressions of columns. The operators of a lazy column build an
+expression tree instead of computing each intermediate column. When the
+expression is evaluated, it is compiled into a single numba kernel that
+walks the bitmaps of all the columns at once and only writes the result.
+
+The kernels are cached by the shape of the expression, and numba keeps a
+specialization for each combination of dtypes.
+"""
+import numpy as np
+from functools import reduce
+from numba import jit
+
+from gtable.bitmap import Bitmap, EMPTY_WORD, FULL_WORD, ONE, WORD_BITS, \
+    popcount
+from gtable.column import Column
+
+# Source of each operator, and the numpy function that gives its dtype
+OPERATORS = {
+    'add': ('({0} + {1})', np.add),
+    'sub': ('({0} - {1})', np.subtract),
+    'mul': ('({0} * {1})', np.multiply),
+    'truediv': ('({0} / {1})', np.true_divide),
+    'floordiv': ('({0} // {1})', np.floor_divide),
+    'pow': ('({0} ** {1})', np.power),
+    'mod': ('({0} % {1})', np.mod),
+    'lt': ('({0} < {1})', np.less),
+    'le': ('({0} <= {1})', np.less_equal),
+    'gt': ('({0} > {1})', np.greater),
+    'ge': ('({0} >= {1})', np.greater_equal),
+    'eq': ('({0} == {1})', np.equal),
+    'ne': ('({0} != {1})', np.not_equal),
+    'and': ('(({0} != 0) & ({1} != 0))', np.logical_and),
+    'or': ('(({0} != 0) | ({1} != 0))', np.logical_or),
+    'xor': ('(({0} != 0) != ({1} != 0))', np.logical_xor),
+    'neg': ('(-{0})', np.negative),
+}
+
+ALIGNED_KERNEL = """
+def kernel(result, {values}, {scalars}):
+    for i in range(len(result)):
+        result[i] = {expression}
+"""
+
+SPARSE_KERNEL = """
+def kernel(result, index, {values}, {words}, {scalars}):
+    cursor = 0
+{init}
+    for i in range(len(index)):
+        word = index[i]
+        if word == FULL_WORD:
+            # Present in all the columns, no need to check bits
+            for k in range(WORD_BITS):
+                result[cursor + k] = {full_expression}
+            cursor += WORD_BITS
+{advance_full}
+
+        elif word == EMPTY_WORD:
+            # Nothing to compute, skip the values of this word
+{advance_empty}
+
+        else:
+            rest = {union}
+            while rest:
+                bit = rest & (~rest + ONE)
+                if word & bit:
+                    result[cursor] = {expression}
+                    cursor += 1
+{advance_bit}
+                rest ^= bit
+"""
+
+SELECT_KERNEL = """
+def kernel(selection, index, {values}, {words}, {scalars}):
+{init}
+    for i in range(len(index)):
+        word = index[i]
+        if word == FULL_WORD:
+            # Present in all the columns, no need to check bits
+            selected = EMPTY_WORD
+            for k in range(WORD_BITS):
+                # Without branches, the outcome of the test is unpredictable
+                selected |= np.uint64({full_expression} != 0) << np.uint64(k)
+            selection[i] = selected
+{advance_full}
+
+        elif word == EMPTY_WORD:
+            # Nothing is selected, skip the values of this word
+{advance_empty}
+
+        else:
+            selected = EMPTY_WORD
+            rest = {union}
+            while rest:
+                bit = rest & (~rest + ONE)
+                if word & bit:
+                    if {expression}:
+                        selected |= bit
+{advance_bit}
+                rest ^= bit
+            selection[i] = selected
+"""
+
+# Compiled kernels by shape of the expression
+_kernels = dict()
+_selectors = dict()
+
+
+class Expression:
+    """
+    Lazy expression of columns and scalars. Operators build new
+    expressions, and evaluate computes the resulting column.
+    """
+    lazy = True
+
+    def __init__(self, op, *operands):
+        self.op = op
+        self.operands = operands
+
+    @classmethod
+    def from_column(cls, column):
+        return cls('column', column)
+
+    @staticmethod
+    def _wrap(operand):
+        if isinstance(operand, Expression):
+            return operand
+        elif isinstance(operand, Column):
+            return Expression.from_column(operand)
+        return Expression('scalar', operand)
+
+    def _binary(self, op, other, reflected=False):
+        other = self._wrap(other)
+        if reflected:
+            return Expression(op, other, self)
+        return Expression(op, self, other)
+
+    def __add__(self, y):
+        return self._binary('add', y)
+
+    def __radd__(self, y):
+        return self._binary('add', y, True)
+
+    def __sub__(self, y):
+        return self._binary('sub', y)
+
+    def __rsub__(self, y):
+        return self._binary('sub', y, True)
+
+    def __mul__(self, y):
+        return self._binary('mul', y)
+
+    def __rmul__(self, y):
+        return self._binary('mul', y, True)
+
+    def __truediv__(self, y):
+        return self._binary('truediv', y)
+
+    def __rtruediv__(self, y):
+        return self._binary('truediv', y, True)
+
+    def __floordiv__(self, y):
+        return self._binary('floordiv', y)
+
+    def __rfloordiv__(self, y):
+        return self._binary('floordiv', y, True)
+
+    def __pow__(self, y):
+        return self._binary('pow', y)
+
+    def __rpow__(self, y):
+        return self._binary('pow', y, True)
+
+    def __mod__(self, y):
+        return self._binary('mod', y)
+
+    def __rmod__(self, y):
+        return self._binary('mod', y, True)
+
+    def __lt__(self, y):
+        return self._binary('lt', y)
+
+    def __le__(self, y):
+        return self._binary('le', y)
+
+    def __gt__(self, y):
+        return self._binary('gt', y)
+
+    def __ge__(self, y):
+        return self._binary('ge', y)
+
+    def __eq__(self, y):
+        return self._binary('eq', y)
+
+    def __ne__(self, y):
+        return self._binary('ne', y)
+
+    def __and__(self, y):
+        return self._binary('and', y)
+
+    def __rand__(self, y):
+        return self._binary('and', y, True)
+
+    def __or__(self, y):
+        return self._binary('or', y)
+
+    def __ror__(self, y):
+        return self._binary('or', y, True)
+
+    def __xor__(self, y):
+        return self._binary('xor', y)
+
+    def __rxor__(self, y):
+        return self._binary('xor', y, True)
+
+    def __neg__(self):
+        return Expression('neg', self)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "<Expression[ {} ] object at {}>".format(
+            self._shape(dict(), dict()), hex(id(self)))
+
+    def _shape(self, columns, scalars):
+        """
+        String with the shape of the expression. Fills columns and scalars
+        with the leaves, numbered by their first appearance.
+        """
+        if self.op == 'column':
+            column = self.operands[0]
+            key = (id(column.values), id(column.bitmap))
+            if key not in columns:
+                columns[key] = (len(columns), column)
+            return 'c{}'.format(columns[key][0])
+
+        elif self.op == 'scalar':
+            scalars[len(scalars)] = self.operands[0]
+            return 's{}'.format(len(scalars) - 1)
+
+        return '{}({})'.format(self.op, ','.join(
+            operand._shape(columns, scalars) for operand in self.operands))
+
+    def _source(self, value, columns, scalars):
+        """
+        Source of the expression, with value formatting each column. The
+        scalars are numbered in the same order as in _shape.
+        """
+        if self.op == 'column':
+            column = self.operands[0]
+            return value(columns[(id(column.values), id(column.bitmap))][0])
+        elif self.op == 'scalar':
+            scalars.append(self.operands[0])
+            return 's{}'.format(len(scalars) - 1)
+
+        return OPERATORS[self.op][0].format(*[
+            operand._source(value, columns, scalars)
+            for operand in self.operands])
+
+    def _dtype(self):
+        """Dtype of the result, with the numpy rules"""
+        if self.op == 'column':
+            return np.ones(1, dtype=self.operands[0].values.dtype)
+        elif self.op == 'scalar':
+            return self.operands[0]
+
+        return OPERATORS[self.op][1](*[operand._dtype()
+                                       for operand in self.operands])
+
+    def _leaves(self):
+        """Shape, columns and scalars of the expression"""
+        columns = dict()
+        scalars = dict()
+        shape = self._shape(columns, scalars)
+        columns_list = [column for _, column in sorted(columns.values(),
+                                                       key=lambda c: c[0])]
+        scalars_list = [scalars[i] for i in range(len(scalars))]
+        return shape, columns, columns_list, scalars_list
+
+    @property
+    def dtype(self):
+        """Dtype of the result, with the numpy rules"""
+        with np.errstate(all='ignore'):
+            return np.asarray(self._dtype()).dtype
+
+    @staticmethod
+    def _rows(bitmaps):
+        """True if all the bitmaps are equal, and the rows present in all"""
+        aligned = all(bitmap == bitmaps[0] for bitmap in bitmaps[1:])
+        bitmap = bitmaps[0] if aligned else reduce(
+            lambda left, right: left & right, bitmaps)
+        return aligned, bitmap
+
+    def bitmap(self):
+        """Bitmap with the rows of the result"""
+        _, _, columns_list, _ = self._leaves()
+        return self._rows([column.bitmap for column in columns_list])[1]
+
+    def evaluate(self, out=None):
+        """
+        Compute the expression with a single fused kernel
+
+        :param out: Array where the result is written, with a value for each
+          row of the result. It may be the values of one of the columns of
+          the expression. A new array is allocated if None.
+        :return: Column with the result
+        """
+        if self.op == 'column':
+            return self.operands[0]
+
+        shape, columns, columns_list, scalars_list = self._leaves()
+        bitmaps = [column.bitmap for column in columns_list]
+        aligned, bitmap = self._rows(bitmaps)
+
+        key = (shape, aligned)
+        if key not in _kernels:
+            _kernels[key] = compile_kernel(self, columns, aligned)
+
+        if out is None:
+            result = np.empty(bitmap.count(), dtype=self.dtype)
+        elif len(out) != bitmap.count():
+            raise ValueError('out has {} values, the result has {}'.format(
+                len(out), bitmap.count()))
+        else:
+            result = out
+        values = [column.values for column in columns_list]
+
+        if aligned:
+            _kernels[key](result, *values, *scalars_list)
+        else:
+            _kernels[key](result, bitmap.words, *values,
+                          *[b.words for b in bitmaps], *scalars_list)
+
+        return Column(result, bitmap)
+
+    def select(self):
+        """
+        Rows where the expression is true, computed with a single fused
+        kernel without the intermediate column of booleans. A row is
+        selected only if all the columns of the expression are present.
+
+        :return: Bitmap with the selected rows
+        """
+        shape, columns, columns_list, scalars_list = self._leaves()
+        bitmaps = [column.bitmap for column in columns_list]
+        aligned, bitmap = self._rows(bitmaps)
+
+        key = (shape, aligned)
+        if key not in _selectors:
+            _selectors[key] = compile_selector(self, columns, aligned)
+
+        index = bitmap.words
+        selection = np.zeros(len(index), dtype=np.uint64)
+        values = [column.values for column in columns_list]
+        words = [index] if aligned else [b.words for b in bitmaps]
+        _selectors[key](selection, index, *values, *words, *scalars_list)
+
+        return Bitmap.from_words(selection, len(bitmap))
+
+
+def compile_kernel(expression, columns, aligned):
+    """
+    Generate and compile the kernel of an expression.
+
+    :param expression: An Expression
+    :param columns: Dictionary key -> (position, column) of the leaves
+    :param aligned: True if all the columns have the same bitmap
+    :return: The compiled kernel
+    """
+    ncolumns = len(columns)
+    leaves = dict()
+    expression._shape(dict(), leaves)
+    nscalars = len(leaves)
+    values = ', '.join('v{}'.format(j) for j in range(ncolumns))
+    scalars = ', '.join('s{}'.format(j) for j in range(nscalars))
+
+    def source(value):
+        return expression._source(value, columns, list())
+
+    if aligned:
+        code = ALIGNED_KERNEL.format(
+            values=values, scalars=scalars,
+            expression=source('v{}[i]'.format))
+
+    else:
+        columns_range = range(ncolumns)
+        code = SPARSE_KERNEL.format(
+            values=values, scalars=scalars,
+            words=', '.join('w{}'.format(j) for j in columns_range),
+            init='\n'.join('    c{} = 0'.format(j) for j in columns_range),
+            full_expression=source('v{0}[c{0} + k]'.format),
+            expression=source('v{0}[c{0}]'.format),
+            advance_full='\n'.join('            c{} += WORD_BITS'.format(j)
+                                   for j in columns_range),
+            advance_empty='\n'.join(
+                '            c{0} += popcount(w{0}[i])'.format(j)
+                for j in columns_range),
+            union=' | '.join('w{}[i]'.format(j) for j in columns_range),
+            advance_bit='\n'.join(
+                '                if w{0}[i] & bit:\n'
+                '                    c{0} += 1'.format(j)
+                for j in columns_range))
+
+    return _compile(code)
+
+
+def compile_selector(expression, columns, aligned):
+    """
+    Generate and compile the kernel that selects the rows where an
+    expression is true. The kernel sets the bits of the selected rows.
+
+    :param expression: An Expression
+    :param columns: Dictionary key -> (position, column) of the leaves
+    :param aligned: True if all the columns have the same bitmap
+    :return: The compiled kernel
+    """
+    ncolumns = len(columns)
+    leaves = dict()
+    expression._shape(dict(), leaves)
+    # Aligned columns share the words and the cursor of the first one
+    cursors = range(1) if aligned else range(ncolumns)
+
+    def source(value):
+        return expression._source(
+            lambda j: value.format(j, 0 if aligned else j), columns, list())
+
+    code = SELECT_KERNEL.format(
+        values=', '.join('v{}'.format(j) for j in range(ncolumns)),
+        scalars=', '.join('s{}'.format(j) for j in range(len(leaves))),
+        words=', '.join('w{}'.format(j) for j in cursors),
+        init='\n'.join('    c{} = 0'.format(j) for j in cursors),
+        full_expression=source('v{0}[c{1} + k]'),
+        expression=source('v{0}[c{1}]'),
+        advance_full='\n'.join('            c{} += WORD_BITS'.format(j)
+                               for j in cursors),
+        advance_empty='\n'.join(
+            '            c{0} += popcount(w{0}[i])'.format(j)
+            for j in cursors),
+        union=' | '.join('w{}[i]'.format(j) for j in cursors),
+        advance_bit='\n'.join('                if w{0}[i] & bit:\n'
+                              '                    c{0} += 1'.format(j)
+                              for j in cursors))
+
+    return _compile(code)
+
+
+def _compile(code):
+    """Compile the source of a kernel"""
+    # Remove the dangling commas of empty argument lists
+    code = code.replace(', )', ')')
+    namespace = {'np': np, 'popcount': popcount, 'FULL_WORD': FULL_WORD,
+                 'EMPTY_WORD': EMPTY_WORD, 'ONE': ONE,
+                 'WORD_BITS': WORD_BITS}
+    exec(code, namespace)
+
+    return jit(nopython=True, nogil=True, error_model='numpy')(
+        namespace['kernel'])
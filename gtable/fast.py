@@ -2,524 +2,897 @@
 File with all the numba-accelerated functions. Some of this functions are
 hard, and tremendously non-pythonic due to JIT optimization. They are not
 that hard, but you must take it with patience.
+
+The indices are bit-packed (see gtable.bitmap), so the kernels walk them a
+word at a time. Empty words are skipped, full words are computed without
+checking each bit, and the rest visits only the set bits.
 """
 
 import numpy as np
-from numba import jit, generated_jit, types
+import numba
+from numba import jit, generated_jit, prange, types
+from numba.core.errors import TypingError
+from gtable.bitmap import Bitmap, WORD_BITS, EMPTY_WORD, FULL_WORD, ONE, \
+    popcount, count_words, test_bit, set_bit, set_range, positions_words, \
+    rank_block, pack_index
+from numba.np.numpy_support import as_dtype
+from gtable.pool import in_worker
 
 
-@generated_jit(nopython=True, nogil=True, cache=True)
-def apply_fast_add(value_left, value_right, index_left, index_right):
-    if value_left.dtype == types.int64 and value_right.dtype == types.int64:
-        result_dtype = np.int64
-    else:
-        result_dtype = np.float64
+def result_type(ufunc, *dtypes):
+    """
+    Dtype of the result of ufunc on values of the given dtypes, with the
+    promotion rules of numpy.
+    """
+    with np.errstate(all='ignore'):
+        return ufunc(*[np.ones(1, dtype=dtype) for dtype in dtypes]).dtype
+
+
+def kernel_result_type(ufunc, *arrays):
+    """Same as result_type, for the numba types of the arrays of a kernel"""
+    return result_type(ufunc, *[as_dtype(array.dtype) for array in arrays])
+
+
+def sum_dtype(dtype):
+    """Dtype of the sum or the product of values, with the numpy rules"""
+    return np.ones(1, dtype=dtype).sum().dtype
+
+
+def mean_dtype(dtype):
+    """Dtype of the mean or the deviation of values, with the numpy rules"""
+    return np.ones(1, dtype=dtype).mean().dtype
+
 
-    def f(value_left, value_right, index_left, index_right):
-        index = index_left * index_right
-        if len(value_left) > len(value_right):
-            result = np.empty(len(value_left), dtype=result_dtype)
+@generated_jit(nopython=True, nogil=True, cache=True)
+def apply_fast_add(value_left, value_right, index_left, index_right,
+                   out=None):
+    result_dtype = kernel_result_type(np.add, value_left, value_right)
+    if isinstance(out, types.Array):
+        # The result is written in out, with its dtype
+        result_dtype = as_dtype(out.dtype)
+
+    def f(value_left, value_right, index_left, index_right, out=None):
+        index = index_left & index_right
+        if out is None:
+            result = np.empty(count_words(index), dtype=result_dtype)
         else:
-            result = np.empty(len(value_right), dtype=result_dtype)
+            result = out
+
         cursor_result = 0
         cursor_left = 0
         cursor_right = 0
-        for il, ir in zip(index_left, index_right):
-            if il & ir:
-                result[cursor_result] = value_left[cursor_left] +\
-                                        value_right[cursor_right]
-                cursor_result += 1
-                cursor_left += 1
-                cursor_right += 1
+        for word_left, word_right in zip(index_left, index_right):
+            both = word_left & word_right
+            if both == FULL_WORD:
+                # Present in both sides, no need to check bits
+                for k in range(WORD_BITS):
+                    result[cursor_result + k] = value_left[cursor_left + k] +\
+                                                value_right[cursor_right + k]
+                cursor_result += WORD_BITS
+                cursor_left += WORD_BITS
+                cursor_right += WORD_BITS
+
+            elif both == EMPTY_WORD:
+                # Nothing to compute, skip the values of this word
+                cursor_left += popcount(word_left)
+                cursor_right += popcount(word_right)
 
-            elif il:
-                cursor_left += 1
+            else:
+                rest = word_left | word_right
+                while rest:
+                    bit = rest & (~rest + ONE)
+                    if both & bit:
+                        result[cursor_result] = value_left[cursor_left] +\
+                                                value_right[cursor_right]
+                        cursor_result += 1
+                        cursor_left += 1
+                        cursor_right += 1
+
+                    elif word_left & bit:
+                        cursor_left += 1
+
+                    else:
+                        cursor_right += 1
 
-            elif ir:
-                cursor_right += 1
+                    rest ^= bit
 
-        return result[:cursor_result], index
+        return result, index
 
     return f
 
 
 @generated_jit(nopython=True, nogil=True, cache=True)
-def apply_fast_sub(value_left, value_right, index_left, index_right):
-    if value_left.dtype == types.int64 and value_right.dtype == types.int64:
-        result_dtype = np.int64
-    else:
-        result_dtype = np.float64
-
-    def f(value_left, value_right, index_left, index_right):
-        index = index_left * index_right
-        if len(value_left) > len(value_right):
-            result = np.empty(len(value_left), dtype=result_dtype)
+def apply_fast_sub(value_left, value_right, index_left, index_right,
+                   out=None):
+    result_dtype = kernel_result_type(np.subtract, value_left, value_right)
+    if isinstance(out, types.Array):
+        # The result is written in out, with its dtype
+        result_dtype = as_dtype(out.dtype)
+
+    def f(value_left, value_right, index_left, index_right, out=None):
+        index = index_left & index_right
+        if out is None:
+            result = np.empty(count_words(index), dtype=result_dtype)
         else:
-            result = np.empty(len(value_right), dtype=result_dtype)
+            result = out
 
         cursor_result = 0
         cursor_left = 0
         cursor_right = 0
-        for il, ir in zip(index_left, index_right):
-            if il & ir:
-                result[cursor_result] = value_left[cursor_left] -\
-                                        value_right[cursor_right]
-                cursor_result += 1
-                cursor_left += 1
-                cursor_right += 1
+        for word_left, word_right in zip(index_left, index_right):
+            both = word_left & word_right
+            if both == FULL_WORD:
+                # Present in both sides, no need to check bits
+                for k in range(WORD_BITS):
+                    result[cursor_result + k] = value_left[cursor_left + k] -\
+                                                value_right[cursor_right + k]
+                cursor_result += WORD_BITS
+                cursor_left += WORD_BITS
+                cursor_right += WORD_BITS
+
+            elif both == EMPTY_WORD:
+                # Nothing to compute, skip the values of this word
+                cursor_left += popcount(word_left)
+                cursor_right += popcount(word_right)
 
-            elif il:
-                cursor_left += 1
+            else:
+                rest = word_left | word_right
+                while rest:
+                    bit = rest & (~rest + ONE)
+                    if both & bit:
+                        result[cursor_result] = value_left[cursor_left] -\
+                                                value_right[cursor_right]
+                        cursor_result += 1
+                        cursor_left += 1
+                        cursor_right += 1
+
+                    elif word_left & bit:
+                        cursor_left += 1
+
+                    else:
+                        cursor_right += 1
 
-            elif ir:
-                cursor_right += 1
+                    rest ^= bit
 
-        return result[:cursor_result], index
+        return result, index
 
     return f
 
 
 @generated_jit(nopython=True, nogil=True, cache=True)
-def apply_fast_mul(value_left, value_right, index_left, index_right):
-    if value_left.dtype == types.int64 and value_right.dtype == types.int64:
-        result_dtype = np.int64
-    else:
-        result_dtype = np.float64
-
-    def f(value_left, value_right, index_left, index_right):
-        index = index_left * index_right
-        if len(value_left) > len(value_right):
-            result = np.empty(len(value_left), dtype=result_dtype)
+def apply_fast_mul(value_left, value_right, index_left, index_right,
+                   out=None):
+    result_dtype = kernel_result_type(np.multiply, value_left, value_right)
+    if isinstance(out, types.Array):
+        # The result is written in out, with its dtype
+        result_dtype = as_dtype(out.dtype)
+
+    def f(value_left, value_right, index_left, index_right, out=None):
+        index = index_left & index_right
+        if out is None:
+            result = np.empty(count_words(index), dtype=result_dtype)
         else:
-            result = np.empty(len(value_right), dtype=result_dtype)
+            result = out
 
         cursor_result = 0
         cursor_left = 0
         cursor_right = 0
-        for il, ir in zip(index_left, index_right):
-            if il & ir:
-                result[cursor_result] = value_left[cursor_left] *\
-                                        value_right[cursor_right]
-                cursor_result += 1
-                cursor_left += 1
-                cursor_right += 1
+        for word_left, word_right in zip(index_left, index_right):
+            both = word_left & word_right
+            if both == FULL_WORD:
+                # Present in both sides, no need to check bits
+                for k in range(WORD_BITS):
+                    result[cursor_result + k] = value_left[cursor_left + k] *\
+                                                value_right[cursor_right + k]
+                cursor_result += WORD_BITS
+                cursor_left += WORD_BITS
+                cursor_right += WORD_BITS
+
+            elif both == EMPTY_WORD:
+                # Nothing to compute, skip the values of this word
+                cursor_left += popcount(word_left)
+                cursor_right += popcount(word_right)
 
-            elif il:
-                cursor_left += 1
+            else:
+                rest = word_left | word_right
+                while rest:
+                    bit = rest & (~rest + ONE)
+                    if both & bit:
+                        result[cursor_result] = value_left[cursor_left] *\
+                                                value_right[cursor_right]
+                        cursor_result += 1
+                        cursor_left += 1
+                        cursor_right += 1
+
+                    elif word_left & bit:
+                        cursor_left += 1
+
+                    else:
+                        cursor_right += 1
 
-            elif ir:
-                cursor_right += 1
+                    rest ^= bit
 
-        return result[:cursor_result], index
+        return result, index
 
     return f
 
 
 @generated_jit(nopython=True, nogil=True, cache=True)
-def apply_fast_truediv(value_left, value_right, index_left, index_right):
-    if value_left.dtype == types.int64 and value_right.dtype == types.int64:
-        result_dtype = np.int64
-    else:
-        result_dtype = np.float64
-
-    def f(value_left, value_right, index_left, index_right):
-        index = index_left * index_right
-        if len(value_left) > len(value_right):
-            result = np.empty(len(value_left), dtype=result_dtype)
+def apply_fast_truediv(value_left, value_right, index_left, index_right,
+                       out=None):
+    result_dtype = kernel_result_type(np.true_divide, value_left, value_right)
+    if isinstance(out, types.Array):
+        # The result is written in out, with its dtype
+        result_dtype = as_dtype(out.dtype)
+
+    def f(value_left, value_right, index_left, index_right, out=None):
+        index = index_left & index_right
+        if out is None:
+            result = np.empty(count_words(index), dtype=result_dtype)
         else:
-            result = np.empty(len(value_right), dtype=result_dtype)
+            result = out
 
         cursor_result = 0
         cursor_left = 0
         cursor_right = 0
-        for il, ir in zip(index_left, index_right):
-            if il & ir:
-                result[cursor_result] = value_left[cursor_left] /\
-                                        value_right[cursor_right]
-                cursor_result += 1
-                cursor_left += 1
-                cursor_right += 1
+        for word_left, word_right in zip(index_left, index_right):
+            both = word_left & word_right
+            if both == FULL_WORD:
+                # Present in both sides, no need to check bits
+                for k in range(WORD_BITS):
+                    result[cursor_result + k] = value_left[cursor_left + k] /\
+                                                value_right[cursor_right + k]
+                cursor_result += WORD_BITS
+                cursor_left += WORD_BITS
+                cursor_right += WORD_BITS
+
+            elif both == EMPTY_WORD:
+                # Nothing to compute, skip the values of this word
+                cursor_left += popcount(word_left)
+                cursor_right += popcount(word_right)
 
-            elif il:
-                cursor_left += 1
+            else:
+                rest = word_left | word_right
+                while rest:
+                    bit = rest & (~rest + ONE)
+                    if both & bit:
+                        result[cursor_result] = value_left[cursor_left] /\
+                                                value_right[cursor_right]
+                        cursor_result += 1
+                        cursor_left += 1
+                        cursor_right += 1
+
+                    elif word_left & bit:
+                        cursor_left += 1
+
+                    else:
+                        cursor_right += 1
 
-            elif ir:
-                cursor_right += 1
+                    rest ^= bit
 
-        return result[:cursor_result], index
+        return result, index
 
     return f
 
 
-@jit(nopython=True, nogil=True, cache=True)
-def apply_fast_floordiv(value_left, value_right, index_left, index_right):
-    index = index_left * index_right
-    if len(value_left) > len(value_right):
-        result = np.empty(len(value_left), dtype=np.int64)
-    else:
-        result = np.empty(len(value_right), dtype=np.int64)
+@generated_jit(nopython=True, nogil=True, cache=True)
+def apply_fast_floordiv(value_left, value_right, index_left, index_right,
+                        out=None):
+    result_dtype = kernel_result_type(np.floor_divide, value_left, value_right)
+    if isinstance(out, types.Array):
+        # The result is written in out, with its dtype
+        result_dtype = as_dtype(out.dtype)
+
+    def f(value_left, value_right, index_left, index_right, out=None):
+        index = index_left & index_right
+        if out is None:
+            result = np.empty(count_words(index), dtype=result_dtype)
+        else:
+            result = out
 
-    cursor_result = 0
-    cursor_left = 0
-    cursor_right = 0
-    for il, ir in zip(index_left, index_right):
-        if il & ir:
-            result[cursor_result] = value_left[cursor_left] //\
-                                    value_right[cursor_right]
-            cursor_result += 1
-            cursor_left += 1
-            cursor_right += 1
+        cursor_result = 0
+        cursor_left = 0
+        cursor_right = 0
+        for word_left, word_right in zip(index_left, index_right):
+            both = word_left & word_right
+            if both == FULL_WORD:
+                # Present in both sides, no need to check bits
+                for k in range(WORD_BITS):
+                    result[cursor_result + k] = value_left[cursor_left + k] //\
+                                                value_right[cursor_right + k]
+                cursor_result += WORD_BITS
+                cursor_left += WORD_BITS
+                cursor_right += WORD_BITS
+
+            elif both == EMPTY_WORD:
+                # Nothing to compute, skip the values of this word
+                cursor_left += popcount(word_left)
+                cursor_right += popcount(word_right)
 
-        elif il:
-            cursor_left += 1
+            else:
+                rest = word_left | word_right
+                while rest:
+                    bit = rest & (~rest + ONE)
+                    if both & bit:
+                        result[cursor_result] = value_left[cursor_left] //\
+                                                value_right[cursor_right]
+                        cursor_result += 1
+                        cursor_left += 1
+                        cursor_right += 1
+
+                    elif word_left & bit:
+                        cursor_left += 1
 
-        elif ir:
-            cursor_right += 1
+                    else:
+                        cursor_right += 1
 
-    return result[:cursor_result], index
+                    rest ^= bit
 
+        return result, index
+
+    return f
 
-@generated_jit(nopython=True, nogil=True, cache=True)
-def apply_fast_pow(value_left, value_right, index_left, index_right):
-    if value_left.dtype == types.int64 and value_right.dtype == types.int64:
-        result_dtype = np.int64
-    else:
-        result_dtype = np.float64
 
-    def f(value_left, value_right, index_left, index_right):
-        index = index_left * index_right
-        if len(value_left) > len(value_right):
-            result = np.empty(len(value_left), dtype=result_dtype)
+@generated_jit(nopython=True, nogil=True, cache=True)
+def apply_fast_pow(value_left, value_right, index_left, index_right,
+                   out=None):
+    result_dtype = kernel_result_type(np.power, value_left, value_right)
+    if isinstance(out, types.Array):
+        # The result is written in out, with its dtype
+        result_dtype = as_dtype(out.dtype)
+
+    def f(value_left, value_right, index_left, index_right, out=None):
+        index = index_left & index_right
+        if out is None:
+            result = np.empty(count_words(index), dtype=result_dtype)
         else:
-            result = np.empty(len(value_right), dtype=result_dtype)
+            result = out
 
         cursor_result = 0
         cursor_left = 0
         cursor_right = 0
-        for il, ir in zip(index_left, index_right):
-            if il & ir:
-                result[cursor_result] = value_left[cursor_left] **\
-                                        value_right[cursor_right]
-                cursor_result += 1
-                cursor_left += 1
-                cursor_right += 1
+        for word_left, word_right in zip(index_left, index_right):
+            both = word_left & word_right
+            if both == FULL_WORD:
+                # Present in both sides, no need to check bits
+                for k in range(WORD_BITS):
+                    result[cursor_result + k] = value_left[cursor_left + k] **\
+                                                value_right[cursor_right + k]
+                cursor_result += WORD_BITS
+                cursor_left += WORD_BITS
+                cursor_right += WORD_BITS
+
+            elif both == EMPTY_WORD:
+                # Nothing to compute, skip the values of this word
+                cursor_left += popcount(word_left)
+                cursor_right += popcount(word_right)
+
+            else:
+                rest = word_left | word_right
+                while rest:
+                    bit = rest & (~rest + ONE)
+                    if both & bit:
+                        result[cursor_result] = value_left[cursor_left] **\
+                                                value_right[cursor_right]
+                        cursor_result += 1
+                        cursor_left += 1
+                        cursor_right += 1
+
+                    elif word_left & bit:
+                        cursor_left += 1
 
-            elif il:
-                cursor_left += 1
+                    else:
+                        cursor_right += 1
 
-            elif ir:
-                cursor_right += 1
+                    rest ^= bit
 
-        return result[:cursor_result], index
+        return result, index
 
     return f
 
 
 @generated_jit(nopython=True, nogil=True, cache=True)
-def apply_fast_mod(value_left, value_right, index_left, index_right):
-    if value_left.dtype == types.int64 and value_right.dtype == types.int64:
-        result_dtype = np.int64
-    else:
-        result_dtype = np.float64
-
-    def f(value_left, value_right, index_left, index_right):
-        index = index_left * index_right
-        if len(value_left) > len(value_right):
-            result = np.empty(len(value_left), dtype=result_dtype)
+def apply_fast_mod(value_left, value_right, index_left, index_right,
+                   out=None):
+    result_dtype = kernel_result_type(np.mod, value_left, value_right)
+    if isinstance(out, types.Array):
+        # The result is written in out, with its dtype
+        result_dtype = as_dtype(out.dtype)
+
+    def f(value_left, value_right, index_left, index_right, out=None):
+        index = index_left & index_right
+        if out is None:
+            result = np.empty(count_words(index), dtype=result_dtype)
         else:
-            result = np.empty(len(value_right), dtype=result_dtype)
+            result = out
 
         cursor_result = 0
         cursor_left = 0
         cursor_right = 0
-        for il, ir in zip(index_left, index_right):
-            if il & ir:
-                result[cursor_result] = value_left[cursor_left] %\
-                                        value_right[cursor_right]
-                cursor_result += 1
-                cursor_left += 1
-                cursor_right += 1
+        for word_left, word_right in zip(index_left, index_right):
+            both = word_left & word_right
+            if both == FULL_WORD:
+                # Present in both sides, no need to check bits
+                for k in range(WORD_BITS):
+                    result[cursor_result + k] = value_left[cursor_left + k] %\
+                                                value_right[cursor_right + k]
+                cursor_result += WORD_BITS
+                cursor_left += WORD_BITS
+                cursor_right += WORD_BITS
+
+            elif both == EMPTY_WORD:
+                # Nothing to compute, skip the values of this word
+                cursor_left += popcount(word_left)
+                cursor_right += popcount(word_right)
+
+            else:
+                rest = word_left | word_right
+                while rest:
+                    bit = rest & (~rest + ONE)
+                    if both & bit:
+                        result[cursor_result] = value_left[cursor_left] %\
+                                                value_right[cursor_right]
+                        cursor_result += 1
+                        cursor_left += 1
+                        cursor_right += 1
+
+                    elif word_left & bit:
+                        cursor_left += 1
 
-            elif il:
-                cursor_left += 1
+                    else:
+                        cursor_right += 1
 
-            elif ir:
-                cursor_right += 1
+                    rest ^= bit
 
-        return result[:cursor_result], index
+        return result, index
 
     return f
 
 
 @jit(nopython=True, nogil=True, cache=True)
 def apply_fast_gt(value_left, value_right, index_left, index_right):
-    index = index_left * index_right
-    if len(value_left) > len(value_right):
-        result = np.empty(len(value_left), dtype=np.bool_)
-    else:
-        result = np.empty(len(value_right), dtype=np.bool_)
+    index = index_left & index_right
+    result = np.empty(count_words(index), dtype=np.bool_)
 
     cursor_result = 0
     cursor_left = 0
     cursor_right = 0
-    for il, ir in zip(index_left, index_right):
-        if il & ir:
-            result[cursor_result] = value_left[cursor_left] >\
-                                    value_right[cursor_right]
-            cursor_result += 1
-            cursor_left += 1
-            cursor_right += 1
+    for word_left, word_right in zip(index_left, index_right):
+        both = word_left & word_right
+        if both == FULL_WORD:
+            # Present in both sides, no need to check bits
+            for k in range(WORD_BITS):
+                result[cursor_result + k] = value_left[cursor_left + k] >\
+                                            value_right[cursor_right + k]
+            cursor_result += WORD_BITS
+            cursor_left += WORD_BITS
+            cursor_right += WORD_BITS
+
+        elif both == EMPTY_WORD:
+            # Nothing to compute, skip the values of this word
+            cursor_left += popcount(word_left)
+            cursor_right += popcount(word_right)
 
-        elif il:
-            cursor_left += 1
+        else:
+            rest = word_left | word_right
+            while rest:
+                bit = rest & (~rest + ONE)
+                if both & bit:
+                    result[cursor_result] = value_left[cursor_left] >\
+                                            value_right[cursor_right]
+                    cursor_result += 1
+                    cursor_left += 1
+                    cursor_right += 1
+
+                elif word_left & bit:
+                    cursor_left += 1
 
-        elif ir:
-            cursor_right += 1
+                else:
+                    cursor_right += 1
+
+                rest ^= bit
 
-    return result[:cursor_result], index
+    return result, index
 
 
 @jit(nopython=True, nogil=True, cache=True)
 def apply_fast_ge(value_left, value_right, index_left, index_right):
-    index = index_left * index_right
-    if len(value_left) > len(value_right):
-        result = np.empty(len(value_left), dtype=np.bool_)
-    else:
-        result = np.empty(len(value_left), dtype=np.bool_)
+    index = index_left & index_right
+    result = np.empty(count_words(index), dtype=np.bool_)
 
     cursor_result = 0
     cursor_left = 0
     cursor_right = 0
-    for il, ir in zip(index_left, index_right):
-        if il & ir:
-            result[cursor_result] = value_left[cursor_left] >=\
-                                    value_right[cursor_right]
-            cursor_result += 1
-            cursor_left += 1
-            cursor_right += 1
+    for word_left, word_right in zip(index_left, index_right):
+        both = word_left & word_right
+        if both == FULL_WORD:
+            # Present in both sides, no need to check bits
+            for k in range(WORD_BITS):
+                result[cursor_result + k] = value_left[cursor_left + k] >=\
+                                            value_right[cursor_right + k]
+            cursor_result += WORD_BITS
+            cursor_left += WORD_BITS
+            cursor_right += WORD_BITS
+
+        elif both == EMPTY_WORD:
+            # Nothing to compute, skip the values of this word
+            cursor_left += popcount(word_left)
+            cursor_right += popcount(word_right)
+
+        else:
+            rest = word_left | word_right
+            while rest:
+                bit = rest & (~rest + ONE)
+                if both & bit:
+                    result[cursor_result] = value_left[cursor_left] >=\
+                                            value_right[cursor_right]
+                    cursor_result += 1
+                    cursor_left += 1
+                    cursor_right += 1
+
+                elif word_left & bit:
+                    cursor_left += 1
 
-        elif il:
-            cursor_left += 1
+                else:
+                    cursor_right += 1
 
-        elif ir:
-            cursor_right += 1
+                rest ^= bit
 
-    return result[:cursor_result], index
+    return result, index
 
 
 @jit(nopython=True, nogil=True, cache=True)
 def apply_fast_lt(value_left, value_right, index_left, index_right):
-    index = index_left * index_right
-    if len(value_left) > len(value_right):
-        result = np.empty(len(value_left), dtype=np.bool_)
-    else:
-        result = np.empty(len(value_right), dtype=np.bool_)
+    index = index_left & index_right
+    result = np.empty(count_words(index), dtype=np.bool_)
 
     cursor_result = 0
     cursor_left = 0
     cursor_right = 0
-    for il, ir in zip(index_left, index_right):
-        if il & ir:
-            result[cursor_result] = value_left[cursor_left] <\
-                                    value_right[cursor_right]
-            cursor_result += 1
-            cursor_left += 1
-            cursor_right += 1
+    for word_left, word_right in zip(index_left, index_right):
+        both = word_left & word_right
+        if both == FULL_WORD:
+            # Present in both sides, no need to check bits
+            for k in range(WORD_BITS):
+                result[cursor_result + k] = value_left[cursor_left + k] <\
+                                            value_right[cursor_right + k]
+            cursor_result += WORD_BITS
+            cursor_left += WORD_BITS
+            cursor_right += WORD_BITS
+
+        elif both == EMPTY_WORD:
+            # Nothing to compute, skip the values of this word
+            cursor_left += popcount(word_left)
+            cursor_right += popcount(word_right)
+
+        else:
+            rest = word_left | word_right
+            while rest:
+                bit = rest & (~rest + ONE)
+                if both & bit:
+                    result[cursor_result] = value_left[cursor_left] <\
+                                            value_right[cursor_right]
+                    cursor_result += 1
+                    cursor_left += 1
+                    cursor_right += 1
 
-        elif il:
-            cursor_left += 1
+                elif word_left & bit:
+                    cursor_left += 1
 
-        elif ir:
-            cursor_right += 1
+                else:
+                    cursor_right += 1
 
-    return result[:cursor_result], index
+                rest ^= bit
+
+    return result, index
 
 
 @jit(nopython=True, nogil=True, cache=True)
 def apply_fast_le(value_left, value_right, index_left, index_right):
-    index = index_left * index_right
-    if len(value_left) > len(value_right):
-        result = np.empty(len(value_left), dtype=np.bool_)
-    else:
-        result = np.empty(len(value_right), dtype=np.bool_)
+    index = index_left & index_right
+    result = np.empty(count_words(index), dtype=np.bool_)
 
     cursor_result = 0
     cursor_left = 0
     cursor_right = 0
-    for il, ir in zip(index_left, index_right):
-        if il & ir:
-            result[cursor_result] = value_left[cursor_left] <=\
-                                    value_right[cursor_right]
-            cursor_result += 1
-            cursor_left += 1
-            cursor_right += 1
+    for word_left, word_right in zip(index_left, index_right):
+        both = word_left & word_right
+        if both == FULL_WORD:
+            # Present in both sides, no need to check bits
+            for k in range(WORD_BITS):
+                result[cursor_result + k] = value_left[cursor_left + k] <=\
+                                            value_right[cursor_right + k]
+            cursor_result += WORD_BITS
+            cursor_left += WORD_BITS
+            cursor_right += WORD_BITS
+
+        elif both == EMPTY_WORD:
+            # Nothing to compute, skip the values of this word
+            cursor_left += popcount(word_left)
+            cursor_right += popcount(word_right)
 
-        elif il:
-            cursor_left += 1
+        else:
+            rest = word_left | word_right
+            while rest:
+                bit = rest & (~rest + ONE)
+                if both & bit:
+                    result[cursor_result] = value_left[cursor_left] <=\
+                                            value_right[cursor_right]
+                    cursor_result += 1
+                    cursor_left += 1
+                    cursor_right += 1
 
-        elif ir:
-            cursor_right += 1
+                elif word_left & bit:
+                    cursor_left += 1
 
-    return result[:cursor_result], index
+                else:
+                    cursor_right += 1
+
+                rest ^= bit
+
+    return result, index
 
 
 @jit(nopython=True, nogil=True, cache=True)
 def apply_fast_and(value_left, value_right, index_left, index_right):
-    index = index_left * index_right
-    if len(value_left) > len(value_right):
-        result = np.empty(len(value_left), dtype=np.bool_)
-    else:
-        result = np.empty(len(value_right), dtype=np.bool_)
+    index = index_left & index_right
+    result = np.empty(count_words(index), dtype=np.bool_)
 
+    cursor_result = 0
     cursor_left = 0
     cursor_right = 0
-    cursor_result = 0
+    for word_left, word_right in zip(index_left, index_right):
+        both = word_left & word_right
+        if both == FULL_WORD:
+            # Present in both sides, no need to check bits
+            for k in range(WORD_BITS):
+                if value_left[cursor_left + k] and value_right[cursor_right + k]:
+                    result[cursor_result + k] = 1
+                else:
+                    result[cursor_result + k] = 0
+            cursor_result += WORD_BITS
+            cursor_left += WORD_BITS
+            cursor_right += WORD_BITS
 
-    for il, ir in zip(index_left, index_right):
-        if il & ir:
-            if value_left[cursor_left] and value_right[cursor_right]:
-                result[cursor_result] = 1
-            else:
-                result[cursor_result] = 0
-            cursor_result += 1
-            cursor_left += 1
-            cursor_right += 1
+        elif both == EMPTY_WORD:
+            # Nothing to compute, skip the values of this word
+            cursor_left += popcount(word_left)
+            cursor_right += popcount(word_right)
+
+        else:
+            rest = word_left | word_right
+            while rest:
+                bit = rest & (~rest + ONE)
+                if both & bit:
+                    if value_left[cursor_left] and value_right[cursor_right]:
+                        result[cursor_result] = 1
+                    else:
+                        result[cursor_result] = 0
+                    cursor_result += 1
+                    cursor_left += 1
+                    cursor_right += 1
+
+                elif word_left & bit:
+                    cursor_left += 1
 
-        elif il:
-            cursor_left += 1
+                else:
+                    cursor_right += 1
 
-        elif ir:
-            cursor_right += 1
+                rest ^= bit
 
-    return result[:cursor_result], index
+    return result, index
 
 
 @jit(nopython=True, nogil=True, cache=True)
 def apply_fast_or(value_left, value_right, index_left, index_right):
-    index = index_left * index_right
-    if len(value_left) > len(value_right):
-        result = np.empty(len(value_left), dtype=np.bool_)
-    else:
-        result = np.empty(len(value_right), dtype=np.bool_)
+    index = index_left & index_right
+    result = np.empty(count_words(index), dtype=np.bool_)
 
+    cursor_result = 0
     cursor_left = 0
     cursor_right = 0
-    cursor_result = 0
+    for word_left, word_right in zip(index_left, index_right):
+        both = word_left & word_right
+        if both == FULL_WORD:
+            # Present in both sides, no need to check bits
+            for k in range(WORD_BITS):
+                if value_left[cursor_left + k] or value_right[cursor_right + k]:
+                    result[cursor_result + k] = 1
+                else:
+                    result[cursor_result + k] = 0
+            cursor_result += WORD_BITS
+            cursor_left += WORD_BITS
+            cursor_right += WORD_BITS
 
-    for il, ir in zip(index_left, index_right):
-        if il & ir:
-            if value_left[cursor_left] or value_right[cursor_right]:
-                result[cursor_result] = 1
-            else:
-                result[cursor_result] = 0
-            cursor_result += 1
-            cursor_left += 1
-            cursor_right += 1
+        elif both == EMPTY_WORD:
+            # Nothing to compute, skip the values of this word
+            cursor_left += popcount(word_left)
+            cursor_right += popcount(word_right)
+
+        else:
+            rest = word_left | word_right
+            while rest:
+                bit = rest & (~rest + ONE)
+                if both & bit:
+                    if value_left[cursor_left] or value_right[cursor_right]:
+                        result[cursor_result] = 1
+                    else:
+                        result[cursor_result] = 0
+                    cursor_result += 1
+                    cursor_left += 1
+                    cursor_right += 1
+
+                elif word_left & bit:
+                    cursor_left += 1
 
-        elif il:
-            cursor_left += 1
+                else:
+                    cursor_right += 1
 
-        elif ir:
-            cursor_right += 1
+                rest ^= bit
 
-    return result[:cursor_result], index
+    return result, index
 
 
 @jit(nopython=True, nogil=True, cache=True)
 def apply_fast_xor(value_left, value_right, index_left, index_right):
-    index = index_left * index_right
-    if len(value_left) > len(value_right):
-        result = np.empty(len(value_left), dtype=np.bool_)
-    else:
-        result = np.empty(len(value_right), dtype=np.bool_)
+    index = index_left & index_right
+    result = np.empty(count_words(index), dtype=np.bool_)
 
+    cursor_result = 0
     cursor_left = 0
     cursor_right = 0
-    cursor_result = 0
-
-    for il, ir in zip(index_left, index_right):
-        if il & ir:
-            if value_left[cursor_left]:
-                if value_right[cursor_right]:
-                    result[cursor_result] = 0
-                else:
-                    result[cursor_result] = 1
-            else:
-                if value_right[cursor_right]:
-                    result[cursor_result] = 1
+    for word_left, word_right in zip(index_left, index_right):
+        both = word_left & word_right
+        if both == FULL_WORD:
+            # Present in both sides, no need to check bits
+            for k in range(WORD_BITS):
+                if value_left[cursor_left + k]:
+                    if value_right[cursor_right + k]:
+                        result[cursor_result + k] = 0
+                    else:
+                        result[cursor_result + k] = 1
                 else:
-                    result[cursor_result] = 0
-            cursor_result += 1
-            cursor_left += 1
-            cursor_right += 1
+                    if value_right[cursor_right + k]:
+                        result[cursor_result + k] = 1
+                    else:
+                        result[cursor_result + k] = 0
+            cursor_result += WORD_BITS
+            cursor_left += WORD_BITS
+            cursor_right += WORD_BITS
 
-        elif il:
-            cursor_left += 1
+        elif both == EMPTY_WORD:
+            # Nothing to compute, skip the values of this word
+            cursor_left += popcount(word_left)
+            cursor_right += popcount(word_right)
 
-        elif ir:
-            cursor_right += 1
+        else:
+            rest = word_left | word_right
+            while rest:
+                bit = rest & (~rest + ONE)
+                if both & bit:
+                    if value_left[cursor_left]:
+                        if value_right[cursor_right]:
+                            result[cursor_result] = 0
+                        else:
+                            result[cursor_result] = 1
+                    else:
+                        if value_right[cursor_right]:
+                            result[cursor_result] = 1
+                        else:
+                            result[cursor_result] = 0
+                    cursor_result += 1
+                    cursor_left += 1
+                    cursor_right += 1
+
+                elif word_left & bit:
+                    cursor_left += 1
+
+                else:
+                    cursor_right += 1
 
-    return result[:cursor_result], index
+                rest ^= bit
+
+    return result, index
 
 
 @jit(nopython=True, nogil=True, cache=True)
 def apply_fast_eq(value_left, value_right, index_left, index_right):
-    index = index_left * index_right
-    if len(value_left) > len(value_right):
-        result = np.empty(len(value_left), dtype=np.bool_)
-    else:
-        result = np.empty(len(value_right), dtype=np.bool_)
+    index = index_left & index_right
+    result = np.empty(count_words(index), dtype=np.bool_)
 
     cursor_result = 0
     cursor_left = 0
     cursor_right = 0
-    for il, ir in zip(index_left, index_right):
-        if il & ir:
-            if value_left[cursor_left] == value_right[cursor_right]:
-                result[cursor_result] = 1
-            else:
-                result[cursor_result] = 0
-            cursor_result += 1
-            cursor_left += 1
-            cursor_right += 1
+    for word_left, word_right in zip(index_left, index_right):
+        both = word_left & word_right
+        if both == FULL_WORD:
+            # Present in both sides, no need to check bits
+            for k in range(WORD_BITS):
+                if value_left[cursor_left + k] == value_right[cursor_right + k]:
+                    result[cursor_result + k] = 1
+                else:
+                    result[cursor_result + k] = 0
+            cursor_result += WORD_BITS
+            cursor_left += WORD_BITS
+            cursor_right += WORD_BITS
+
+        elif both == EMPTY_WORD:
+            # Nothing to compute, skip the values of this word
+            cursor_left += popcount(word_left)
+            cursor_right += popcount(word_right)
+
+        else:
+            rest = word_left | word_right
+            while rest:
+                bit = rest & (~rest + ONE)
+                if both & bit:
+                    if value_left[cursor_left] == value_right[cursor_right]:
+                        result[cursor_result] = 1
+                    else:
+                        result[cursor_result] = 0
+                    cursor_result += 1
+                    cursor_left += 1
+                    cursor_right += 1
+
+                elif word_left & bit:
+                    cursor_left += 1
 
-        elif il:
-            cursor_left += 1
+                else:
+                    cursor_right += 1
 
-        elif ir:
-            cursor_right += 1
+                rest ^= bit
 
-    return result[:cursor_result], index
+    return result, index
 
 
 @jit(nopython=True, nogil=True, cache=True)
 def apply_fast_ne(value_left, value_right, index_left, index_right):
-    index = index_left * index_right
-    if len(value_left) > len(value_right):
-        result = np.empty(len(value_left), dtype=np.bool_)
-    else:
-        result = np.empty(len(value_right), dtype=np.bool_)
+    index = index_left & index_right
+    result = np.empty(count_words(index), dtype=np.bool_)
 
     cursor_result = 0
     cursor_left = 0
     cursor_right = 0
-    for il, ir in zip(index_left, index_right):
-        if il & ir:
-            if value_left[cursor_left] != value_right[cursor_right]:
-                result[cursor_result] = 1
-            else:
-                result[cursor_result] = 0
-            cursor_result += 1
-            cursor_left += 1
-            cursor_right += 1
+    for word_left, word_right in zip(index_left, index_right):
+        both = word_left & word_right
+        if both == FULL_WORD:
+            # Present in both sides, no need to check bits
+            for k in range(WORD_BITS):
+                if value_left[cursor_left + k] != value_right[cursor_right + k]:
+                    result[cursor_result + k] = 1
+                else:
+                    result[cursor_result + k] = 0
+            cursor_result += WORD_BITS
+            cursor_left += WORD_BITS
+            cursor_right += WORD_BITS
+
+        elif both == EMPTY_WORD:
+            # Nothing to compute, skip the values of this word
+            cursor_left += popcount(word_left)
+            cursor_right += popcount(word_right)
 
-        elif il:
-            cursor_left += 1
+        else:
+            rest = word_left | word_right
+            while rest:
+                bit = rest & (~rest + ONE)
+                if both & bit:
+                    if value_left[cursor_left] != value_right[cursor_right]:
+                        result[cursor_result] = 1
+                    else:
+                        result[cursor_result] = 0
+                    cursor_result += 1
+                    cursor_left += 1
+                    cursor_right += 1
+
+                elif word_left & bit:
+                    cursor_left += 1
+
+                else:
+                    cursor_right += 1
 
-        elif ir:
-            cursor_right += 1
+                rest ^= bit
 
-    return result[:cursor_result], index
+    return result, index
 
 
 @jit(nopython=True, nogil=True, cache=True)
@@ -528,18 +901,17 @@ def apply_mask_column(data, index, mask):
     Sieve picks a mask over data and returns the filtered data array and index
     """
     new_data = data[mask]
-    new_index = np.empty_like(index)
+    new_index = np.zeros_like(index)
 
     data_cursor = 0
-    for i, idx in enumerate(index):
-        if idx:
+    for w, word in enumerate(index):
+        rest = word
+        while rest:
+            bit = rest & (~rest + ONE)
             if mask[data_cursor]:
-                new_index[i] = 1
-            else:
-                new_index[i] = 0
+                new_index[w] |= bit
             data_cursor += 1
-        else:
-            new_index[i] = 0
+            rest ^= bit
 
     return new_data, new_index
 
@@ -570,8 +942,42 @@ def isin_sorted(base, test):
     return result
 
 
+@jit(nopython=True, nogil=True, cache=True)
+def monotonic(values):
+    """
+    Order of the values in a single pass, without allocations. Values that
+    can not be compared, like NaN or NaT, break the order.
+
+    :param values: Array of numbers, booleans or dates
+    :return: 2 if strictly increasing, 1 if increasing, -1 if decreasing,
+      -2 if strictly decreasing and 0 otherwise.
+    """
+    increasing = True
+    decreasing = True
+    strict = True
+    for i in range(1, len(values)):
+        if values[i] > values[i - 1]:
+            decreasing = False
+        elif values[i] < values[i - 1]:
+            increasing = False
+        elif values[i] == values[i - 1]:
+            strict = False
+        else:
+            return 0
+
+        if not increasing and not decreasing:
+            return 0
+
+    if increasing:
+        return 2 if strict else 1
+    return -2 if strict else -1
+
+
+# The set operations on sorted arrays are not used by the joins, that
+# keep repeated keys, but they are part of the API for sorted calendars.
 @jit(nopython=True, nogil=True, cache=True)
 def intersection_sorted(base, test):
+    """Values of base also in test, both sorted"""
     result = np.empty(base.shape, dtype=base.dtype)
     cursor_result = 0
     cursor_test = 0
@@ -596,6 +1002,7 @@ def intersection_sorted(base, test):
 
 @jit(nopython=True, nogil=True, cache=True)
 def union_sorted(base, test):
+    """Sorted values of base or test without repetitions, both sorted"""
     result = np.empty(base.shape[0] + test.shape[0], dtype=base.dtype)
     cursor_result = 0
     cursor_base = 0
@@ -673,299 +1080,443 @@ def union_sorted(base, test):
     return result[:cursor_result]
 
 
+# Fibonacci hashing, the multiplier is 2^64 divided by the golden ratio
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
 @jit(nopython=True, nogil=True, cache=True)
-def join_low_level(data_left, index_left,
-                   data_right, index_right,
-                   common_rec):
-    """This is probably the hardest function of all. It returns the joined array
-    plus the indices for the left and right data that produce the join. The most
-    important detail is that, for the left and right index, a negative value
-    means that the value must not be present in the joined column. There are
-    two passes over the data, the first one is get the size of the arrays
-    that have to be allocated, and the second is the actual computation of
-    the join. This is only used for full outer joins, but it should work for
-    left and right joins too. Due to numba limitations, you cannot use
-    a column of strings to join two tables."""
-    data_filter_left = isin_sorted(data_left, common_rec)
-    data_filter_right = isin_sorted(data_right, common_rec)
-
-    filtered_data_left, index_left = apply_mask_column(
-        data_left, index_left, data_filter_left)
-    filtered_data_right, index_right = apply_mask_column(
-        data_right, index_right, data_filter_right)
-
-    left_len = len(filtered_data_left)
-    right_len = len(filtered_data_right)
-    data_joined = np.empty(left_len + right_len, dtype=filtered_data_left.dtype)
-    order_left = np.empty(left_len + right_len, dtype=np.int64)
-    order_right = np.empty(left_len + right_len, dtype=np.int64)
-
-    stop_left = False
-    stop_right = False
-    cur_left = 0
-    cur_right = 0
-    added = 0
-
-    while added < left_len + right_len:  # Upper limit to prevent Inf loop
-        if filtered_data_left[cur_left] < filtered_data_right[cur_right]:
-            if stop_left:
-                if data_filter_right[cur_right]:
-                    data_joined[added] = filtered_data_right[cur_right]
-                    order_left[added] = cur_left
-                    order_right[added] = cur_right
-                    added += 1
-                if cur_right == right_len - 1:
-                    stop_right = True
-                else:
-                    cur_right += 1
-            else:
-                if data_filter_left[cur_left]:
-                    data_joined[added] = filtered_data_left[cur_left]
-                    order_left[added] = cur_left
-                    order_right[added] = cur_right
-                    added += 1
-                if cur_left == left_len - 1:
-                    stop_left = True
-                else:
-                    cur_left += 1
+def hash_lookup(values, slots, bits, value, key_hash):
+    """First position of value in a table built by hash_build, or -1"""
+    mask = len(slots) - 1
+    slot = np.int64((np.uint64(key_hash) * HASH_MULTIPLIER) >>
+                    np.uint64(64 - bits))
+    while True:
+        head = slots[slot]
+        if head < 0 or values[head] == value:
+            return head
+        slot = (slot + 1) & mask
 
-        elif filtered_data_left[cur_left] == filtered_data_right[cur_right]:
-            # Both filters always true
-            data_joined[added] = filtered_data_left[cur_left]
-            order_left[added] = cur_left
-            order_right[added] = cur_right
 
-            if cur_left == left_len - 1:
-                stop_left = True
-            else:
-                cur_left += 1
-            if cur_right == right_len - 1:
-                stop_right = True
-            else:
-                cur_right += 1
+@jit(nopython=True, nogil=True, cache=True)
+def hash_build(values, hashes, bits):
+    """
+    Open addressing hash table with the positions of the values. slots
+    holds the first position of each value, and following chains the
+    positions of the repeated values in order. Values that are not equal
+    to themselves, like NaN, are not added.
+    """
+    slots = np.full(1 << bits, -1, dtype=np.int64)
+    following = np.full(len(values), -1, dtype=np.int64)
+    last = np.empty(len(values), dtype=np.int64)
+    mask = len(slots) - 1
+
+    for i in range(len(values)):
+        value = values[i]
+        if value != value:
+            continue
 
-            added += 1
+        slot = np.int64((np.uint64(hashes[i]) * HASH_MULTIPLIER) >>
+                        np.uint64(64 - bits))
+        while True:
+            head = slots[slot]
+            if head < 0:
+                slots[slot] = i
+                last[i] = i
+                break
+            elif values[head] == value:
+                following[last[head]] = i
+                last[head] = i
+                break
+            slot = (slot + 1) & mask
 
+    return slots, following
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def hash_probe(build, slots, following, bits, probe, hashes, keep_probe,
+               keep_build):
+    """
+    Probe the hash table of the build values with the probe values. The
+    rows of the join follow the order of the probe values. With keep_probe
+    the probe values without a match get a row, and with keep_build the
+    build values without a match are added at the end. There are two
+    passes, the first one counts the rows and the second one fills them.
+
+    :return: positions of the build values and of the probe values of
+      each row, -1 if the row has no value from that side.
+    """
+    matched = np.zeros(len(build), dtype=np.bool_)
+    heads = np.empty(len(probe), dtype=np.int64)
+    size = 0
+    for j in range(len(probe)):
+        head = -1
+        if probe[j] == probe[j]:
+            head = hash_lookup(build, slots, bits, probe[j], hashes[j])
+        heads[j] = head
+
+        if head < 0:
+            if keep_probe:
+                size += 1
         else:
-            if stop_right:
-                if data_filter_left[cur_left]:
-                    data_joined[added] = filtered_data_left[cur_left]
-                    order_left[added] = cur_left
-                    order_right[added] = cur_right
-                    added += 1
-                if cur_left == left_len - 1:
-                    stop_left = True
-                else:
-                    cur_left += 1
+            i = head
+            while i >= 0:
+                matched[i] = True
+                size += 1
+                i = following[i]
+
+    if keep_build:
+        for i in range(len(build)):
+            if not matched[i]:
+                size += 1
+
+    build_positions = np.empty(size, dtype=np.int64)
+    probe_positions = np.empty(size, dtype=np.int64)
+    cursor = 0
+    for j in range(len(probe)):
+        i = heads[j]
+        if i < 0 and keep_probe:
+            build_positions[cursor] = -1
+            probe_positions[cursor] = j
+            cursor += 1
+        while i >= 0:
+            build_positions[cursor] = i
+            probe_positions[cursor] = j
+            cursor += 1
+            i = following[i]
+
+    if keep_build:
+        for i in range(len(build)):
+            if not matched[i]:
+                build_positions[cursor] = i
+                probe_positions[cursor] = -1
+                cursor += 1
+
+    return build_positions, probe_positions
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def hash_member(build, slots, bits, probe, hashes):
+    """True for the probe values present in the hash table"""
+    result = np.zeros(len(probe), dtype=np.bool_)
+    for j in range(len(probe)):
+        if probe[j] == probe[j]:
+            result[j] = hash_lookup(build, slots, bits, probe[j],
+                                    hashes[j]) >= 0
+    return result
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def merge_rows(left, right, keep_left, keep_right, positions_left,
+               positions_right, fill):
+    """
+    Rows of the join of two sorted arrays. Each pair of equal values gives
+    a row, and with keep_left or keep_right the values without a match
+    give a row too. The positions are written only if fill is True.
+
+    :return: number of rows
+    """
+    rows = 0
+    i = 0
+    j = 0
+    while i < len(left) or j < len(right):
+        if j == len(right) or (i < len(left) and left[i] < right[j]):
+            take_left = True
+        elif i == len(left) or right[j] < left[i]:
+            take_left = False
+        elif left[i] == right[j]:
+            # Runs of equal values give their cartesian product
+            i_end = i + 1
+            while i_end < len(left) and left[i_end] == left[i]:
+                i_end += 1
+            j_end = j + 1
+            while j_end < len(right) and right[j_end] == right[j]:
+                j_end += 1
+
+            if fill:
+                for a in range(i, i_end):
+                    for b in range(j, j_end):
+                        positions_left[rows] = a
+                        positions_right[rows] = b
+                        rows += 1
             else:
-                if data_filter_right[cur_right]:
-                    data_joined[added] = filtered_data_right[cur_right]
-                    order_left[added] = cur_left
-                    order_right[added] = cur_right
-                    added += 1
-                if cur_right == right_len - 1:
-                    stop_right = True
-                else:
-                    cur_right += 1
+                rows += (i_end - i) * (j_end - j)
+
+            i = i_end
+            j = j_end
+            continue
+        else:
+            # Values that can not be compared, like NaN, never match
+            take_left = left[i] != left[i]
+
+        if take_left:
+            if keep_left:
+                if fill:
+                    positions_left[rows] = i
+                    positions_right[rows] = -1
+                rows += 1
+            i += 1
+        else:
+            if keep_right:
+                if fill:
+                    positions_left[rows] = -1
+                    positions_right[rows] = j
+                rows += 1
+            j += 1
+
+    return rows
 
-        if stop_left and stop_right:
-            break
 
-    index_mapping_left = np.arange(len(index_left))[index_left == 1]
-    index_mapping_right = np.arange(len(index_right))[index_right == 1]
+def merge_positions(left, right, keep_left=False, keep_right=False):
+    """
+    Positions of the values of the join of two sorted arrays. The rows are
+    counted first, so the positions are allocated once.
+
+    :return: positions of the left and right values of each row, -1 if
+      the row has no value from that side.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    size = merge_rows(left, right, keep_left, keep_right, empty, empty,
+                      False)
+    positions_left = np.empty(size, dtype=np.int64)
+    positions_right = np.empty(size, dtype=np.int64)
+    merge_rows(left, right, keep_left, keep_right, positions_left,
+               positions_right, True)
+
+    return positions_left, positions_right
+
+
+def hash_keys(values):
+    """Integer keys of the values, equal for equal values, to be hashed"""
+    kind = values.dtype.kind
+    if kind == 'f':
+        # Adding zero turns -0.0 into 0.0
+        return (values.astype(np.float64) + 0.0).view(np.int64)
+    elif kind in 'mM':
+        return values.view(np.int64)
+    return values.astype(np.int64, copy=False)
+
+
+def join_keys(data_left, data_right):
+    """
+    Keys of both sides of a join with a common dtype. Keys that the
+    kernels can not compare, like strings, are replaced by their position
+    in the sorted unique keys.
+
+    :return: the values with the common dtype, and the keys of each side
+    """
+    dtype = np.result_type(data_left, data_right)
+    data_left = data_left.astype(dtype, copy=False)
+    data_right = data_right.astype(dtype, copy=False)
+
+    if dtype.kind in 'biufmM':
+        return data_left, data_right, data_left, data_right
 
-    global_left = index_mapping_left[order_left[:added]]
-    global_right = index_mapping_right[order_right[:added]]
+    _, codes = np.unique(np.concatenate([data_left, data_right]),
+                         return_inverse=True)
+    return (data_left, data_right,
+            codes[:len(data_left)], codes[len(data_left):])
 
-    mask_left = isin_sorted(data_joined[:added], data_left)
-    mask_right = isin_sorted(data_joined[:added], data_right)
 
-    # Clean data with the mask
-    global_left[np.where(~mask_left)] = -1
-    global_right[np.where(~mask_right)] = -1
+def _hash_table(build):
+    # At most half of the slots are used
+    bits = max(int(len(build)).bit_length() + 1, 1)
+    slots, following = hash_build(build, hash_keys(build), bits)
+    return slots, following, bits
 
-    return data_joined[:added], global_left, global_right
+
+def _joined_rows(data_left, index_left, data_right, index_right, left,
+                 right):
+    """Joined keys and global indices from the positions of the values"""
+    present_left = left >= 0
+    present_right = right >= 0
+    joined = np.empty(len(left), dtype=data_left.dtype)
+    joined[present_left] = data_left[left[present_left]]
+    joined[~present_left] = data_right[right[~present_left]]
+
+    global_left = np.full(len(left), -1, dtype=np.int64)
+    global_left[present_left] = positions_words(index_left)[
+        left[present_left]]
+    global_right = np.full(len(right), -1, dtype=np.int64)
+    global_right[present_right] = positions_words(index_right)[
+        right[present_right]]
+
+    return joined, global_left, global_right
+
+
+def merge_join(data_left, index_left, data_right, index_right,
+               keep_left=False, keep_right=False):
+    """
+    Join of sorted keys by merging them, in the order of the keys. Keys
+    repeated on both sides give a row for each pair.
+
+    :param data_left: Sorted keys of the left table
+    :param index_left: Bitmap words of the keys of the left table
+    :param data_right: Sorted keys of the right table
+    :param index_right: Bitmap words of the keys of the right table
+    :param keep_left: Keep the left keys without a match
+    :param keep_right: Keep the right keys without a match
+    :return: joined keys, and global indices of the rows of the left and
+      the right table, negative if the row has no value from that side.
+    """
+    data_left, data_right, keys_left, keys_right = join_keys(data_left,
+                                                             data_right)
+    left, right = merge_positions(keys_left, keys_right, keep_left,
+                                  keep_right)
+    return _joined_rows(data_left, index_left, data_right, index_right,
+                        left, right)
+
+
+def hash_join(data_left, index_left, data_right, index_right,
+              keep_left=False, keep_right=False):
+    """
+    Join with a hash table of the keys of one side, probed with the keys
+    of the other one, so the keys do not have to be sorted. If only one
+    side keeps the keys without a match, the rows follow the order of that
+    side. Otherwise the smaller side is hashed and the rows follow the
+    order of the larger one, and the unmatched rows of the smaller side
+    come at the end.
+
+    :param data_left: Keys of the left table
+    :param index_left: Bitmap words of the keys of the left table
+    :param data_right: Keys of the right table
+    :param index_right: Bitmap words of the keys of the right table
+    :param keep_left: Keep the left keys without a match
+    :param keep_right: Keep the right keys without a match
+    :return: joined keys, and global indices of the rows of the left and
+      the right table, negative if the row has no value from that side.
+    """
+    data_left, data_right, keys_left, keys_right = join_keys(data_left,
+                                                             data_right)
+    if keep_left != keep_right:
+        swap = keep_left
+    else:
+        swap = len(keys_left) > len(keys_right)
+
+    if swap:
+        build, probe = keys_right, keys_left
+        keep_build, keep_probe = keep_right, keep_left
+    else:
+        build, probe = keys_left, keys_right
+        keep_build, keep_probe = keep_left, keep_right
+
+    slots, following, bits = _hash_table(build)
+    build_positions, probe_positions = hash_probe(
+        build, slots, following, bits, probe, hash_keys(probe), keep_probe,
+        keep_build)
+    left, right = ((probe_positions, build_positions) if swap
+                   else (build_positions, probe_positions))
+
+    return _joined_rows(data_left, index_left, data_right, index_right,
+                        left, right)
+
+
+def hash_isin(values, test):
+    """
+    True for the values present in test, with a hash table of test, so
+    none of them have to be sorted.
+    """
+    _, _, keys, test_keys = join_keys(values, test)
+    slots, _, bits = _hash_table(test_keys)
+    return hash_member(test_keys, slots, bits, keys, hash_keys(keys))
 
 
 @jit(nopython=True, nogil=True, cache=True)
-def reindex(index, global_index):
+def reindex(index, blocks, global_index):
     """Reindex a column data using a global (table-wise) index. A global
     index is the index for the full column, and this operation exists because
-    data columns can be shorter."""
+    data columns can be shorter. blocks is the rank directory of the index."""
     data_len = 0
-
     for idx in global_index:
         # Negative index means empty
-        if index[idx] == 1 and idx >= 0:
+        if idx >= 0 and test_bit(index, idx):
             data_len += 1
 
     new_data_index = np.empty(data_len, dtype=np.int64)
-    new_index = np.empty(len(global_index), dtype=np.uint8)
-    data_index = index.cumsum() - np.array(1)
+    new_index = np.zeros((len(global_index) + WORD_BITS - 1) // WORD_BITS,
+                         dtype=np.uint64)
 
     data_cursor = 0
-    cursor = 0
-
-    for idx in global_index:
-        if idx < 0:
-            new_index[cursor] = 0
-        elif index[idx]:
-            new_data_index[data_cursor] = int(data_index[idx])
+    for cursor, idx in enumerate(global_index):
+        if idx >= 0 and test_bit(index, idx):
+            new_data_index[data_cursor] = rank_block(index, blocks, idx)
             data_cursor += 1
-            new_index[cursor] = 1
-        else:
-            new_index[cursor] = 0
-
-        cursor += 1
+            set_bit(new_index, cursor)
 
     return new_data_index, new_index
 
 
 # This is an important wrapper, since numba does not know how to deal with
 # unicode strings.
-def reindex_column(data, index, global_index):
-    new_data_index, new_index = reindex(index, global_index)
-    return data[new_data_index], new_index
-
-
-@jit(nopython=True, nogil=True, cache=True)
-def reindex_join(left_index, right_index,
-                 left_global_index, right_global_index):
-    """Applies a global index"""
-    # TODO: Clean unused variables.
-    len_left = len(left_index)
-    len_right = len(right_index)
-
-    lid = np.empty(len_left + len_right, dtype=np.bool_)
-    rid = np.empty(len_left + len_right, dtype=np.bool_)
-    left_global = np.empty(len_left, dtype=np.int64)
-    right_global = np.empty(len_right, dtype=np.int64)
-    index_global = np.zeros(len(left_global_index), dtype=np.uint8)
-
-    idx_data = 0
-    idx_left = 0
-    idx_right = 0
-    idx_left_cur = 0
-    idx_right_cur = 0
-    idx_index = 0
-    
-    for left_gidx, right_gidx in zip(left_global_index, right_global_index):
-        if left_gidx >= 0:
-            if left_index[idx_left_cur] > 0:
-                left_global[idx_left] = left_gidx
-                index_global[idx_index] = 1
-                idx_left += 1
-                lid[idx_data] = True
-                rid[idx_data] = False
-                idx_data += 1
-                if right_gidx >= 0:
-                    idx_right_cur += 1
-
-            else:
-                if right_gidx >= 0:
-                    if right_index[idx_right_cur] > 0:
-                        right_global[idx_right] = right_gidx
-                        index_global[idx_index] = 1
-                        idx_right += 1
-                        lid[idx_data] = False
-                        rid[idx_data] = True
-                        idx_data += 1
-                    idx_right_cur += 1
-
-            idx_left_cur += 1
-                    
-        elif right_gidx >= 0:
-            if right_index[idx_right_cur] > 0:
-                right_global[idx_right] = right_gidx
-                index_global[idx_index] = 1
-                idx_right += 1
-                lid[idx_data] = False
-                rid[idx_data] = True
-                idx_data += 1
-                if left_gidx >= 0:
-                    idx_left_cur += 1
-
-            else:
-                if left_gidx >= 0:
-                    if left_index[idx_left_cur] > 0:
-                        left_global[idx_left] = left_gidx
-                        index_global[idx_index] = 1
-                        idx_left += 1
-                        lid[idx_data] = True
-                        rid[idx_data] = False
-                        idx_data += 1
-                    idx_left_cur += 1
-
-            idx_right_cur += 1
-        idx_index += 1
-
-    return (index_global[:idx_index],
-            left_global[:idx_left],
-            right_global[:idx_right],
-            lid[:idx_data],
-            rid[:idx_data],
-            idx_data)
+def reindex_column(data, bitmap, global_index):
+    if bitmap.dense:
+        # Every row is present, so the global index is the data index
+        present = global_index >= 0
+        return data[global_index[present]], Bitmap.from_index(present)
 
+    elif bitmap.runs is not None:
+        present = global_index >= 0
+        present[present] = bitmap.present(global_index[present])
+        return (data[bitmap.rank(global_index[present])],
+                Bitmap.from_index(present))
 
-# Same wrapper for column join
-def reindex_join_columns(left_column, right_column,
-                         left_global_index, right_global_index):
-
-    new_index, left_global, right_global, lid, rid, size = reindex_join(
-        left_column.index, right_column.index,
-        left_global_index, right_global_index)
-
-    data = np.empty(size, dtype=left_column.values.dtype)
-    data[lid] = left_column.values[left_global]
-    data[rid] = right_column.values[right_global]
-
-    return data, new_index
+    new_data_index, new_index = parallel_version(reindex, len(bitmap))(
+        bitmap.words, bitmap.rank_directory(), global_index)
+    return data[new_data_index], Bitmap.from_words(new_index,
+                                                   len(global_index))
 
 
 @generated_jit(nopython=True, nogil=True, cache=True)
 def reduce_sum(key_data, key_index, col_data, col_index, size):
-    result_dtype = col_data.dtype
+    result_dtype = sum_dtype(as_dtype(col_data.dtype))
 
     def f(key_data, key_index, col_data, col_index, size):
         prev_key_data = key_data[0]
 
         reduction_started = False
-        new_index = np.zeros(size, dtype=np.uint8)
+        new_index = np.zeros((size + WORD_BITS - 1) // WORD_BITS,
+                             dtype=np.uint64)
         reduced = np.empty(size, dtype=result_dtype)
         key_data_cursor = -1
         col_data_cursor = -1
         new_index_cursor = -1
         red_index = 0
 
-        for idxk, idxd in zip(key_index, col_index):
-            if idxk == 1:
-                key_data_cursor += 1
-                if prev_key_data != key_data[key_data_cursor] or \
-                                key_data_cursor == 0:
-                    new_index_cursor += 1
-
-            if idxd == 1:
-                col_data_cursor += 1
-
-            if idxk == idxd == 1:
-                if reduction_started:
-                    if prev_key_data == key_data[key_data_cursor]:
-                        # Here is the reduction of repeated keys
-                        reduced[red_index] += col_data[col_data_cursor]
+        for word_key, word_col in zip(key_index, col_index):
+            rest = word_key | word_col
+            while rest:
+                bit = rest & (~rest + ONE)
+                idxk = word_key & bit
+                idxd = word_col & bit
+                if idxk:
+                    key_data_cursor += 1
+                    if prev_key_data != key_data[key_data_cursor] or \
+                                    key_data_cursor == 0:
+                        new_index_cursor += 1
+
+                if idxd:
+                    col_data_cursor += 1
+
+                if idxk and idxd:
+                    if reduction_started:
+                        if prev_key_data == key_data[key_data_cursor]:
+                            # Here is the reduction of repeated keys
+                            reduced[red_index] += col_data[col_data_cursor]
+                        else:
+                            red_index += 1
+                            # Here is the addition of the first key
+                            reduced[red_index] = col_data[col_data_cursor]
+                            set_bit(new_index, new_index_cursor)
                     else:
-                        red_index += 1
-                        # Here is the addition of the first key
+                        # Here is the addition of the absolutely first key
                         reduced[red_index] = col_data[col_data_cursor]
-                        new_index[new_index_cursor] = 1
-                else:
-                    # Here is the addition of the absolutely first key
-                    reduced[red_index] = col_data[col_data_cursor]
-                    new_index[new_index_cursor] = 1
+                        set_bit(new_index, new_index_cursor)
+                        prev_key_data = key_data[key_data_cursor]
+                        reduction_started = True
+
+                if idxk:
                     prev_key_data = key_data[key_data_cursor]
-                    reduction_started = True
 
-            if idxk == 1:
-                prev_key_data = key_data[key_data_cursor]
+                rest ^= bit
 
         return reduced[:red_index+1], new_index
 
@@ -974,48 +1525,56 @@ def reduce_sum(key_data, key_index, col_data, col_index, size):
 
 @generated_jit(nopython=True, nogil=True, cache=True)
 def reduce_prod(key_data, key_index, col_data, col_index, size):
-    result_dtype = col_data.dtype
+    result_dtype = sum_dtype(as_dtype(col_data.dtype))
 
     def f(key_data, key_index, col_data, col_index, size):
         prev_key_data = key_data[0]
 
         reduction_started = False
-        new_index = np.zeros(size, dtype=np.uint8)
+        new_index = np.zeros((size + WORD_BITS - 1) // WORD_BITS,
+                             dtype=np.uint64)
         reduced = np.empty(size, dtype=result_dtype)
         key_data_cursor = -1
         col_data_cursor = -1
         new_index_cursor = -1
         red_index = 0
 
-        for idxk, idxd in zip(key_index, col_index):
-            if idxk == 1:
-                key_data_cursor += 1
-                if prev_key_data != key_data[key_data_cursor] or \
-                                key_data_cursor == 0:
-                    new_index_cursor += 1
-
-            if idxd == 1:
-                col_data_cursor += 1
-
-            if idxk == idxd == 1:
-                if reduction_started:
-                    if prev_key_data == key_data[key_data_cursor]:
-                        # Here is the reduction of repeated keys
-                        reduced[red_index] *= col_data[col_data_cursor]
+        for word_key, word_col in zip(key_index, col_index):
+            rest = word_key | word_col
+            while rest:
+                bit = rest & (~rest + ONE)
+                idxk = word_key & bit
+                idxd = word_col & bit
+                if idxk:
+                    key_data_cursor += 1
+                    if prev_key_data != key_data[key_data_cursor] or \
+                                    key_data_cursor == 0:
+                        new_index_cursor += 1
+
+                if idxd:
+                    col_data_cursor += 1
+
+                if idxk and idxd:
+                    if reduction_started:
+                        if prev_key_data == key_data[key_data_cursor]:
+                            # Here is the reduction of repeated keys
+                            reduced[red_index] *= col_data[col_data_cursor]
+                        else:
+                            red_index += 1
+                            # Here is the addition of the first key
+                            reduced[red_index] = col_data[col_data_cursor]
+                            set_bit(new_index, new_index_cursor)
                     else:
-                        red_index += 1
-                        # Here is the addition of the first key
+                        # Here is the addition of the absolutely first key
                         reduced[red_index] = col_data[col_data_cursor]
-                        new_index[new_index_cursor] = 1
-                else:
-                    # Here is the addition of the absolutely first key
-                    reduced[red_index] = col_data[col_data_cursor]
-                    new_index[new_index_cursor] = 1
+                        set_bit(new_index, new_index_cursor)
+                        prev_key_data = key_data[key_data_cursor]
+                        reduction_started = True
+
+                if idxk:
                     prev_key_data = key_data[key_data_cursor]
-                    reduction_started = True
 
-            if idxk == 1:
-                prev_key_data = key_data[key_data_cursor]
+                rest ^= bit
 
         return reduced[:red_index+1], new_index
 
@@ -1024,147 +1583,647 @@ def reduce_prod(key_data, key_index, col_data, col_index, size):
 
 @generated_jit(nopython=True, nogil=True, cache=True)
 def reduce_mean(key_data, key_index, col_data, col_index, size):
-    result_dtype = col_data.dtype
+    # Accumulated in double precision, the result has the numpy dtype
+    result_dtype = mean_dtype(as_dtype(col_data.dtype))
 
     def f(key_data, key_index, col_data, col_index, size):
         prev_key_data = key_data[0]
 
         reduction_started = False
-        new_index = np.zeros(size, dtype=np.uint8)
-        sum = np.empty(size, dtype=result_dtype)
+        new_index = np.zeros((size + WORD_BITS - 1) // WORD_BITS,
+                             dtype=np.uint64)
+        sum = np.empty(size, dtype=np.float64)
         num = np.empty(size, dtype=np.int64)
         key_data_cursor = -1
         col_data_cursor = -1
         new_index_cursor = -1
         red_index = 0
 
-        for idxk, idxd in zip(key_index, col_index):
-            if idxk == 1:
-                key_data_cursor += 1
-                if prev_key_data != key_data[key_data_cursor] or \
-                                key_data_cursor == 0:
-                    new_index_cursor += 1
-
-            if idxd == 1:
-                col_data_cursor += 1
-
-            if idxk == idxd == 1:
-                if reduction_started:
-                    if prev_key_data == key_data[key_data_cursor]:
-                        # Here is the reduction of repeated keys
-                        sum[red_index] += col_data[col_data_cursor]
-                        num[red_index] += 1
+        for word_key, word_col in zip(key_index, col_index):
+            rest = word_key | word_col
+            while rest:
+                bit = rest & (~rest + ONE)
+                idxk = word_key & bit
+                idxd = word_col & bit
+                if idxk:
+                    key_data_cursor += 1
+                    if prev_key_data != key_data[key_data_cursor] or \
+                                    key_data_cursor == 0:
+                        new_index_cursor += 1
+
+                if idxd:
+                    col_data_cursor += 1
+
+                if idxk and idxd:
+                    if reduction_started:
+                        if prev_key_data == key_data[key_data_cursor]:
+                            # Here is the reduction of repeated keys
+                            sum[red_index] += col_data[col_data_cursor]
+                            num[red_index] += 1
+                        else:
+                            red_index += 1
+                            # Here is the addition of the first key
+                            sum[red_index] = col_data[col_data_cursor]
+                            set_bit(new_index, new_index_cursor)
+                            num[red_index] = 1
                     else:
-                        red_index += 1
-                        # Here is the addition of the first key
+                        # Here is the addition of the absolutely first key
                         sum[red_index] = col_data[col_data_cursor]
-                        new_index[new_index_cursor] = 1
                         num[red_index] = 1
-                else:
-                    # Here is the addition of the absolutely first key
-                    sum[red_index] = col_data[col_data_cursor]
-                    num[red_index] = 1
-                    new_index[new_index_cursor] = 1
+                        set_bit(new_index, new_index_cursor)
+                        prev_key_data = key_data[key_data_cursor]
+                        reduction_started = True
+
+                if idxk:
                     prev_key_data = key_data[key_data_cursor]
-                    reduction_started = True
 
-            if idxk == 1:
-                prev_key_data = key_data[key_data_cursor]
+                rest ^= bit
 
-        return sum[:red_index + 1] / num[:red_index + 1], new_index
+        mean = sum[:red_index + 1] / num[:red_index + 1]
+        return mean.astype(result_dtype), new_index
 
     return f
 
 
 @generated_jit(nopython=True, nogil=True, cache=True)
 def reduce_std(key_data, key_index, col_data, col_index, size):
-    result_dtype = col_data.dtype
+    # Accumulated in double precision, the result has the numpy dtype
+    result_dtype = mean_dtype(as_dtype(col_data.dtype))
 
     def f(key_data, key_index, col_data, col_index, size):
         prev_key_data = key_data[0]
 
         reduction_started = False
-        new_index = np.zeros(size, dtype=np.uint8)
-        sum = np.empty(size, dtype=result_dtype)
-        sumsq = np.empty(size, dtype=result_dtype)
+        new_index = np.zeros((size + WORD_BITS - 1) // WORD_BITS,
+                             dtype=np.uint64)
+        sum = np.empty(size, dtype=np.float64)
+        sumsq = np.empty(size, dtype=np.float64)
         num = np.empty(size, dtype=np.int64)
         key_data_cursor = -1
         col_data_cursor = -1
         new_index_cursor = -1
         red_index = 0
 
-        for idxk, idxd in zip(key_index, col_index):
-            if idxk == 1:
-                key_data_cursor += 1
-                if prev_key_data != key_data[key_data_cursor] or \
-                                key_data_cursor == 0:
-                    new_index_cursor += 1
-
-            if idxd == 1:
-                col_data_cursor += 1
-
-            if idxk == idxd == 1:
-                if reduction_started:
-                    if prev_key_data == key_data[key_data_cursor]:
-                        # Here is the reduction of repeated keys
-                        sum[red_index] += col_data[col_data_cursor]
-                        sumsq[red_index] += col_data[col_data_cursor]**2
-                        num[red_index] += 1
+        for word_key, word_col in zip(key_index, col_index):
+            rest = word_key | word_col
+            while rest:
+                bit = rest & (~rest + ONE)
+                idxk = word_key & bit
+                idxd = word_col & bit
+                if idxk:
+                    key_data_cursor += 1
+                    if prev_key_data != key_data[key_data_cursor] or \
+                                    key_data_cursor == 0:
+                        new_index_cursor += 1
+
+                if idxd:
+                    col_data_cursor += 1
+
+                if idxk and idxd:
+                    if reduction_started:
+                        if prev_key_data == key_data[key_data_cursor]:
+                            # Here is the reduction of repeated keys
+                            sum[red_index] += col_data[col_data_cursor]
+                            sumsq[red_index] += col_data[col_data_cursor]**2
+                            num[red_index] += 1
+                        else:
+                            red_index += 1
+                            # Here is the addition of the first key
+                            sum[red_index] = col_data[col_data_cursor]
+                            sumsq[red_index] = col_data[col_data_cursor]**2
+                            set_bit(new_index, new_index_cursor)
+                            num[red_index] = 1
                     else:
-                        red_index += 1
-                        # Here is the addition of the first key
+                        # Here is the addition of the absolutely first key
                         sum[red_index] = col_data[col_data_cursor]
                         sumsq[red_index] = col_data[col_data_cursor]**2
-                        new_index[new_index_cursor] = 1
                         num[red_index] = 1
-                else:
-                    # Here is the addition of the absolutely first key
-                    sum[red_index] = col_data[col_data_cursor]
-                    sumsq[red_index] = col_data[col_data_cursor]**2
-                    num[red_index] = 1
-                    new_index[new_index_cursor] = 1
+                        set_bit(new_index, new_index_cursor)
+                        prev_key_data = key_data[key_data_cursor]
+                        reduction_started = True
+
+                if idxk:
                     prev_key_data = key_data[key_data_cursor]
-                    reduction_started = True
 
-            if idxk == 1:
-                prev_key_data = key_data[key_data_cursor]
+                rest ^= bit
 
         meansq = (sum[:red_index + 1] / num[:red_index + 1])**2
         sumsqn = sumsq[:red_index + 1] / num[:red_index + 1]
-        return np.sqrt(sumsqn - meansq), new_index
+        return np.sqrt(sumsqn - meansq).astype(result_dtype), new_index
 
     return f
 
 
 @jit(nopython=True, nogil=True, cache=True)
 def gen_column_filter(p_values, p_index, c_index):
-    data_filter = np.empty(c_index.sum(), dtype=np.bool_)
-    new_index = np.zeros(p_values.sum(), dtype=np.uint8)
+    data_filter = np.empty(count_words(c_index), dtype=np.bool_)
+    new_index = np.zeros((p_values.sum() + WORD_BITS - 1) // WORD_BITS,
+                         dtype=np.uint64)
 
     p_values_cursor = 0
     d_values_cursor = 0
     d_index_cursor = 0
 
-    for p_i, c_i in zip(p_index, c_index):
-        if p_i and c_i:
-            if p_values[p_values_cursor]:
-                new_index[d_index_cursor] = 1
-                data_filter[d_values_cursor] = True
-                d_index_cursor += 1
+    for word_p, word_c in zip(p_index, c_index):
+        rest = word_p | word_c
+        while rest:
+            bit = rest & (~rest + ONE)
+            if word_p & bit and word_c & bit:
+                if p_values[p_values_cursor]:
+                    set_bit(new_index, d_index_cursor)
+                    data_filter[d_values_cursor] = True
+                    d_index_cursor += 1
+                else:
+                    data_filter[d_values_cursor] = False
+
+                p_values_cursor += 1
+                d_values_cursor += 1
+
+            elif word_p & bit:
+                if p_values[p_values_cursor]:
+                    d_index_cursor += 1
+                p_values_cursor += 1
+
             else:
                 data_filter[d_values_cursor] = False
+                d_values_cursor += 1
 
-            p_values_cursor += 1
-            d_values_cursor += 1
+            rest ^= bit
 
-        elif p_i:
-            if p_values[p_values_cursor]:
-                new_index[d_index_cursor] = 0
-                d_index_cursor += 1
-            p_values_cursor += 1
+    return data_filter, new_index
 
-        elif c_i:
-            data_filter[d_values_cursor] = False
-            d_values_cursor += 1
 
-    return data_filter, new_index
+@jit(nopython=True, nogil=True, cache=True)
+def gather_selection(c_index, selection):
+    """
+    Gather a column from a selection of rows.
+
+    :param c_index: Words of the bitmap of the column
+    :param selection: Words of the bitmap of the selected rows
+    :return: Positions of the values of the column in the selected rows,
+      and the words of the bitmap of the column in the selection
+    """
+    positions = np.empty(count_words(c_index & selection), dtype=np.int64)
+    length = count_words(selection)
+    new_index = np.zeros((length + WORD_BITS - 1) // WORD_BITS,
+                         dtype=np.uint64)
+
+    values_cursor = 0
+    positions_cursor = 0
+    rows_cursor = 0
+
+    for word_c, word_s in zip(c_index, selection):
+        if word_s == EMPTY_WORD:
+            # Nothing selected, skip the values of this word
+            pass
+
+        elif word_c == FULL_WORD:
+            # All present, the values follow the selected bits, and the
+            # column is present in all the selected rows of this word
+            selected = popcount(word_s)
+            rest = word_s
+            for k in range(selected):
+                bit = rest & (~rest + ONE)
+                positions[positions_cursor + k] = (values_cursor +
+                                                   popcount(bit - ONE))
+                rest ^= bit
+            set_range(new_index, rows_cursor, selected)
+            positions_cursor += selected
+            rows_cursor += selected
+
+        else:
+            rest = word_s
+            while rest:
+                bit = rest & (~rest + ONE)
+                if word_c & bit:
+                    before = popcount(word_c & (bit - ONE))
+                    positions[positions_cursor] = values_cursor + before
+                    set_bit(new_index, rows_cursor)
+                    positions_cursor += 1
+
+                rows_cursor += 1
+                rest ^= bit
+
+        values_cursor += popcount(word_c)
+
+    return positions, new_index
+
+
+
+# Parallel kernels. The words of the bitmaps are split in blocks, the
+# prefix sums of the number of set bits of each block give the cursors
+# where each block starts, and then the blocks are computed concurrently.
+
+# Words of each block of the parallel kernels
+PARALLEL_BLOCK_WORDS = 1024
+
+# Columns with less rows than this are computed with the serial kernels
+PARALLEL_ROWS = 1 << 20
+
+
+def set_num_threads(n):
+    """Number of threads used by the parallel kernels"""
+    numba.set_num_threads(n)
+
+
+def get_num_threads():
+    """Number of threads used by the parallel kernels"""
+    return numba.get_num_threads()
+
+
+@jit(nopython=True, nogil=True, parallel=True, cache=True)
+def block_starts(index):
+    """
+    Number of set bits before each block of words, and the total number
+    of set bits as the last element.
+    """
+    nblocks = (len(index) + PARALLEL_BLOCK_WORDS - 1) // PARALLEL_BLOCK_WORDS
+    counts = np.zeros(nblocks + 1, dtype=np.int64)
+    for b in prange(nblocks):
+        counts[b + 1] = count_words(
+            index[b * PARALLEL_BLOCK_WORDS:(b + 1) * PARALLEL_BLOCK_WORDS])
+
+    return np.cumsum(counts)
+
+
+def parallel_binary(operation):
+    """
+    Parallel kernel of a binary operator. It takes the starts of the blocks
+    of both indices and of their intersection, and writes on result.
+
+    :param operation: Jitted function of two values
+    :return:
+    """
+    @jit(nopython=True, nogil=True, parallel=True)
+    def kernel(value_left, value_right, index_left, index_right, result,
+               starts_left, starts_right, starts_result):
+        nwords = len(index_left)
+        for b in prange(len(starts_result) - 1):
+            cursor_result = starts_result[b]
+            cursor_left = starts_left[b]
+            cursor_right = starts_right[b]
+            for w in range(b * PARALLEL_BLOCK_WORDS,
+                           min((b + 1) * PARALLEL_BLOCK_WORDS, nwords)):
+                word_left = index_left[w]
+                word_right = index_right[w]
+                both = word_left & word_right
+                if both == FULL_WORD:
+                    # Present in both sides, no need to check bits
+                    for k in range(WORD_BITS):
+                        result[cursor_result + k] = operation(
+                            value_left[cursor_left + k],
+                            value_right[cursor_right + k])
+                    cursor_result += WORD_BITS
+                    cursor_left += WORD_BITS
+                    cursor_right += WORD_BITS
+
+                elif both == EMPTY_WORD:
+                    # Nothing to compute, skip the values of this word
+                    cursor_left += popcount(word_left)
+                    cursor_right += popcount(word_right)
+
+                else:
+                    rest = word_left | word_right
+                    while rest:
+                        bit = rest & (~rest + ONE)
+                        if both & bit:
+                            result[cursor_result] = operation(
+                                value_left[cursor_left],
+                                value_right[cursor_right])
+                            cursor_result += 1
+                            cursor_left += 1
+                            cursor_right += 1
+
+                        elif word_left & bit:
+                            cursor_left += 1
+
+                        else:
+                            cursor_right += 1
+
+                        rest ^= bit
+
+    def apply(value_left, value_right, index_left, index_right, out=None):
+        index = index_left & index_right
+        starts_result = block_starts(index)
+        if out is None:
+            out = np.empty(starts_result[-1], dtype=result_type(
+                operation.ufunc, value_left.dtype, value_right.dtype))
+
+        kernel(value_left, value_right, index_left, index_right, out,
+               block_starts(index_left), block_starts(index_right),
+               starts_result)
+        return out, index
+
+    return apply
+
+
+def operation(ufunc):
+    """Jitted function of two values, with the ufunc that gives its dtype"""
+    def decorator(function):
+        function = jit(nopython=True, nogil=True)(function)
+        function.ufunc = ufunc
+        return function
+
+    return decorator
+
+
+@operation(np.add)
+def _add(x, y):
+    return x + y
+
+
+@operation(np.subtract)
+def _sub(x, y):
+    return x - y
+
+
+@operation(np.multiply)
+def _mul(x, y):
+    return x * y
+
+
+@operation(np.true_divide)
+def _truediv(x, y):
+    return x / y
+
+
+@operation(np.floor_divide)
+def _floordiv(x, y):
+    return x // y
+
+
+@operation(np.power)
+def _pow(x, y):
+    return x ** y
+
+
+@operation(np.mod)
+def _mod(x, y):
+    return x % y
+
+
+@operation(np.greater)
+def _gt(x, y):
+    return x > y
+
+
+@operation(np.greater_equal)
+def _ge(x, y):
+    return x >= y
+
+
+@operation(np.less)
+def _lt(x, y):
+    return x < y
+
+
+@operation(np.less_equal)
+def _le(x, y):
+    return x <= y
+
+
+@operation(np.logical_and)
+def _and(x, y):
+    return bool(x) and bool(y)
+
+
+@operation(np.logical_or)
+def _or(x, y):
+    return bool(x) or bool(y)
+
+
+@operation(np.logical_xor)
+def _xor(x, y):
+    return bool(x) != bool(y)
+
+
+@operation(np.equal)
+def _eq(x, y):
+    return x == y
+
+
+@operation(np.not_equal)
+def _ne(x, y):
+    return x != y
+
+
+apply_parallel_add = parallel_binary(_add)
+apply_parallel_sub = parallel_binary(_sub)
+apply_parallel_mul = parallel_binary(_mul)
+apply_parallel_truediv = parallel_binary(_truediv)
+apply_parallel_floordiv = parallel_binary(_floordiv)
+apply_parallel_pow = parallel_binary(_pow)
+apply_parallel_mod = parallel_binary(_mod)
+apply_parallel_gt = parallel_binary(_gt)
+apply_parallel_ge = parallel_binary(_ge)
+apply_parallel_lt = parallel_binary(_lt)
+apply_parallel_le = parallel_binary(_le)
+apply_parallel_and = parallel_binary(_and)
+apply_parallel_or = parallel_binary(_or)
+apply_parallel_xor = parallel_binary(_xor)
+apply_parallel_eq = parallel_binary(_eq)
+apply_parallel_ne = parallel_binary(_ne)
+
+
+@jit(nopython=True, nogil=True, parallel=True, cache=True)
+def apply_mask_column_parallel(data, index, mask):
+    """Parallel version of apply_mask_column"""
+    starts = block_starts(index)
+    nblocks = len(starts) - 1
+    new_index = np.zeros_like(index)
+    kept = np.zeros(nblocks + 1, dtype=np.int64)
+
+    for b in prange(nblocks):
+        data_cursor = starts[b]
+        for w in range(b * PARALLEL_BLOCK_WORDS,
+                       min((b + 1) * PARALLEL_BLOCK_WORDS, len(index))):
+            rest = index[w]
+            while rest:
+                bit = rest & (~rest + ONE)
+                if mask[data_cursor]:
+                    new_index[w] |= bit
+                data_cursor += 1
+                rest ^= bit
+
+        kept[b + 1] = np.sum(mask[starts[b]:starts[b + 1]])
+
+    kept = np.cumsum(kept)
+    new_data = np.empty(kept[-1], dtype=data.dtype)
+    for b in prange(nblocks):
+        cursor = kept[b]
+        for i in range(starts[b], starts[b + 1]):
+            if mask[i]:
+                new_data[cursor] = data[i]
+                cursor += 1
+
+    return new_data, new_index
+
+
+@jit(nopython=True, nogil=True, parallel=True, cache=True)
+def _column_filter_blocks(p_values, p_index, c_index):
+    """
+    Blocks of gen_column_filter_parallel. The bitmap of the column in the
+    selection is returned unpacked, one byte per selected row, because
+    the blocks do not start at the boundaries of the words.
+    """
+    p_starts = block_starts(p_index)
+    c_starts = block_starts(c_index)
+    nblocks = len(p_starts) - 1
+
+    selected = np.zeros(nblocks + 1, dtype=np.int64)
+    for b in prange(nblocks):
+        selected[b + 1] = np.sum(p_values[p_starts[b]:p_starts[b + 1]] != 0)
+    selected = np.cumsum(selected)
+
+    data_filter = np.empty(c_starts[-1], dtype=np.bool_)
+    present = np.zeros(selected[-1], dtype=np.uint8)
+
+    for b in prange(nblocks):
+        p_values_cursor = p_starts[b]
+        d_values_cursor = c_starts[b]
+        d_index_cursor = selected[b]
+        for w in range(b * PARALLEL_BLOCK_WORDS,
+                       min((b + 1) * PARALLEL_BLOCK_WORDS, len(p_index))):
+            word_p = p_index[w]
+            word_c = c_index[w]
+            rest = word_p | word_c
+            while rest:
+                bit = rest & (~rest + ONE)
+                if word_p & bit and word_c & bit:
+                    if p_values[p_values_cursor]:
+                        present[d_index_cursor] = 1
+                        data_filter[d_values_cursor] = True
+                        d_index_cursor += 1
+                    else:
+                        data_filter[d_values_cursor] = False
+
+                    p_values_cursor += 1
+                    d_values_cursor += 1
+
+                elif word_p & bit:
+                    if p_values[p_values_cursor]:
+                        d_index_cursor += 1
+                    p_values_cursor += 1
+
+                else:
+                    data_filter[d_values_cursor] = False
+                    d_values_cursor += 1
+
+                rest ^= bit
+
+    return data_filter, present
+
+
+def gen_column_filter_parallel(p_values, p_index, c_index):
+    """Parallel version of gen_column_filter"""
+    data_filter, present = _column_filter_blocks(p_values, p_index, c_index)
+    return data_filter, pack_index(present)
+
+
+@jit(nopython=True, nogil=True, parallel=True, cache=True)
+def reindex_parallel(index, blocks, global_index):
+    """
+    Parallel version of reindex. The blocks of the global index are made
+    of whole words, so each block sets the bits of its own words.
+    """
+    block_rows = PARALLEL_BLOCK_WORDS * WORD_BITS
+    nblocks = (len(global_index) + block_rows - 1) // block_rows
+
+    counts = np.zeros(nblocks + 1, dtype=np.int64)
+    for b in prange(nblocks):
+        count = 0
+        for idx in global_index[b * block_rows:(b + 1) * block_rows]:
+            # Negative index means empty
+            if idx >= 0 and test_bit(index, idx):
+                count += 1
+        counts[b + 1] = count
+    counts = np.cumsum(counts)
+
+    new_data_index = np.empty(counts[-1], dtype=np.int64)
+    new_index = np.zeros((len(global_index) + WORD_BITS - 1) // WORD_BITS,
+                         dtype=np.uint64)
+
+    for b in prange(nblocks):
+        data_cursor = counts[b]
+        for cursor in range(b * block_rows,
+                            min((b + 1) * block_rows, len(global_index))):
+            idx = global_index[cursor]
+            if idx >= 0 and test_bit(index, idx):
+                new_data_index[data_cursor] = rank_block(index, blocks, idx)
+                data_cursor += 1
+                set_bit(new_index, cursor)
+
+    return new_data_index, new_index
+
+
+PARALLEL_KERNELS = {
+    apply_fast_add: apply_parallel_add,
+    apply_fast_sub: apply_parallel_sub,
+    apply_fast_mul: apply_parallel_mul,
+    apply_fast_truediv: apply_parallel_truediv,
+    apply_fast_floordiv: apply_parallel_floordiv,
+    apply_fast_pow: apply_parallel_pow,
+    apply_fast_mod: apply_parallel_mod,
+    apply_fast_gt: apply_parallel_gt,
+    apply_fast_ge: apply_parallel_ge,
+    apply_fast_lt: apply_parallel_lt,
+    apply_fast_le: apply_parallel_le,
+    apply_fast_and: apply_parallel_and,
+    apply_fast_or: apply_parallel_or,
+    apply_fast_xor: apply_parallel_xor,
+    apply_fast_eq: apply_parallel_eq,
+    apply_fast_ne: apply_parallel_ne,
+    apply_mask_column: apply_mask_column_parallel,
+    gen_column_filter: gen_column_filter_parallel,
+    reindex: reindex_parallel,
+}
+
+
+def parallel_version(kernel, rows):
+    """
+    Parallel version of a kernel for columns with the given number of
+    rows. It is the kernel itself for short columns, for a single thread,
+    and in the threads of the pool that already runs columns in parallel.
+    """
+    if rows >= PARALLEL_ROWS and get_num_threads() > 1 and not in_worker():
+        return PARALLEL_KERNELS.get(kernel, kernel)
+    return kernel
+
+
+# Dtypes whose kernels are compiled by precompile
+COMMON_DTYPES = [np.float32, np.float64, np.int32, np.int64, np.uint32,
+                 np.uint64, np.bool_]
+
+BINARY_KERNELS = [apply_fast_add, apply_fast_sub, apply_fast_mul,
+                  apply_fast_truediv, apply_fast_floordiv, apply_fast_pow,
+                  apply_fast_mod, apply_fast_gt, apply_fast_ge, apply_fast_lt,
+                  apply_fast_le, apply_fast_and, apply_fast_or, apply_fast_xor,
+                  apply_fast_eq, apply_fast_ne]
+
+REDUCTIONS = [reduce_sum, reduce_prod, reduce_mean, reduce_std]
+
+
+def precompile(dtypes=COMMON_DTYPES):
+    """
+    Compile the sparse binary kernels and the reductions for columns of
+    the given dtypes, so that the first operation does not wait for the
+    compiler. The specializations are kept in the cache of numba, and
+    later processes load them from disk.
+
+    :param dtypes: List of dtypes
+    :return:
+    """
+    index = np.zeros(1, dtype=np.uint64)
+    keys = np.zeros(1, dtype=np.int64)
+
+    for dtype in dtypes:
+        values = np.zeros(1, dtype=dtype)
+        for kernel in BINARY_KERNELS:
+            try:
+                kernel(values, values, index, index)
+            except (TypeError, TypingError):
+                # Not defined for the dtype, like the difference of booleans
+                pass
+
+        for reduction in REDUCTIONS:
+            reduction(keys, index, values, index, 1)
@@ -1,146 +1,353 @@
 from gtable import Table
+from gtable.bitmap import Bitmap
 import numpy as np
+import operator
+from functools import reduce
 from itertools import chain
-from gtable.fast import join_low_level, reindex_join_columns, \
-    intersection_sorted, union_sorted
+from gtable.pool import map_columns
+from gtable.lib import is_sorted, column_order, set_order, select_columns, \
+    composite_keys
+from gtable.fast import hash_join, merge_join, hash_isin, isin_sorted, \
+    join_keys, monotonic
 
 
-def inner_join(table_left, table_right, column):
+def _coalesce(left_column, right_column, global_left, global_right):
     """
-    Inner join. If columns are repeated, the left table has preference.
-
-    :param table_left:
-    :param table_right:
-    :param column:
-    :return:
+    Values of a column present in both tables after a join, taken from the
+    left table when present there. The global indices may come in any
+    order, and repeat rows of either table.
     """
+    left = left_column.reindex(global_left)
+    right = right_column.reindex(global_right)
+    present_left = left.bitmap.to_index().astype(np.bool_)
+    present_right = right.bitmap.to_index().astype(np.bool_)
+    from_right = present_right & ~present_left
+    present = present_left | present_right
+
+    # Position of each row in the values of the joined column
+    positions = np.cumsum(present) - 1
+    data = np.empty(np.count_nonzero(present), dtype=left.values.dtype)
+    data[positions[present_left]] = left.values
+    data[positions[from_right]] = right.values[
+        (np.cumsum(present_right) - 1)[from_right]]
+
+    return data, Bitmap.from_index(present)
+
+
+def _check_column(table_left, table_right, column):
     if column not in table_left.keys:
         raise ValueError('{} not in left table'.format(column))
 
     if column not in table_right.keys:
         raise ValueError('{} not in right table'.format(column))
 
-    all_columns = set(chain(table_left.keys, table_right.keys))
-    joined_columns = all_columns - {column}
 
-    common_left = table_left.get(column)
-    common_right = table_right.get(column)
+def _sorted_keys(table_left, table_right, column):
+    """
+    True if the column is sorted in both tables, so they can be merged. A
+    known order is trusted, and the values are only checked if it is not.
+    The writes through the table and its columns forget the order; writing
+    straight on the arrays of the table is not supported.
+    """
+    return is_sorted(table_left, column) and is_sorted(table_right, column)
+
+
+def _key_columns(column):
+    """Name of the key column, or list with the names of several ones"""
+    if isinstance(column, str):
+        return column
+
+    columns = list(column)
+    if not columns:
+        raise ValueError('At least one key column is required')
+    if len(columns) == 1:
+        return columns[0]
+    return columns
+
+
+def _composite_rows(table, columns):
+    """
+    Values of the key columns in the rows where all of them have a value
+    that can be compared, and the bitmap of these rows.
+    """
+    bitmaps = [table._bitmap_column(key) for key in columns]
+    selection = reduce(operator.and_, bitmaps)
+    values, _ = select_columns([table[key] for key in columns], bitmaps,
+                               selection)
+
+    valid = np.ones(selection.count(), dtype=np.bool_)
+    for column_values in values:
+        if column_values.dtype.kind == 'f':
+            valid &= ~np.isnan(column_values)
+        elif column_values.dtype.kind in 'mM':
+            valid &= ~np.isnat(column_values)
+
+    if not np.all(valid):
+        values = [column_values[valid] for column_values in values]
+        rows = np.zeros(len(selection), dtype=np.bool_)
+        rows[selection.positions()[valid]] = True
+        selection = Bitmap.from_index(rows)
+
+    return values, selection
 
-    if not np.all(common_left.values == np.sort(common_left.values)):
-        raise ValueError('Trying to join with a non sorted column')
 
-    if not np.all(common_right.values == np.sort(common_right.values)):
-        raise ValueError('Trying to join with a non sorted column')
+def _join_keys(table_left, table_right, column, check_sorted=True):
+    """
+    Keys of the rows of both tables, with the bitmaps of the rows that have
+    one. The values of several key columns are packed in a single integer
+    for each row, in lexicographic order.
 
-    common_rec = intersection_sorted(common_left.values, common_right.values)
+    :return: keys and bitmap of the left table, keys and bitmap of the
+      right table, and True if the keys can be merged.
+    """
+    if isinstance(column, str):
+        _check_column(table_left, table_right, column)
+        left = table_left.get(column)
+        right = table_right.get(column)
+        merge = not check_sorted or _sorted_keys(table_left, table_right,
+                                                 column)
+        return left.values, left.bitmap, right.values, right.bitmap, merge
 
-    data_joined, global_left, global_right = join_low_level(
-        common_left.values, common_left.index,
-        common_right.values, common_right.index, common_rec)
+    for key in column:
+        _check_column(table_left, table_right, key)
 
-    data = list()
-    index = list()
-    keys = list()
+    values_left, bitmap_left = _composite_rows(table_left, column)
+    values_right, bitmap_right = _composite_rows(table_right, column)
+    keys_left, keys_right = composite_keys(values_left, values_right)
+    merge = not check_sorted or (monotonic(keys_left) > 0 and
+                                 monotonic(keys_right) > 0)
 
-    data.append(data_joined)
-    index.append(np.ones(len(data_joined), dtype=np.uint8))
-    keys.append(column)
+    return keys_left, bitmap_left, keys_right, bitmap_right, merge
 
-    for i_column in joined_columns:
-        if i_column in table_left:
-            c = table_left.get(i_column)
-            c = c.reindex(global_left)
-            keys.append(i_column)
-            data.append(c.values)
-            index.append(c.index)
 
-        elif i_column in table_right:
-            c = table_right.get(i_column)
-            c = c.reindex(global_right)
-            keys.append(i_column)
-            data.append(c.values)
-            index.append(c.index)
+def _joined_table(table_left, table_right, column, data_joined, global_left,
+                  global_right, coalesce=True):
+    """
+    Table with the rows of a join, given the joined keys and the global
+    indices of the rows of each table. The columns present in both tables
+    are taken from the left table when present there, or only from the
+    left table if coalesce is False.
+    """
+    columns = [column] if isinstance(column, str) else column
+    joined_columns = list(set(chain(table_left.keys, table_right.keys)) -
+                          set(columns))
+
+    def reindex(i_column):
+        if coalesce and (i_column in table_left) and (i_column in table_right):
+            return _coalesce(table_left.get(i_column),
+                             table_right.get(i_column),
+                             global_left, global_right)
+        elif i_column in table_left:
+            c = table_left.get(i_column).reindex(global_left)
+        else:
+            c = table_right.get(i_column).reindex(global_right)
+        return c.values, c.bitmap
+
+    if isinstance(column, str):
+        data = [data_joined]
+        bitmaps = [Bitmap.ones(len(data_joined))]
+        keys = [column]
+    else:
+        # The values of the key columns are taken from the tables
+        data, bitmaps, keys = list(), list(), list()
+        joined_columns = columns + joined_columns
+
+    for i_column, (c_values, c_bitmap) in zip(
+            joined_columns, map_columns(reindex, joined_columns,
+                                        len(data_joined))):
+        keys.append(i_column)
+        data.append(c_values)
+        bitmaps.append(c_bitmap)
 
     res = Table()
     res.data = data
-    res.index = np.vstack(index)
+    res.bitmaps = bitmaps
     res.keys = keys
 
     return res
 
 
-def full_outer_join(table_left, table_right, column, check_sorted=True):
+def inner_join(table_left, table_right, column):
     """
     Inner join. If columns are repeated, the left table has preference.
+    A value repeated in both tables gives a row for each pair of rows.
+    If the column is sorted in both tables the join is a merge, and the
+    result is sorted by the column. Otherwise the join uses a hash table of
+    the smaller table, and the rows follow the order of the larger one.
 
     :param table_left:
     :param table_right:
-    :param column:
-    :param check_sorted: If True may increase performance, but breaks if the
-      column used as index is not sorted.
+    :param column: Name of the column, or list of names to join by the
+      values of several columns, sorted in lexicographic order.
     :return:
     """
-    if column not in table_left.keys:
-        raise ValueError('{} not in left table'.format(column))
+    column = _key_columns(column)
+    keys_left, bitmap_left, keys_right, bitmap_right, merge = _join_keys(
+        table_left, table_right, column)
 
-    if column not in table_right.keys:
-        raise ValueError('{} not in right table'.format(column))
+    join = merge_join if merge else hash_join
+    data_joined, global_left, global_right = join(
+        keys_left, bitmap_left.words, keys_right, bitmap_right.words)
 
-    all_columns = set(chain(table_left.keys, table_right.keys))
-    joined_columns = all_columns - {column}
+    res = _joined_table(table_left, table_right, column, data_joined,
+                        global_left, global_right, coalesce=False)
+    if merge:
+        _set_merged_order(res, table_left, table_right, column)
 
-    common_left = table_left.get(column)
-    common_right = table_right.get(column)
+    return res
 
-    if check_sorted:
-        if not np.all(common_left.values == np.sort(common_left.values)):
-            raise ValueError('Trying to join with a non sorted column')
 
-        if not np.all(common_right.values == np.sort(common_right.values)):
-            raise ValueError('Trying to join with a non sorted column')
+def full_outer_join(table_left, table_right, column, check_sorted=True):
+    """
+    Full outer join. If columns are repeated, the left table has
+    preference. A value repeated in both tables gives a row for each pair
+    of rows.
 
-    common_rec = union_sorted(common_left.values, common_right.values)
+    :param table_left:
+    :param table_right:
+    :param column: Name of the column, or list of names to join by the
+      values of several columns, sorted in lexicographic order.
+    :param check_sorted: If True, the column is checked to be sorted in
+      both tables, and the join uses a hash table if it is not. If False
+      the column is assumed to be sorted, and the result is wrong if it is
+      not.
+    :return:
+    """
+    column = _key_columns(column)
+    keys_left, bitmap_left, keys_right, bitmap_right, merge = _join_keys(
+        table_left, table_right, column, check_sorted)
 
-    data_joined, global_left, global_right = join_low_level(
-        common_left.values, common_left.index,
-        common_right.values, common_right.index, common_rec)
+    join = merge_join if merge else hash_join
+    data_joined, global_left, global_right = join(
+        keys_left, bitmap_left.words, keys_right, bitmap_right.words,
+        keep_left=True, keep_right=True)
 
-    data = list()
-    index = list()
-    keys = list()
+    res = _joined_table(table_left, table_right, column, data_joined,
+                        global_left, global_right)
+    if check_sorted and merge:
+        _set_merged_order(res, table_left, table_right, column)
 
-    data.append(data_joined)
-    index.append(np.ones(len(data_joined), dtype=np.uint8))
-    keys.append(column)
+    return res
 
-    for i_column in joined_columns:
-        if (i_column in table_left) and (i_column in table_right):
-            cl = table_left.get(i_column)
-            cr = table_right.get(i_column)
-            c_values, c_index = reindex_join_columns(
-                cl, cr, global_left, global_right)
-            keys.append(i_column)
-            data.append(c_values)
-            index.append(c_index)
 
-        elif i_column in table_left:
-            c = table_left.get(i_column)
-            c = c.reindex(global_left)
-            keys.append(i_column)
-            data.append(c.values)
-            index.append(c.index)
-
-        elif i_column in table_right:
-            c = table_right.get(i_column)
-            c = c.reindex(global_right)
-            keys.append(i_column)
-            data.append(c.values)
-            index.append(c.index)
+def _set_merged_order(res, table_left, table_right, column):
+    if isinstance(column, str):
+        # The merged values repeat if they repeat in any of the tables
+        set_order(res.keys, column, 'asc',
+                  column_order(table_left, column)['strict'] and
+                  column_order(table_right, column)['strict'])
+    else:
+        # Rows in lexicographic order, the first column is sorted
+        set_order(res.keys, column[0], 'asc', False)
+
+
+def _side_join(table_left, table_right, column, keep_left, keep_right):
+    column = _key_columns(column)
+    keys_left, bitmap_left, keys_right, bitmap_right, merge = _join_keys(
+        table_left, table_right, column)
+
+    join = merge_join if merge else hash_join
+    data_joined, global_left, global_right = join(
+        keys_left, bitmap_left.words, keys_right, bitmap_right.words,
+        keep_left=keep_left, keep_right=keep_right)
+
+    res = _joined_table(table_left, table_right, column, data_joined,
+                        global_left, global_right)
+    if merge:
+        _set_merged_order(res, table_left, table_right, column)
+
+    return res
+
+
+def left_join(table_left, table_right, column):
+    """
+    Left join. The rows of the left table with a value in the column are
+    kept, with the columns of the right table where the value matches. If
+    columns are repeated, the left table has preference. The rows follow
+    the order of the left table, and a value repeated in the right table
+    gives a row for each match.
+
+    :param table_left:
+    :param table_right:
+    :param column: Name of the column, or list of names to join by the
+      values of several columns.
+    :return:
+    """
+    return _side_join(table_left, table_right, column, True, False)
+
+
+def right_join(table_left, table_right, column):
+    """
+    Right join. The rows of the right table with a value in the column are
+    kept, with the columns of the left table where the value matches. If
+    columns are repeated, the left table has preference. The rows follow
+    the order of the right table, and a value repeated in the left table
+    gives a row for each match.
+
+    :param table_left:
+    :param table_right:
+    :param column: Name of the column, or list of names to join by the
+      values of several columns.
+    :return:
+    """
+    return _side_join(table_left, table_right, column, False, True)
+
+
+def _key_matches(table_left, table_right, column):
+    """
+    True for the keys of the left table present in the right table, and
+    the bitmap of the rows of the left table with a key.
+    """
+    column = _key_columns(column)
+    keys_left, bitmap_left, keys_right, _, merge = _join_keys(
+        table_left, table_right, column)
+
+    if merge:
+        _, _, keys, test_keys = join_keys(keys_left, keys_right)
+        return isin_sorted(keys, test_keys), bitmap_left
+    return hash_isin(keys_left, keys_right), bitmap_left
+
+
+def _key_rows(table, bitmap, matches):
+    """Table with the rows of the keys selected"""
+    rows = np.zeros(len(table), dtype=np.bool_)
+    rows[bitmap.positions()[matches]] = True
 
     res = Table()
-    res.data = data
-    res.index = np.vstack(index)
-    res.keys = keys
+    res.data, res.bitmaps = select_columns(table.data, table.bitmaps,
+                                           Bitmap.from_index(rows))
+    res.keys = table.keys
 
     return res
 
+
+def semi_join(table_left, table_right, column):
+    """
+    Semi join. The rows of the left table whose value of the column is
+    present in the right table, in their order. Only the column of the
+    right table is read.
+
+    :param table_left:
+    :param table_right:
+    :param column: Name of the column, or list of names to match the
+      values of several columns.
+    :return:
+    """
+    matches, bitmap = _key_matches(table_left, table_right, column)
+    return _key_rows(table_left, bitmap, matches)
+
+
+def anti_join(table_left, table_right, column):
+    """
+    Anti join. The rows of the left table whose value of the column is not
+    present in the right table, in their order. The rows without a value
+    in the column are not kept. Only the column of the right table is read.
+
+    :param table_left:
+    :param table_right:
+    :param column: Name of the column, or list of names to match the
+      values of several columns.
+    :return:
+    """
+    matches, bitmap = _key_matches(table_left, table_right, column)
+    return _key_rows(table_left, bitmap, ~matches)
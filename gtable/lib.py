@@ -1,13 +1,25 @@
 import numpy as np
 import pandas as pd
-from .fast import gen_column_filter
+from .bitmap import Bitmap
+from .buffer import append
+from .pool import map_columns
+from .fast import gen_column_filter, gather_selection, parallel_version, \
+    monotonic
 
+# Number of rows converted at once by the row iterators
+BATCH_SIZE = 4096
 
-def fillna_column(values, index, reverse=False, fillvalue=None):
+
+def fillna_column(values, bitmap, reverse=False, fillvalue=None):
     """
     Fills the non available value sequentially with the previous
     available position.
     """
+    # Nothing to fill
+    if bitmap.dense:
+        return values, bitmap
+
+    index = bitmap.to_index()
     # Create the new values array
     new_index = np.ones(index.shape, dtype=np.uint8)
 
@@ -42,50 +54,243 @@ def fillna_column(values, index, reverse=False, fillvalue=None):
     if reverse:
         new_index = new_index[::-1]
 
-    return new_values, new_index
+    return new_values, Bitmap.from_index(new_index)
 
 
-def merge_table(table_left, table_right, column):
+def dense_column(values, bitmap, nullable=False):
     """
-    Merge two tables using a column as index. The order of the resulting
-    table is predictable if the column in both tables is sorted.
+    Scatter the values of a column to the rows where they are present.
+    Missing values are NaN, or NaT for dates, and integer columns are
+    promoted to float.
+
+    :param values: Array with the values of the column
+    :param bitmap: Bitmap of the column
+    :param nullable: If True, return a pandas nullable array that keeps the
+      missing values apart from NaN and the dtype of the values.
+    :return: Array with a value for each row
+    """
+    if bitmap.count() == len(bitmap) and not nullable:
+        return values
+
+    length = len(bitmap)
+    present = bitmap.to_index().astype(np.bool_)
+    kind = values.dtype.kind
+
+    if nullable and kind in 'biuf':
+        dense = np.zeros(length, dtype=values.dtype)
+        dense[present] = values
+        if kind == 'b':
+            return pd.arrays.BooleanArray(dense, ~present)
+        elif kind == 'f':
+            return pd.arrays.FloatingArray(dense, ~present)
+        return pd.arrays.IntegerArray(dense, ~present)
+
+    elif nullable and kind in 'US':
+        dense = np.full(length, pd.NA, dtype=object)
+        dense[present] = values
+        return pd.array(dense, dtype='string')
+
+    if kind in 'mM':
+        dense = np.full(length, 'NaT', dtype=values.dtype)
+    elif kind == 'f':
+        dense = np.full(length, np.nan, dtype=values.dtype)
+    elif kind in 'iu':
+        dense = np.full(length, np.nan)
+    else:
+        dense = np.full(length, np.nan, dtype=object)
+
+    dense[present] = values
+    return dense
+
+
+def _object_values(objects):
+    """Convert an array of Python objects without nulls to a numpy type"""
+    inferred = pd.api.types.infer_dtype(objects, skipna=False)
+    try:
+        if inferred == 'string':
+            return objects.astype(np.str_)
+        elif inferred == 'integer':
+            return objects.astype(np.int64)
+        elif inferred in ('floating', 'mixed-integer-float'):
+            return objects.astype(np.float64)
+        elif inferred == 'boolean':
+            return objects.astype(np.bool_)
+        elif inferred in ('datetime', 'datetime64', 'date'):
+            return np.array(pd.DatetimeIndex(objects).values,
+                            dtype='datetime64[ns]')
+    except (ValueError, OverflowError, TypeError):
+        pass
+
+    return objects
+
+
+def pandas_column(values, copy=False):
+    """
+    Values and bitmap of a column from a pandas series or index. Nulls
+    (NaN in float columns, NA, NaT and None) are missing values, and the
+    values are a view of the series if there are none.
+
+    :param values: A pandas Series or Index
+    :param copy: If True, the values never share memory with the series
+    :return: the values and the bitmap
     """
-    if column not in table_left.keys:
-        raise ValueError('{} not in left table'.format(column))
+    dtype = values.dtype
+    length = len(values)
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        codes = np.asarray(values.array.codes)
+        present = codes >= 0
+        categories, _ = pandas_column(values.array.categories)
+        return categories[codes[present]], Bitmap.from_index(present)
+
+    elif isinstance(dtype, pd.DatetimeTZDtype):
+        # Times in UTC
+        array = np.asarray(values.values)
+
+    elif isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        present = ~np.asarray(values.isna())
+        compact = values.array[present]
+        if hasattr(dtype, 'numpy_dtype'):
+            array = compact.to_numpy(dtype=dtype.numpy_dtype)
+        else:
+            array = _object_values(compact.to_numpy(dtype=object))
+        return array, Bitmap.from_index(present)
 
-    if column not in table_right.keys:
-        raise ValueError('{} not in right table'.format(column))
+    else:
+        array = values.to_numpy(copy=copy)
+
+    kind = array.dtype.kind
+    if kind == 'f':
+        present = ~np.isnan(array)
+    elif kind in 'mM':
+        present = ~np.isnat(array)
+    elif kind == 'O':
+        present = ~pd.isna(array)
+        return _object_values(array[present]), Bitmap.from_index(present)
+    else:
+        return array, Bitmap.ones(length)
 
-    left_key = table_left.keys.index(column)
-    right_key = table_right.keys.index(column)
-    left_data = table_left[column]
-    right_data = table_right[column]
-    left_index = table_left.index[left_key, :]
-    right_index = table_right.index[right_key, :]
+    if present.all():
+        return array, Bitmap.ones(length)
 
-    sorter = np.argsort(left_data)
+    return array[present], Bitmap.from_index(present)
+
+
+def _key_codes(left, right, rank=False):
+    """
+    Non negative integer codes of the values of a key column in both
+    tables, in the order of the values, and the number of bits they use.
+    With rank, or for values that are not integers or dates, the codes are
+    the positions of the values in the unique values.
+    """
+    dtype = np.result_type(left, right)
+    left = left.astype(dtype, copy=False)
+    right = right.astype(dtype, copy=False)
+
+    if not rank and (dtype.kind in 'bimM' or
+                     (dtype.kind == 'u' and dtype.itemsize < 8)):
+        left = left.view(np.int64) if dtype.kind in 'mM' else \
+            left.astype(np.int64)
+        right = right.view(np.int64) if dtype.kind in 'mM' else \
+            right.astype(np.int64)
+        if not len(left) and not len(right):
+            return left, right, 0
+
+        low = min(v.min() for v in (left, right) if len(v))
+        high = max(v.max() for v in (left, right) if len(v))
+        # The range fits in an int64 if the codes are packed at all
+        if int(high) - int(low) < 2 ** 62:
+            return left - low, right - low, int(high - low).bit_length()
+
+    # Other values are replaced by their position in the unique values
+    unique, codes = np.unique(np.concatenate([left, right]),
+                              return_inverse=True)
+    codes = codes.astype(np.int64)
+    return (codes[:len(left)], codes[len(left):],
+            max(len(unique) - 1, 0).bit_length())
+
+
+def composite_keys(left_columns, right_columns):
+    """
+    Pack the values of several key columns of two tables in a single
+    integer key for each row, so that rows with the same values have the
+    same key, and the order of the keys is the lexicographic order of the
+    values. The columns are shifted to their minimum and packed while
+    they fit in 63 bits, and the packed keys are replaced by their rank in
+    the unique keys when they do not.
+
+    :param left_columns: List with the values of the key columns of the
+      left table, with the same length
+    :param right_columns: List with the values of the key columns of the
+      right table, in the same order
+    :return: int64 keys of the rows of the left and the right table
+    """
+    left_keys = np.zeros(len(left_columns[0]), dtype=np.int64)
+    right_keys = np.zeros(len(right_columns[0]), dtype=np.int64)
+    bits = 0
+
+    for left, right in zip(left_columns, right_columns):
+        left_codes, right_codes, width = _key_codes(left, right)
+
+        if bits + width > 63:
+            left_keys, right_keys, bits = _key_codes(left_keys, right_keys,
+                                                     rank=True)
+        if bits + width > 63:
+            left_codes, right_codes, width = _key_codes(
+                left_codes, right_codes, rank=True)
 
-    left_length = len(left_index)
-    right_length = len(right_index)
+        left_keys = (left_keys << width) | left_codes
+        right_keys = (right_keys << width) | right_codes
+        bits += width
+
+    return left_keys, right_keys
+
+
+def merge_table(table_left, table_right, column):
+    """
+    Merge two tables using a column as index. The order of the resulting
+    table is predictable if the column in both tables is sorted. The index
+    can be a list of columns, sorted in lexicographic order.
+    """
+    columns = [column] if isinstance(column, str) else list(column)
+    for key in columns:
+        if key not in table_left.keys:
+            raise ValueError('{} not in left table'.format(key))
+
+        if key not in table_right.keys:
+            raise ValueError('{} not in right table'.format(key))
+
+    left_length = len(table_left)
+    right_length = len(table_right)
+
+    for key in columns:
+        if left_length != len(table_left[key]):
+            raise ValueError('Merge only with a dense column')
+        if right_length != len(table_right[key]):
+            raise ValueError('Merge only with a dense column')
+
+    if len(columns) == 1:
+        left_data = table_left[columns[0]]
+        right_data = table_right[columns[0]]
+    else:
+        left_data, right_data = composite_keys(
+            [table_left[key] for key in columns],
+            [table_right[key] for key in columns])
 
-    if left_length != len(left_data):
-        raise ValueError('Merge only with a dense column')
-    if right_length != len(right_data):
-        raise ValueError('Merge only with a dense column')
+    sorter = np.argsort(left_data)
 
     insertions = np.searchsorted(left_data, right_data, sorter=sorter)
     all_columns = set(table_left.keys) | set(table_right.keys)
 
-    width = len(all_columns)
     length = left_length + right_length
 
-    new_index = np.empty((width, length), dtype=np.uint8)
+    new_bitmaps = list()
     new_data = list()
     new_keys = list()
 
-    for i, column in enumerate(all_columns):
+    for column in all_columns:
         if column in table_left.keys and column in table_right.keys:
-            new_index[i, :] = np.ones(length, dtype=np.uint8)
+            new_bitmaps.append(Bitmap.ones(length))
 
             # If the column is present in both tables, data must be merged
             left_key = table_left.keys.index(column)
@@ -99,21 +304,106 @@ def merge_table(table_left, table_right, column):
 
         elif column in table_left.keys:
             left_key = table_left.keys.index(column)
-            new_index[i, :] = np.insert(
-                table_left.index[left_key, :], insertions,
-                np.zeros(len(insertions), dtype=np.uint8))
+            new_bitmaps.append(Bitmap.from_index(np.insert(
+                table_left.bitmaps[left_key].to_index(), insertions,
+                np.zeros(len(insertions), dtype=np.uint8))))
             new_data.append(table_left.data[left_key])
             new_keys.append(column)
 
         else:
             right_key = table_right.keys.index(column)
-            new_index[i, :] = np.insert(
+            new_bitmaps.append(Bitmap.from_index(np.insert(
                 np.zeros(left_length, dtype=np.uint8), insertions,
-                table_right.index[right_key, :])
+                table_right.bitmaps[right_key].to_index())))
             new_data.append(table_right.data[right_key])
             new_keys.append(column)
 
-    return new_data, new_keys, new_index
+    return new_data, new_keys, new_bitmaps
+
+
+# Key of the order of a column in its metadata
+SORTED = 'sorted'
+
+ORDERS = {2: ('asc', True), 1: ('asc', False), 0: (None, False),
+          -1: ('desc', False), -2: ('desc', True)}
+
+
+def monotonic_order(values):
+    """
+    Order of an array in a single pass. Numbers, booleans and dates are
+    checked by a compiled kernel, other types by comparing neighbours.
+
+    :param values: Numpy array
+    :return: dictionary with the order, 'asc', 'desc' or None if the values
+      are not sorted, and True in strict if there are no repeated values.
+    """
+    if values.dtype.kind in 'biufmM':
+        code = monotonic(values)
+    else:
+        left, right = values[:-1], values[1:]
+        if np.all(left < right):
+            code = 2
+        elif np.all(left <= right):
+            code = 1
+        elif np.all(left > right):
+            code = -2
+        elif np.all(left >= right):
+            code = -1
+        else:
+            code = 0
+
+    order, strict = ORDERS[code]
+    return {'order': order, 'strict': strict}
+
+
+def known_order(keys, key):
+    """Order of a column stored in the metadata of the schema, or None"""
+    return keys.metadata.get(key, {}).get(SORTED)
+
+
+def set_order(keys, key, order, strict=False):
+    """
+    Store the order of the values of a column in the metadata of the
+    schema. With order None the order is forgotten, and it is computed
+    again the next time it is needed.
+
+    :param keys: Schema of the table
+    :param key: Name of the column
+    :param order: 'asc', 'desc' or None
+    :param strict: True if the values are not repeated
+    """
+    if order is None:
+        keys.metadata.get(key, {}).pop(SORTED, None)
+    else:
+        keys.metadata.setdefault(key, dict())[SORTED] = {'order': order,
+                                                         'strict': strict}
+
+
+def column_order(table, key):
+    """
+    Order of the values of a column. It is read from the metadata of the
+    column if known, otherwise it is computed and kept in the metadata.
+    Writes through the table and its columns forget it, but writes made
+    straight on the array of the column are not seen, and the order has
+    to be reset with set_order.
+
+    :param table: a Table.
+    :param key: Name of the column
+    :return: dictionary with the order and the strictness, see
+      monotonic_order.
+    """
+    order = known_order(table.keys, key)
+    if order is None:
+        order = monotonic_order(table[key])
+        table.keys.metadata.setdefault(key, dict())[SORTED] = order
+
+    return order
+
+
+def is_sorted(table, key, strict=False):
+    """True if the values of a column are in ascending order"""
+    order = column_order(table, key)
+    return order['order'] == 'asc' and (order['strict'] or not strict)
 
 
 def sort_table(table, column):
@@ -125,28 +415,73 @@ def sort_table(table, column):
     if column not in table.keys:
         raise ValueError('{} not in table'.format(column))
 
-    length = table.index.shape[1]
+    length = len(table)
     table_index = np.arange(length)
     column_pos = table.keys.index(column)
-    column_index = table.index[column_pos, :]
-    filtered_index = table_index[column_index.astype(np.bool)]
+    column_index = table.bitmaps[column_pos].to_index()
+    filtered_index = table_index[column_index.astype(np.bool_)]
     sorted_subindex = np.argsort(table.data[column_pos])
     table_index[filtered_index] = sorted_subindex
 
     # Now, with the complete table index, sort all the columns.
-    for idx in range(len(table.keys)):
-        column_index = table.index[idx, :]
-        column_data = table.data[idx]
+    def sort_column(column):
+        column_data, bitmap = column
+        column_index = bitmap.to_index()
         if len(column_data) == len(table_index):
-            table.data[idx] = column_data[table_index]
+            column_data = column_data[table_index]
         else:
             # Argsort twice gives the sorted index for a subset of
             # a column.
             new_indexer = np.argsort(
-                np.argsort(table_index[column_index.astype(np.bool)])
+                np.argsort(table_index[column_index.astype(np.bool_)])
             )
-            table.data[idx] = column_data[new_indexer]
-        table.index[idx, :] = table.index[idx][table_index]
+            column_data = column_data[new_indexer]
+        return column_data, Bitmap.from_index(column_index[table_index])
+
+    columns = map_columns(sort_column, zip(table.data, table.bitmaps),
+                          length)
+    table.data = [column_data for column_data, _ in columns]
+    table.bitmaps = [bitmap for _, bitmap in columns]
+
+    # Sorting keeps the repeated values, so strictness is known if the
+    # order was.
+    strict = (known_order(table.keys, column) or {}).get('strict', False)
+    for key in table.keys:
+        set_order(table.keys, key, None)
+    set_order(table.keys, column, 'asc', strict)
+
+
+def slice_table(table, start, stop):
+    """
+    Rows from start to stop of a table. The values are views of the
+    values of the table.
+
+    :param table: a Table.
+    :param start: First row
+    :param stop: Row after the last one
+    :return: data, keys and bitmaps of the rows
+    """
+    start, stop, _ = slice(start, stop).indices(len(table))
+    stop = max(start, stop)
+    data = list()
+    bitmaps = list()
+
+    for values, bitmap in zip(table.data, table.bitmaps):
+        if bitmap.dense:
+            data.append(values[start:stop])
+            bitmaps.append(Bitmap.ones(stop - start))
+        else:
+            data.append(values[bitmap.rank(start):bitmap.rank(stop)])
+            bitmaps.append(bitmap.slice(start, stop))
+
+    return data, table.keys, bitmaps
+
+
+def _python_values(values):
+    """List with the values of an array, keeping the datetimes in numpy"""
+    if values.dtype.kind in 'mM':
+        return list(values)
+    return values.tolist()
 
 
 def records(table, fill=False):
@@ -157,48 +492,80 @@ def records(table, fill=False):
     :param fill: True if empty values have to be replaced with NaN
     :return: Generator with each record as a dictionary
     """
-    counters = np.zeros((table.index.shape[0]), dtype=np.int)
-    keys = np.array(table.keys)
-
-    for record in table.index.T:
-        selected_keys = keys[np.where(record)]
-        selected_counters = counters[np.where(record)]
-        if fill:
-            record_data = {k: table.data[table.keys.index(k)][c]
-                           for k, c in zip(selected_keys, selected_counters)}
-            record_data.update({k: np.nan for k in keys
-                                if k not in selected_keys})
-        else:
-            record_data = {k: table.data[table.keys.index(k)][c]
-                           for k, c in zip(selected_keys, selected_counters)}
-        counters[np.where(record)] += 1
+    keys = list(table.keys)
+
+    for start in range(0, len(table), BATCH_SIZE):
+        data, _, bitmaps = slice_table(table, start, start + BATCH_SIZE)
+        length = len(bitmaps[0])
+        columns = list()
+        indices = list()
+
+        for values, bitmap in zip(data, bitmaps):
+            index = bitmap.to_index().astype(np.bool_)
+            # The values of the empty rows are never read
+            dense = np.zeros(length, dtype=values.dtype)
+            dense[index] = values
+            columns.append(_python_values(dense))
+            indices.append(index.tolist())
+
+        for row, present in zip(zip(*columns), zip(*indices)):
+            if fill:
+                yield {k: v if p else np.nan
+                       for k, v, p in zip(keys, row, present)}
+            else:
+                yield {k: v for k, v, p in zip(keys, row, present) if p}
 
-        yield record_data
 
+def itertuples(table, size=None):
+    """
+    Generator. Returns a tuple with the values of every row of the table.
+    Empty values are NaN, or NaT for dates.
 
-def first_record(table, fill=False):
+    :param table: a Table.
+    :param size: Number of rows converted at once
+    :return: Generator with each row as a tuple
     """
-    Return the first record of the table
+    size = size or BATCH_SIZE
+
+    for start in range(0, len(table), size):
+        data, _, bitmaps = slice_table(table, start, start + size)
+        yield from zip(*[_python_values(dense_column(values, bitmap))
+                         for values, bitmap in zip(data, bitmaps)])
+
+
+def row_record(table, i, fill=False):
+    """
+    Return the record at the row i of the table
 
     :param table: a Table.
+    :param i: Position of the row. Negative positions count from the end.
     :param fill: True if empty values have to be replaced with NaN
-    :return: Generator with each record as a dictionary
+    :return: Dictionary with the record
     """
-    keys = np.array(table.keys)
-    record = table.index[:, 0]
+    length = len(table)
+    if not -length <= i < length:
+        raise IndexError("Table index out of range")
+    i %= length
+
+    record_data = dict()
+    for k, data, bitmap in zip(table.keys, table.data, table.bitmaps):
+        if bitmap[i]:
+            record_data[k] = data[bitmap.rank(i)]
+        elif fill:
+            record_data[k] = np.nan
+
+    return record_data
 
-    selected_keys = keys[np.where(record)]
 
-    if fill:
-        record_data = {
-            k: table.data[table.keys.index(k)][0] for k in selected_keys}
-        record_data.update(
-            {k: np.nan for k in keys if k not in selected_keys})
-    else:
-        record_data = {
-            k: table.data[table.keys.index(k)][0] for k in selected_keys}
+def first_record(table, fill=False):
+    """
+    Return the first record of the table
 
-    return record_data
+    :param table: a Table.
+    :param fill: True if empty values have to be replaced with NaN
+    :return: Dictionary with the record
+    """
+    return row_record(table, 0, fill)
 
 
 def last_record(table, fill=False):
@@ -207,24 +574,40 @@ def last_record(table, fill=False):
 
     :param table: a Table.
     :param fill: True if empty values have to be replaced with NaN
-    :return: Generator with each record as a dictionary
+    :return: Dictionary with the record
     """
-    keys = np.array(table.keys)
-    record = table.index[:, -1]
+    return row_record(table, -1, fill)
+        
 
-    selected_keys = keys[np.where(record)]
+def stacked_order(top_order, bottom_order, top, bottom):
+    """
+    Order of the values of a column after stacking the bottom values below
+    the top values. It is known only if the order of both is known and
+    the last value of the top lines up with the first of the bottom.
 
-    if fill:
-        record_data = {
-            k: table.data[table.keys.index(k)][0] for k in selected_keys}
-        record_data.update(
-            {k: np.nan for k in keys if k not in selected_keys})
-    else:
-        record_data = {
-            k: table.data[table.keys.index(k)][0] for k in selected_keys}
+    :return: dictionary with the order and the strictness, or None
+    """
+    if not len(top):
+        return bottom_order
+    if not len(bottom):
+        return top_order
+    if top_order is None or bottom_order is None:
+        return None
+
+    order = top_order['order']
+    if order is None or order != bottom_order['order']:
+        return None
+
+    last, first = top[-1], bottom[0]
+    if order == 'desc':
+        last, first = first, last
+    if not last <= first:
+        return None
+
+    return {'order': order,
+            'strict': bool(top_order['strict'] and bottom_order['strict'] and
+                           last < first)}
 
-    return record_data
-        
 
 def stack_table_inplace(left_table, right_table):
     """
@@ -235,49 +618,41 @@ def stack_table_inplace(left_table, right_table):
     :param right_table: 
     :return: 
     """
-    # First step is to rearrange the bitmap index if needed
-    joined_columns = set(left_table.keys) | set(right_table.keys)
-    hspill = len(joined_columns) - left_table.index.shape[0]
-    before_growth = left_table.index.shape
-
-    tindex = right_table.index.copy()
-
-    # Add the horizontal spill (more columns)
-    if joined_columns != set(left_table.keys):
-        left_table.index = np.concatenate(
-            [left_table.index, np.zeros(
-                (hspill, left_table.index.shape[1]), dtype=np.uint8
-            )])
-
-    # Add the vertical spill (the data)
-    left_table.index = np.concatenate(
-        [left_table.index, np.zeros(
-            (left_table.index.shape[0], tindex.shape[1]), dtype=np.uint8
-        )], axis=1)
-
-    # Include the keys present in both tables with this light nested loop.
-    for old_key in left_table.keys:
-        for new_key in right_table.keys:
-            if new_key == old_key:
-                right_table_index = right_table.keys.index(new_key)
-                left_table_index = left_table.keys.index(old_key)
-                left_table.index[left_table.keys.index(old_key),
-                before_growth[1]:] = tindex[right_table_index, :]
-                left_table.data[left_table.keys.index(old_key)] = np.concatenate(
-                    [left_table.data[left_table_index],
-                     right_table.data[right_table_index]]
-                )
+    left_length = len(left_table)
+    right_length = len(right_table)
+
+    # Stack the columns present in both tables, or spill the columns only
+    # present in the left table.
+    for left_table_index, key in enumerate(left_table.keys):
+        if key in right_table.keys:
+            right_table_index = right_table.keys.index(key)
+            order = stacked_order(known_order(left_table.keys, key),
+                                  known_order(right_table.keys, key),
+                                  left_table.data[left_table_index],
+                                  right_table.data[right_table_index]) or {
+                'order': None, 'strict': False}
+            set_order(left_table.keys, key, order['order'], order['strict'])
+            left_table.bitmaps[left_table_index] = left_table.bitmaps[
+                left_table_index].concatenate(
+                right_table.bitmaps[right_table_index])
+            left_table.data[left_table_index] = append(
+                left_table.data[left_table_index],
+                right_table.data[right_table_index])
+
+        else:
+            left_table.bitmaps[left_table_index] = left_table.bitmaps[
+                left_table_index].concatenate(Bitmap.zeros(right_length))
 
     # Include keys that are not added in the previous table
-    new_cols_added = 0
-    for new_key in right_table.keys:
+    for new_index, new_key in enumerate(right_table.keys):
         if new_key not in left_table.keys:
-            new_index = right_table.keys.index(new_key)
-            left_table.index[before_growth[0] + new_cols_added,
-                             before_growth[1]:] = tindex[new_index, :]
+            left_table.bitmaps.append(Bitmap.zeros(left_length).concatenate(
+                right_table.bitmaps[new_index]))
             left_table.data.append(right_table.data[new_index])
             left_table.keys.append(new_key)
-            new_cols_added += 1
+            if new_key in right_table.keys.metadata:
+                left_table.keys.metadata[new_key] = dict(
+                    right_table.keys.metadata[new_key])
 
 
 def stack_table(left_table, right_table):
@@ -289,50 +664,7 @@ def stack_table(left_table, right_table):
     :param right_table:
     :return:
     """
-    # First step is to rearrange the bitmap index if needed
-    joined_columns = set(left_table.keys) | set(right_table.keys)
-    hspill = len(joined_columns) - left_table.index.shape[0]
-    before_growth = left_table.index.shape
-
-    tindex = right_table.index.copy()
-
-    # Add the horizontal spill (more columns)
-    if joined_columns != set(left_table.keys):
-        left_table.index = np.concatenate(
-            [left_table.index, np.zeros(
-                (hspill, left_table.index.shape[1]), dtype=np.uint8
-            )])
-
-    # Add the vertical spill (the data)
-    left_table.index = np.concatenate(
-        [left_table.index, np.zeros(
-            (left_table.index.shape[0], tindex.shape[1]), dtype=np.uint8
-        )], axis=1)
-
-    # Include the keys present in both tables with this light nested loop.
-    for old_key in left_table.keys:
-        for new_key in right_table.keys:
-            if new_key == old_key:
-                right_table_index = right_table.keys.index(new_key)
-                left_table_index = left_table.keys.index(old_key)
-                left_table.index[left_table.keys.index(old_key),
-                before_growth[1]:] = tindex[right_table_index, :]
-                left_table.data[
-                    left_table.keys.index(old_key)] = np.concatenate(
-                    [left_table.data[left_table_index],
-                     right_table.data[right_table_index]]
-                )
-
-    # Include keys that are not added in the previous table
-    new_cols_added = 0
-    for new_key in right_table.keys:
-        if new_key not in left_table.keys:
-            new_index = right_table.keys.index(new_key)
-            left_table.index[before_growth[0] + new_cols_added,
-            before_growth[1]:] = tindex[new_index, :]
-            left_table.data.append(right_table.data[new_index])
-            left_table.keys.append(new_key)
-            new_cols_added += 1
+    stack_table_inplace(left_table, right_table)
 
 
 def from_chunks(tables):
@@ -348,9 +680,10 @@ def from_chunks(tables):
             result = table.copy()
 
         else:
-            result.index = np.hstack([result.index, table.index])
+            result.bitmaps = [rb.concatenate(tb) for rb, tb in
+                              zip(result.bitmaps, table.bitmaps)]
             for rk, tk in zip(result.keys, table.keys):
-                result[rk] = np.hstack([result[rk], table[tk]])
+                result[rk] = append(result[rk], table[tk])
 
     return result
 
@@ -396,58 +729,115 @@ def add_column(table, k, v, dtype=None, index=None, align='top'):
     else:
         raise ValueError("Column type not supported")
 
+    length = len(table)
+
     if index is None:
-        if len(v) > table.index.shape[1]:
-            table.index = np.concatenate(
-                [table.index,
-                 np.zeros(
-                     (table.index.shape[0],
-                      len(v) - table.index.shape[1]),
-                     dtype=np.uint8)],
-                axis=1
-            )
+        if len(v) > length:
+            length = len(v)
+            table.bitmaps = [bitmap.resize(length)
+                             for bitmap in table.bitmaps]
 
-        # Concatenate the shape of the array to the bitmap
-        index_stride = np.zeros((1, table.index.shape[1]), dtype=np.uint8)
+        # Set the rows of the bitmap spanned by the array
         if align == 'top':
-            index_stride[0, :len(v)] = 1
+            bitmap = Bitmap.from_range(0, len(v), length)
         elif align == 'bottom':
-            index_stride[0, -len(v):] = 1
+            bitmap = Bitmap.from_range(length - len(v), length, length)
         else:
             raise ValueError('Alignment can be either "top" or "bottom"')
 
-        table.index = np.concatenate([table.index, index_stride])
+        table.bitmaps.append(bitmap)
 
     else:
+        if isinstance(index, Bitmap):
+            # Bitmap.update changes the bitmap inplace, so the new column
+            # can not share it with other columns
+            bitmap = index.copy()
+        else:
+            bitmap = Bitmap.from_index(index)
+
         # Handle the fact that the new column my be longer, so extend bitmap
-        if index.shape[0] > table.index.shape[1]:
-            table.index = np.concatenate(
-                [table.index,
-                 np.zeros(
-                     (table.index.shape[0],
-                      index.shape[0] - table.index.shape[0]),
-                     dtype=np.uint8)],
-                axis=1
-            )
+        if len(bitmap) > length:
+            table.bitmaps = [b.resize(len(bitmap)) for b in table.bitmaps]
 
-        # Concatenate the new column to the bitmap.
-        table.index = np.concatenate([table.index, np.atleast_2d(index)])
+        table.bitmaps.append(bitmap)
 
 
 def filter_table(table, predicate):
-    new_keys = table.keys
-    new_data = list()
-    new_index = list()
+    new_data, new_bitmaps = filter_columns(table.data, table.bitmaps,
+                                           predicate)
+    return new_data, table.keys, new_bitmaps
 
-    # Now for the values
-    for column, index in zip(table.data, table.index):
-        data_filter, new_col_index = gen_column_filter(
-            predicate.values, predicate.index, index
+
+def filter_columns(data, bitmaps, predicate):
+    """
+    Filter the values and the bitmaps of a set of columns with a predicate
+
+    :param data: List of arrays with the values of the columns
+    :param bitmaps: List of bitmaps of the columns
+    :param predicate: Column with the predicate
+    :return: the new data and bitmaps
+    """
+    length = int(predicate.values.sum())
+    selection = predicate.values.astype(np.bool_)
+
+    def filter_column(column):
+        values, bitmap = column
+        if bitmap == predicate.bitmap:
+            # Aligned with the predicate, all the selected rows are present
+            return values[selection], Bitmap.ones(length)
+
+        data_filter, new_col_index = parallel_version(
+            gen_column_filter, len(bitmap))(
+            predicate.values, predicate.bitmap.words, bitmap.words
         )
-        new_index.append(new_col_index)
-        new_data.append(column[data_filter])
+        return values[data_filter], Bitmap.from_words(new_col_index, length)
+
+    filtered = map_columns(filter_column, zip(data, bitmaps),
+                           len(predicate.bitmap))
+    return ([values for values, _ in filtered],
+            [bitmap for _, bitmap in filtered])
+
+
+def select_columns(data, bitmaps, selection):
+    """
+    Gather the values and the bitmaps of a set of columns in a selection
+    of rows. The columns that share a bitmap are gathered with the same
+    positions.
+
+    :param data: List of arrays with the values of the columns
+    :param bitmaps: List of bitmaps of the columns
+    :param selection: Bitmap with the selected rows
+    :return: the new data and bitmaps
+    """
+    length = selection.count()
+
+    def gather(bitmap):
+        positions, new_index = gather_selection(bitmap.words,
+                                                selection.words)
+        if len(positions) == length:
+            return positions, Bitmap.ones(length)
+        return positions, Bitmap.from_words(new_index, length)
+
+    # The positions of each distinct bitmap are computed once
+    distinct = list({id(bitmap): bitmap for bitmap in bitmaps}.values())
+    gathered = dict(zip([id(bitmap) for bitmap in distinct],
+                        map_columns(gather, distinct, len(selection))))
+
+    def gather_column(column):
+        values, bitmap = column
+        positions, new_bitmap = gathered[id(bitmap)]
+        return values[positions], new_bitmap
 
-    return new_data, new_keys, np.vstack(new_index)
+    selected = map_columns(gather_column, zip(data, bitmaps), len(selection))
+
+    # Each column gets its own bitmap, since they are updated inplace
+    new_bitmaps = list()
+    seen = set()
+    for _, bitmap in selected:
+        new_bitmaps.append(bitmap.copy() if id(bitmap) in seen else bitmap)
+        seen.add(id(bitmap))
+
+    return [values for values, _ in selected], new_bitmaps
 
 
 def dropnan_table(table):
@@ -456,10 +846,12 @@ def dropnan_table(table):
         # Drop in data
         table[column] = table[column][~isnan]
         # Get index column
-        index = table.index[table.keys.index(column), :]
-        # Drop from index
-        enumerator = (np.cumsum(index) - np.array(1))[np.where(isnan)]
-        index[enumerator] = 0
+        position = table.keys.index(column)
+        bitmap = table.bitmaps[position]
+        index = bitmap.to_index()
+        # Drop from index the rows of the NaN values
+        index[bitmap.select(np.flatnonzero(isnan))] = 0
+        table.bitmaps[position] = Bitmap.from_index(index)
 
 
 def required_column(table, key, dtype):
@@ -469,18 +861,15 @@ def required_column(table, key, dtype):
 
     table.keys.append(key)
     table.data.append(np.array([], dtype=dtype))
-    table.index = np.vstack((table.index, np.zeros((1, table.index.shape[1]), dtype=np.uint8)))
+    table.bitmaps.append(Bitmap.zeros(len(table)))
 
 
 def required_columns(table, *args):
     """Adds the required columns inplace"""
     new_cols = set(args) - set(table.keys)
-    length = table.index.shape[1]
+    length = len(table)
 
     for col in new_cols:
         table.keys.append(col)
         table.data.append(np.array([]))
-        table.index = np.vstack(
-            (table.index, np.zeros((len(new_cols), length), dtype=np.uint8))
-        )
-
+        table.bitmaps.append(Bitmap.zeros(length))
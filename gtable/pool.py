@@ -0,0 +1,73 @@
+"""
+Thread pool that computes the columns of a table concurrently. The work
+on each column of a filter, a sort or a join is independent, and the numba
+kernels and the numpy operations they use release the GIL, so the columns
+of a wide table can be processed by several threads at once.
+
+The threads of the pool run the serial version of the kernels, so that the
+parallel kernels are not nested inside the pool.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Tables with less rows than this are processed serially
+POOL_ROWS = 65536
+
+_workers = os.cpu_count() or 1
+_executor = None
+_local = threading.local()
+
+
+def _initializer():
+    _local.worker = True
+
+
+def in_worker():
+    """True in the threads of the pool"""
+    return getattr(_local, 'worker', False)
+
+
+def set_workers(n):
+    """
+    Number of threads that process the columns of a table. With one worker
+    the columns are processed serially.
+
+    :param n: Number of threads
+    :return:
+    """
+    global _workers, _executor
+    if n < 1:
+        raise ValueError('At least one worker is required')
+
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    _workers = n
+
+
+def get_workers():
+    """Number of threads that process the columns of a table"""
+    return _workers
+
+
+def map_columns(function, columns, rows):
+    """
+    Apply a function to each column, on the pool if there are several
+    workers and the table is large enough, and serially otherwise.
+
+    :param function: Function of one column
+    :param columns: List with the columns, or with the arguments of each one
+    :param rows: Number of rows of the table
+    :return: List with the results, in the order of the columns
+    """
+    global _executor
+    columns = list(columns)
+
+    if _workers == 1 or rows < POOL_ROWS or len(columns) < 2:
+        return [function(column) for column in columns]
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(_workers, initializer=_initializer)
+
+    return list(_executor.map(function, columns))
@@ -0,0 +1,290 @@
+"""
+Readers that build tables from text files. Empty fields are missing
+values: they are holes in the bitmap of the column instead of NaN.
+"""
+import csv
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import zip_longest
+
+import numpy as np
+
+from gtable.bitmap import Bitmap
+from gtable.table import Table
+
+# Number of rows parsed at once when the chunk size is not given
+CHUNK_SIZE = 50000
+
+# Types tried in order when the dtype of a column is inferred
+INFERRED_DTYPES = [np.dtype(np.int64), np.dtype(np.float64),
+                   np.dtype('datetime64[ns]')]
+
+# Wider types tried when a chunk does not fit the inferred dtype of the
+# column. Strings are the last resort.
+WIDER_DTYPES = {np.dtype(np.int64): [np.dtype(np.float64)]}
+
+TRUE_STRINGS = ['1', 'true', 't', 'yes', 'y']
+
+
+def _convert(fields, dtype=None, widen=False):
+    """
+    Convert an array of strings to the given dtype, or to the first of the
+    inferred dtypes that can hold them. Strings are the last resort. With
+    widen, the fields that do not fit the given dtype are converted to a
+    wider one instead of raising.
+    """
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        if dtype.kind == 'b':
+            return np.isin(np.char.lower(np.char.strip(fields)),
+                           TRUE_STRINGS)
+        if not widen:
+            return fields.astype(dtype)
+
+        for dtype in [dtype] + WIDER_DTYPES.get(dtype, []):
+            try:
+                return fields.astype(dtype)
+            except (ValueError, OverflowError):
+                pass
+
+        return fields
+
+    for dtype in INFERRED_DTYPES:
+        try:
+            return fields.astype(dtype)
+        except (ValueError, OverflowError):
+            pass
+
+    return fields
+
+
+def _parse_chunk(lines, names, dtypes, sep, quotechar, inferred=()):
+    """
+    Parse a chunk of lines of a csv file. The columns in inferred are
+    widened if their values do not fit the dtype.
+
+    :return: data and bitmaps of the columns
+    """
+    rows = list(csv.reader(lines, delimiter=sep, quotechar=quotechar))
+    # Short rows are padded with empty fields
+    columns = list(zip_longest(*rows, fillvalue=''))[:len(names)]
+    columns += [('',) * len(rows)] * (len(names) - len(columns))
+
+    data = list()
+    bitmaps = list()
+    for name, column in zip(names, columns):
+        present = np.fromiter(map(bool, column), dtype=np.bool_,
+                              count=len(column))
+        fields = np.array([field for field in column if field],
+                          dtype=np.str_)
+        data.append(_convert(fields, dtypes.get(name), name in inferred))
+        bitmaps.append(Bitmap.from_index(present))
+
+    return data, bitmaps
+
+
+def _chunks(f, chunksize, quotechar):
+    """
+    Generator with lists of lines with chunksize rows. A row ends with a
+    line that is not inside a quoted field, so fields with newlines stay
+    in the same chunk.
+    """
+    chunk = list()
+    rows = 0
+    quoted = False
+    for line in f:
+        chunk.append(line)
+        if line.count(quotechar) % 2:
+            quoted = not quoted
+        if not quoted:
+            rows += 1
+            if rows >= chunksize:
+                yield chunk
+                chunk = list()
+                rows = 0
+
+    if chunk:
+        yield chunk
+
+
+def _fix_dtype(dtypes, name, values):
+    # Strings keep the width of each chunk
+    if values.dtype.kind == 'U':
+        dtypes[name] = np.str_
+    else:
+        dtypes[name] = values.dtype
+
+
+def _settled_dtypes(chunks, dtypes):
+    """
+    Dtype that holds the values of all the chunks, for each inferred column
+    whose chunks do not agree. Integers and floats settle to floats, and
+    any other mix to strings. Chunks without values of the column are not
+    taken into account.
+    """
+    settled = dict()
+    for i, name in enumerate(chunks[0].keys):
+        if name in dtypes:
+            continue
+
+        found = [chunk.data[i].dtype for chunk in chunks
+                 if chunk.bitmaps[i].count()]
+        kinds = {dtype.kind for dtype in found}
+        if len(kinds) == 1:
+            dtype = np.result_type(*found)
+        elif kinds == {'i', 'f'}:
+            dtype = np.dtype(np.float64)
+        elif kinds:
+            dtype = np.dtype(np.str_)
+        else:
+            continue
+
+        if any(chunk.data[i].dtype.kind != dtype.kind for chunk in chunks):
+            settled[name] = dtype
+
+    return settled
+
+
+def _table(names, data, bitmaps):
+    table = Table()
+    table.keys = names
+    table.data = data
+    table.bitmaps = bitmaps
+    return table
+
+
+def iter_csv(path, sep=',', dtypes=None, names=None, header=True,
+             chunksize=CHUNK_SIZE, processes=None, quotechar='"',
+             encoding='utf-8'):
+    """
+    Generator that reads a csv file and yields a table for each chunk
+    of rows. See read_csv.
+    """
+    dtypes = dict() if dtypes is None else dict(dtypes)
+
+    if hasattr(path, 'read'):
+        f = path
+    else:
+        f = open(path, newline='', encoding=encoding)
+
+    try:
+        if header:
+            header_row = next(csv.reader(f, delimiter=sep,
+                                         quotechar=quotechar), [])
+            if names is None:
+                names = header_row
+        if names is None:
+            raise ValueError('Column names are required without a header')
+        names = list(names)
+
+        chunks = _chunks(f, chunksize, quotechar)
+        first = next(chunks, [])
+        data, bitmaps = _parse_chunk(first, names, dtypes, sep, quotechar)
+
+        # Fix the dtypes found in the first chunk, so that all the chunks
+        # agree. Columns without values are inferred by each chunk. The
+        # inferred dtypes are widened by the chunks that do not fit them.
+        inferred = set()
+        for name, values, bitmap in zip(names, data, bitmaps):
+            if name not in dtypes and bitmap.count():
+                inferred.add(name)
+                _fix_dtype(dtypes, name, values)
+
+        yield _table(names, data, bitmaps)
+
+        parse = partial(_parse_chunk, names=names, dtypes=dtypes, sep=sep,
+                        quotechar=quotechar, inferred=inferred)
+        if processes is None or processes == 1:
+            for chunk in chunks:
+                data, bitmaps = parse(chunk)
+                # The next chunks start from the widened dtypes
+                for name, values in zip(names, data):
+                    if name in inferred:
+                        _fix_dtype(dtypes, name, values)
+                yield _table(names, data, bitmaps)
+
+        else:
+            # Forked workers may inherit the locks of the threads of the
+            # compiled kernels, so they start in a new interpreter
+            with ProcessPoolExecutor(
+                    processes,
+                    mp_context=multiprocessing.get_context('spawn')
+            ) as executor:
+                # Keep a bounded number of chunks in flight, in order
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(executor.submit(parse, chunk))
+                    if len(pending) >= 2 * processes:
+                        yield _table(names, *pending.popleft().result())
+
+                while pending:
+                    yield _table(names, *pending.popleft().result())
+
+    finally:
+        if f is not path:
+            f.close()
+
+
+def read_csv(path, sep=',', dtypes=None, names=None, header=True,
+             chunksize=None, processes=None, quotechar='"',
+             encoding='utf-8'):
+    """
+    Read a csv file. Empty fields are missing values of the column.
+
+    :param path: Path of the file or file object
+    :param sep: Field delimiter
+    :param dtypes: Dictionary column name -> dtype. The dtype of the columns
+      not given is inferred from the first chunk that has values. Integers,
+      floats and dates are tried before keeping the strings. A later chunk
+      that does not fit the inferred dtype widens it, integers to floats and
+      anything else to strings. Without chunksize, the values of all the
+      chunks take the widened dtype, and the columns widened to strings are
+      parsed again from the text if the file can be read again.
+    :param names: List with the column names. Replaces the header if given
+    :param header: True if the first line of the file is the header
+    :param chunksize: Number of rows of each chunk. If given, returns a
+      generator with a table for each chunk instead of a single table.
+    :param processes: Number of processes that parse the chunks in
+      parallel. The chunks are parsed serially if None.
+    :param quotechar: Character that quotes fields
+    :param encoding: Encoding of the file
+    :return: Table, or a generator of tables if chunksize is given
+    """
+    if chunksize is not None:
+        return iter_csv(path, sep, dtypes, names, header, chunksize,
+                        processes, quotechar, encoding)
+
+    dtypes = dict() if dtypes is None else dict(dtypes)
+    start = None
+    if hasattr(path, 'read') and path.seekable():
+        start = path.tell()
+
+    chunks = list(iter_csv(path, sep, dtypes, names, header, CHUNK_SIZE,
+                           processes, quotechar, encoding))
+    settled = _settled_dtypes(chunks, dtypes)
+
+    # Numbers and dates written back as strings may not be the text of the
+    # file, so these columns are parsed again as strings.
+    strings = {name: dtype for name, dtype in settled.items()
+               if dtype.kind == 'U'}
+    if strings and (start is not None or not hasattr(path, 'read')):
+        if start is not None:
+            path.seek(start)
+        dtypes.update(strings)
+        chunks = list(iter_csv(path, sep, dtypes, names, header, CHUNK_SIZE,
+                               processes, quotechar, encoding))
+        settled = _settled_dtypes(chunks, dtypes)
+
+    for chunk in chunks:
+        for i, name in enumerate(chunk.keys):
+            if (name in settled and
+                    chunk.data[i].dtype.kind != settled[name].kind):
+                chunk.data[i] = chunk.data[i].astype(settled[name])
+
+    table = chunks[0]
+    for chunk in chunks[1:]:
+        table.stack(chunk)
+
+    return table
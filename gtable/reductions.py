@@ -1,6 +1,9 @@
 import numpy as np
-from .fast import reduce_sum, reduce_prod, reduce_mean, reduce_std
+from .bitmap import Bitmap
+from .fast import reduce_sum, reduce_prod, reduce_mean, reduce_std, \
+    sum_dtype, mean_dtype
 from .table import Table
+from .lib import is_sorted, set_order
 
 
 def reduce_by_key(table, column_name, func, check_sorted=True):
@@ -14,49 +17,99 @@ def reduce_by_key(table, column_name, func, check_sorted=True):
     :return:
     """
     key_data = table[column_name]
-    key_index = table._index_column(column_name)
+    key_bitmap = table._bitmap_column(column_name)
 
     if func not in reduce_funcs:
         raise ValueError('Reduction not available')
 
     if check_sorted:
-        if not np.all(key_data == np.sort(key_data)):
+        if not is_sorted(table, column_name):
             raise ValueError('You can only reduce from a sorted column')
 
     unique_keys = np.unique(key_data)
     other_cols = set(table.keys) - {column_name}
     new_data = [unique_keys]
-    new_index = [np.ones(len(unique_keys), dtype=np.uint8)]
+    new_bitmaps = [Bitmap.ones(len(unique_keys))]
     new_keys = [column_name]
 
     # Check if key data is a string, and substitute with an equivalent integer
     if key_data.dtype.kind in {'S', 'U'}:
         key_data = np.searchsorted(key_data, key_data)
 
+    # With a dense key, each run of equal keys is a contiguous slice
+    if key_bitmap.dense and len(key_data):
+        starts = np.flatnonzero(np.r_[True, key_data[1:] != key_data[:-1]])
+        dense_path = len(starts) == len(unique_keys)
+    else:
+        dense_path = False
+
     for col in other_cols:
         col_data = table[col]
         if col_data.dtype.kind in {'S', 'U'}:
             # Strings cannot be arithmetically reduced.
             continue
-        col_index = table._index_column(col)
+        col_bitmap = table._bitmap_column(col)
+
+        if dense_path and col_bitmap.dense:
+            new_data.append(reduce_dense_funcs[func](col_data, starts))
+            new_bitmaps.append(Bitmap.ones(len(unique_keys)))
+            new_keys.append(col)
+            continue
 
         reduced_col_data, reduced_col_index = reduce_funcs[func](
-            key_data, key_index, col_data, col_index, len(unique_keys)
+            key_data, key_bitmap.words, col_data, col_bitmap.words,
+            len(unique_keys)
         )
         new_data.append(reduced_col_data)
-        new_index.append(reduced_col_index)
+        new_bitmaps.append(Bitmap.from_words(reduced_col_index,
+                                             len(unique_keys)))
         new_keys.append(col)
 
     t = Table()
     t.data = new_data
-    t.index = np.vstack(new_index)
+    t.bitmaps = new_bitmaps
     t.keys = new_keys
+    set_order(t.keys, column_name, 'asc', True)
 
     return t
 
 
-# Remember to update this dict when adding a new reduction
+def reduce_dense_sum(col_data, starts):
+    return np.add.reduceat(col_data, starts, dtype=sum_dtype(col_data.dtype))
+
+
+def reduce_dense_prod(col_data, starts):
+    return np.multiply.reduceat(col_data, starts,
+                                dtype=sum_dtype(col_data.dtype))
+
+
+def _counts(col_data, starts):
+    return np.diff(np.r_[starts, len(col_data)])
+
+
+def reduce_dense_mean(col_data, starts):
+    # Accumulated in double precision, like the kernels do
+    num = _counts(col_data, starts)
+    mean = np.add.reduceat(col_data, starts, dtype=np.float64) / num
+    return mean.astype(mean_dtype(col_data.dtype), copy=False)
+
+
+def reduce_dense_std(col_data, starts):
+    num = _counts(col_data, starts)
+    sum = np.add.reduceat(col_data, starts, dtype=np.float64)
+    sumsq = np.add.reduceat(col_data.astype(np.float64)**2, starts)
+    std = np.sqrt(sumsq / num - (sum / num)**2)
+    return std.astype(mean_dtype(col_data.dtype), copy=False)
+
+
+# Remember to update these dicts when adding a new reduction
 reduce_funcs = {'sum': reduce_sum,
                 'prod': reduce_prod,
                 'mean': reduce_mean,
                 'std': reduce_std}
+
+# Vectorized reductions when both the key and the column are dense
+reduce_dense_funcs = {'sum': reduce_dense_sum,
+                      'prod': reduce_dense_prod,
+                      'mean': reduce_dense_mean,
+                      'std': reduce_dense_std}
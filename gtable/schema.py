@@ -0,0 +1,122 @@
+"""
+Schema of a table: the ordered list of column names with a hash map from
+the name to the position of the column, and the metadata of each column.
+"""
+
+
+class Schema(list):
+    """
+    List of the column names of a table. Lookups by name use a hash map
+    that is kept in sync with the list, so that finding a column does not
+    scan the keys.
+
+    :param keys: Iterable with the column names.
+    :param metadata: Dictionary name -> dictionary with the metadata of the
+      columns.
+    """
+    def __init__(self, keys=(), metadata=None):
+        super().__init__(keys)
+        self.metadata = dict()
+        self._build()
+
+        if isinstance(keys, Schema):
+            self.metadata.update(
+                {k: dict(v) for k, v in keys.metadata.items()})
+        if metadata is not None:
+            self.metadata.update(metadata)
+
+    def _build(self):
+        # The first occurrence wins, like list.index
+        self._positions = dict()
+        for position, key in enumerate(self):
+            self._positions.setdefault(key, position)
+
+        # Drop the metadata of the columns that are gone
+        if hasattr(self, 'metadata'):
+            for key in set(self.metadata) - set(self._positions):
+                del self.metadata[key]
+
+    def index(self, key, *args):
+        """Position of the column key"""
+        if not args:
+            try:
+                return self._positions[key]
+            except (KeyError, TypeError):
+                raise ValueError('{!r} is not in list'.format(key))
+
+        return super().index(key, *args)
+
+    def rename(self, old_name, new_name):
+        """
+        Rename a column in place, keeping its position and metadata.
+
+        :param old_name:
+        :param new_name:
+        :return:
+        """
+        if new_name in self._positions:
+            raise ValueError('Column names must be unique')
+
+        position = self.index(old_name)
+        super().__setitem__(position, new_name)
+        del self._positions[old_name]
+        self._positions[new_name] = position
+        if old_name in self.metadata:
+            self.metadata[new_name] = self.metadata.pop(old_name)
+
+    def copy(self):
+        return Schema(self)
+
+    def append(self, key):
+        self._positions.setdefault(key, len(self))
+        super().append(key)
+
+    def extend(self, keys):
+        for key in keys:
+            self.append(key)
+
+    def __iadd__(self, keys):
+        self.extend(keys)
+        return self
+
+    def insert(self, position, key):
+        super().insert(position, key)
+        self._build()
+
+    def pop(self, position=-1):
+        key = super().pop(position)
+        self._build()
+        return key
+
+    def remove(self, key):
+        super().remove(key)
+        self._build()
+
+    def clear(self):
+        super().clear()
+        self._build()
+
+    def reverse(self):
+        super().reverse()
+        self._build()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._build()
+
+    def __setitem__(self, position, key):
+        super().__setitem__(position, key)
+        self._build()
+
+    def __delitem__(self, position):
+        super().__delitem__(position)
+        self._build()
+
+    def __contains__(self, key):
+        try:
+            return key in self._positions
+        except TypeError:
+            return False
+
+    def __reduce__(self):
+        return self.__class__, (list(self), self.metadata)
@@ -0,0 +1,120 @@
+"""
+On-disk format of a table. A table is saved in a directory with one raw
+file for the values of each column, one raw file for each bitmap, and a
+JSON file with the schema. The raw files can be opened as memory maps.
+"""
+import os
+import json
+import numpy as np
+
+from gtable.bitmap import Bitmap, n_words
+from gtable.schema import Schema
+
+SCHEMA_FILE = 'schema.json'
+FORMAT_VERSION = 1
+
+
+def _column_file(path, position, kind):
+    return os.path.join(path, '{}.{}'.format(position, kind))
+
+
+def _write_array(array, filename):
+    with open(filename, 'wb') as f:
+        np.ascontiguousarray(array).tofile(f)
+
+
+def _read_array(filename, dtype, shape, mmap):
+    if not np.prod(shape):
+        # Empty files can not be memory mapped
+        return np.empty(shape, dtype=dtype)
+
+    if mmap:
+        # Copy on write, changes are never written back to the file
+        return np.memmap(filename, dtype=dtype, mode='c',
+                         shape=shape).view(np.ndarray)
+
+    return np.fromfile(filename, dtype=dtype).reshape(shape)
+
+
+def save_table(table, path):
+    """
+    Save a table to a directory, creating it if necessary.
+
+    :param table: a Table.
+    :param path: Path of the directory.
+    :return:
+    """
+    columns = list()
+    os.makedirs(path, exist_ok=True)
+
+    for position, (key, values, bitmap) in enumerate(
+            zip(table.keys, table.data, table.bitmaps)):
+        if values.dtype.hasobject:
+            raise ValueError(
+                "Column {} of objects can not be saved".format(key))
+
+        _write_array(values, _column_file(path, position, 'data'))
+        if bitmap.runs is not None:
+            storage = 'runs'
+            _write_array(bitmap.runs, _column_file(path, position, storage))
+        else:
+            storage = 'words'
+            _write_array(bitmap.words, _column_file(path, position, storage))
+
+        columns.append({'name': key,
+                        'dtype': values.dtype.str,
+                        'length': len(values),
+                        'bitmap': storage,
+                        'rows': len(bitmap),
+                        'nruns': (len(bitmap.runs) if storage == 'runs'
+                                  else None),
+                        'metadata': table.keys.metadata.get(key)})
+
+    # The schema is written last, a directory without it is not a table
+    with open(os.path.join(path, SCHEMA_FILE), 'w') as f:
+        json.dump({'version': FORMAT_VERSION,
+                   'length': len(table),
+                   'columns': columns}, f)
+
+
+def open_table(path, mmap=True):
+    """
+    Open a table saved in a directory.
+
+    :param path: Path of the directory.
+    :param mmap: If True the columns are memory mapped, and only the pages
+      that are accessed are read from disk. Otherwise the columns are read
+      to memory.
+    :return: data, keys and bitmaps of the table
+    """
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+
+    if schema['version'] > FORMAT_VERSION:
+        raise ValueError('Unsupported format version {}'.format(
+            schema['version']))
+
+    data = list()
+    keys = Schema()
+    bitmaps = list()
+
+    for position, column in enumerate(schema['columns']):
+        keys.append(column['name'])
+        if column['metadata'] is not None:
+            keys.metadata[column['name']] = column['metadata']
+
+        data.append(_read_array(_column_file(path, position, 'data'),
+                                np.dtype(column['dtype']),
+                                (column['length'],), mmap))
+
+        storage = column['bitmap']
+        filename = _column_file(path, position, storage)
+        if storage == 'runs':
+            runs = _read_array(filename, np.int64, (column['nruns'], 2), mmap)
+            bitmaps.append(Bitmap(None, column['rows'], runs))
+        else:
+            words = _read_array(filename, np.uint64,
+                                (n_words(column['rows']),), mmap)
+            bitmaps.append(Bitmap(words, column['rows']))
+
+    return data, keys, bitmaps
@@ -1,11 +1,21 @@
+import operator
+import weakref
 import numpy as np
 import pandas as pd
-from functools import partial
+from functools import partial, reduce
 
+from gtable.bitmap import Bitmap
 from gtable.column import Column
+from gtable.expression import Expression
+from gtable.schema import Schema
+from gtable.storage import save_table, open_table
+from gtable.columnar import write_table, read_table, ROW_GROUP_SIZE, \
+    OPERATORS, _parse_where
 from gtable.lib import records, stack_table_inplace, add_column, \
     merge_table, sort_table, filter_table, dropnan_table, first_record, \
-    last_record, fillna_column, from_chunks, required_columns, required_column
+    last_record, fillna_column, from_chunks, required_columns, \
+    required_column, row_record, dense_column, pandas_column, slice_table, \
+    itertuples, select_columns, column_order, set_order
 
 
 def _check_length(i, k, this_length, length_last):
@@ -42,12 +52,17 @@ class Table:
     sparse storage
     """
     def __init__(self, data={}):
-        # This list stores the keys
-        self.keys = []
+        # This list stores the keys, hashed by the schema
+        self.keys = Schema()
         # This list stores the columns
         self.data = []
-        # This is the index bitmap
-        self.index = None
+        # This list stores the bit-packed index of each column
+        self.bitmaps = []
+        # Matrix view of the bitmaps, built by the index property
+        self._matrix = [], None
+        # Arrays allocated or copied by the table, by id. Only these are
+        # written by the in-place operators of the columns.
+        self._owned = weakref.WeakValueDictionary()
         length_last = 0
 
         # Creating the table only supports assigning a single index
@@ -60,6 +75,7 @@ class Table:
                     self.data.append(np.array(pd.DatetimeIndex(v).values, dtype='datetime64[ns]'))
                 else:
                     self.data.append(np.array(v))
+                self._own(self.data[-1])
                 self.keys.append(k)
                 length_last = _check_length(i, k, len(v), length_last)
                     
@@ -83,13 +99,63 @@ class Table:
                 raise ValueError("Column type not supported")
 
         # Create the index and the ordered arrays
-        self.index = np.ones((len(data), length_last), dtype=np.uint8)
+        self.bitmaps = [Bitmap.ones(length_last) for _ in self.keys]
 
     def _repr_html_(self):
         return "<i>xxx</i>"
 
-    def _index_column(self, key):
-        return self.index[self.keys.index(key), :]
+    def _bitmap_column(self, key):
+        return self.bitmaps[self.keys.index(key)]
+
+    def _own(self, values):
+        self._owned[id(values)] = values
+
+    def _owns(self, values):
+        """
+        True if the table allocated or copied the values, and no other
+        column of the table shares them.
+        """
+        return (self._owned.get(id(values)) is values and
+                sum(v is values for v in self.data) == 1)
+
+    @property
+    def schema(self):
+        """Schema of the table, the keys with the metadata of the columns"""
+        return self.keys
+
+    @property
+    def dtypes(self):
+        """Dictionary column name -> dtype of the values"""
+        return {k: v.dtype for k, v in zip(self.keys, self.data)}
+
+    @property
+    def index(self):
+        """
+        Read-only bitmap index of the table as a (columns, rows) array of
+        zeros and ones. The matrix is unpacked from the bitmaps of the
+        columns, and cached until any of them changes.
+        """
+        versions = [(bitmap, bitmap.version) for bitmap in self.bitmaps]
+        cached_versions, matrix = self._matrix
+
+        if len(versions) == len(cached_versions) and all(
+                bitmap is cached and version == cached_version
+                for (bitmap, version), (cached, cached_version)
+                in zip(versions, cached_versions)):
+            return matrix
+
+        if not self.bitmaps:
+            matrix = np.empty((0, 0), dtype=np.uint8)
+        else:
+            matrix = np.vstack([bitmap.to_index() for bitmap in self.bitmaps])
+        matrix.setflags(write=False)
+        self._matrix = versions, matrix
+
+        return matrix
+
+    @index.setter
+    def index(self, index):
+        self.bitmaps = [Bitmap.from_index(row) for row in index]
 
     def copy(self):
         """
@@ -97,8 +163,10 @@ class Table:
         """
         t = Table()
         t.data = [d.copy() for d in self.data]
-        t.keys = self.keys[:]
-        t.index = self.index.copy()
+        t.keys = self.keys.copy()
+        t.bitmaps = [bitmap.copy() for bitmap in self.bitmaps]
+        for values in t.data:
+            t._own(values)
 
         return t
 
@@ -115,35 +183,128 @@ class Table:
         del self[k]
         idx = self.keys.index(k)
         self.keys.pop(idx)
-        self.index = np.delete(self.index, idx, axis=0)
+        self.bitmaps.pop(idx)
 
     def stack(self, table):
         """Vertical (Table) concatenation."""
         stack_table_inplace(self, table)
 
     def merge(self, table, column):
-        """Merge two tables using two dense and sorted columns"""
-        self.data, self.keys, self.index = merge_table(table, self, column)
+        """
+        Merge two tables using two dense and sorted columns, or a list of
+        columns sorted in lexicographic order.
+        """
+        self.data, self.keys, self.bitmaps = merge_table(table, self, column)
 
     def records(self, fill=False):
         """Generator that returns a dictionary for each row of the table"""
         yield from records(self, fill)
 
+    def iter_batches(self, size, form='table'):
+        """
+        Generator with the rows of the table in batches of size rows. The
+        batches share the values of the table.
+
+        :param size: Number of rows of each batch
+        :param form: 'table' yields tables, 'dict' yields dictionaries
+          {key -> array_of_values} with NaN for the empty values, and
+          'numpy' yields structured arrays.
+        :return:
+        """
+        if form not in ('table', 'dict', 'numpy'):
+            raise ValueError('Form can be either "table", "dict" or "numpy"')
+
+        for start in range(0, len(self), size):
+            data, keys, bitmaps = slice_table(self, start, start + size)
+
+            if form == 'table':
+                t = Table()
+                t.data, t.keys, t.bitmaps = data, keys, bitmaps
+                yield t
+            else:
+                columns = [dense_column(values, bitmap)
+                           for values, bitmap in zip(data, bitmaps)]
+                if form == 'dict':
+                    yield dict(zip(keys, columns))
+                else:
+                    yield np.rec.fromarrays(columns, names=list(keys))
+
+    def itertuples(self, size=None):
+        """
+        Generator that returns a tuple for each row of the table, with NaN
+        for the empty values.
+
+        :param size: Number of rows converted at once
+        :return:
+        """
+        yield from itertuples(self, size)
+
     def sort_by(self, column):
         """Sorts by values of a column"""
         sort_table(self, column)
 
+    def order(self, key):
+        """
+        Order of the values of a column. It is kept in the metadata of the
+        column by the operations that know it, like sort_by, and computed
+        in a single pass over the values otherwise.
+
+        :param key: Name of the column
+        :return: dictionary with the order, 'asc', 'desc' or None if the
+          values are not sorted, and True in strict if there are no
+          repeated values.
+        """
+        return dict(column_order(self, key))
+
     def filter(self, predicate):
         """Filter table using a column specification or predicate"""
         t = Table()
-        t.data, t.keys, t.index = filter_table(self, predicate)
+        if type(predicate) == Expression:
+            # Select the rows in a single pass, without the boolean column
+            t.data, t.bitmaps = select_columns(self.data, self.bitmaps,
+                                               predicate.select())
+            t.keys = self.keys
+        else:
+            t.data, t.keys, t.bitmaps = filter_table(self, predicate)
         return t
 
+    def filter_where(self, *where):
+        """
+        Filter the table with (column, op, value) clauses that have to be
+        satisfied together. op is one of ==, !=, <, <=, > or >=. The rows
+        are selected with a single compiled pass over the columns of the
+        clauses, and all the columns are gathered from that selection::
+
+            t.filter_where('price', '>', 100)
+            t.filter_where(('price', '>', 100), ('volume', '<=', 10))
+
+        :param where: A single clause, several clauses as tuples, or a list
+          of clauses
+        :return: The filtered table
+        """
+        if len(where) == 1 and isinstance(where[0], list):
+            where = where[0]
+        elif where and isinstance(where[0], tuple):
+            where = list(where)
+        clauses = _parse_where(where)
+        if not clauses:
+            raise ValueError('At least one clause is required')
+
+        for column, op, value in clauses:
+            if column not in self.keys:
+                raise ValueError('{} not in table'.format(column))
+
+        predicate = reduce(operator.and_, [
+            OPERATORS[op](self.get(column).lazy(), value)
+            for column, op, value in clauses])
+        return self.filter(predicate)
+
     def sieve(self, idx):
         """Filter table using a one-dimensional array of boolean values"""
         t = Table()
         # This could be improved, but added as syntactic sugar ATM.
-        t.data, t.keys, t.index = filter_table(self, Column(idx.astype(np.int8), np.ones_like(idx)))
+        t.data, t.keys, t.bitmaps = filter_table(
+            self, Column(idx.astype(np.int8), Bitmap.ones(len(idx))))
         return t
 
     def crop(self, key):
@@ -151,7 +312,7 @@ class Table:
         t = Table()
         col = self.get(key)
         predicate = (col == col)
-        t.data, t.keys, t.index = filter_table(self, predicate)
+        t.data, t.keys, t.bitmaps = filter_table(self, predicate)
         return t
 
     def first_record(self, fill=False):
@@ -162,12 +323,38 @@ class Table:
         """Returns the last record of the table"""
         return last_record(self, fill)
 
-    def to_pandas(self, fill=False):
-        """Translate the table to a pandas dataframe"""
-        return pd.DataFrame.from_records(self.records(fill))
+    def row(self, i, fill=False):
+        """Returns the record at the row i of the table"""
+        return row_record(self, i, fill)
+
+    def to_pandas(self, fill=False, nullable=False):
+        """
+        Translate the table to a pandas dataframe
+
+        :param fill: Kept for compatibility, the missing values of the
+          columns are always filled.
+        :param nullable: If True, the columns with missing values are pandas
+          nullable arrays, that keep them apart from NaN. Otherwise they
+          are NaN.
+        :return:
+        """
+        return pd.DataFrame(
+            {k: dense_column(v, bitmap, nullable)
+             for k, v, bitmap in zip(self.keys, self.data, self.bitmaps)},
+            index=pd.RangeIndex(len(self)), columns=list(self.keys))
+
+    def to_dict(self, fill=False):
+        """
+        Translate the table to a dict {key -> array_of_values}
+
+        :param fill: If True, the arrays have a value for each row of the
+          table, with NaN for the missing values.
+        :return:
+        """
+        if fill:
+            return {k: dense_column(v, bitmap) for k, v, bitmap
+                    in zip(self.keys, self.data, self.bitmaps)}
 
-    def to_dict(self):
-        """Translate the table to a dict {key -> array_of_values}"""
         return {k: v for k, v in zip(self.keys, self.data)}
 
     def dropnan(self, clip=False):
@@ -175,20 +362,35 @@ class Table:
         dropnan_table(self)
 
     def get(self, key, copy=False):
-        """Gets a column or a table with columns"""
+        """
+        Gets a column or a table with columns. The table shares the values
+        and the bitmaps of the columns unless copy is True. Table methods
+        replace the arrays of the columns they change instead of writing
+        on them, so changes on either table are not seen by the other.
+
+        :param key: Name of a column or list of names
+        :param copy: If True, copy the values and the bitmaps
+        :return: A Column or a Table
+        """
         if type(key) == str:
-            return Column(self[key], self._index_column(key))
+            return Column(self[key], self._bitmap_column(key))
 
         elif type(key) == list or type(key) == tuple:
             t = Table()
             indices = [self.keys.index(k) for k in key]
             if copy:
                 t.data = [self.data[idx].copy() for idx in indices]
-                t.index = self.index[indices, :][:, :]
+                t.bitmaps = [self.bitmaps[idx].copy() for idx in indices]
+                for values in t.data:
+                    t._own(values)
             else:
-                t.data = [self.data[idx].copy() for idx in indices]
-                t.index = self.index[indices, :]
-            t.keys = key
+                t.data = [self.data[idx] for idx in indices]
+                t.bitmaps = [self.bitmaps[idx] for idx in indices]
+                # Shared with the projection, neither table writes on them
+                for values in t.data:
+                    self._owned.pop(id(values), None)
+            t.keys = Schema(key, {k: dict(self.keys.metadata[k])
+                                  for k in key if k in self.keys.metadata})
 
             return t
 
@@ -203,12 +405,12 @@ class Table:
         """
         if (type(key) == list) or (type(key) == tuple):
             for k in key:
-                self[k], self.index[self.keys.index(k), :] = fillna_column(
-                    self[k], self._index_column(k), reverse, fillvalue)
+                self[k], self.bitmaps[self.keys.index(k)] = fillna_column(
+                    self[k], self._bitmap_column(k), reverse, fillvalue)
 
         else:
-            self[key], self.index[self.keys.index(key), :] = fillna_column(
-                self[key], self._index_column(key), reverse, fillvalue)
+            self[key], self.bitmaps[self.keys.index(key)] = fillna_column(
+                self[key], self._bitmap_column(key), reverse, fillvalue)
 
     def fill_column(self, key, fillvalue):
         """
@@ -265,24 +467,85 @@ class Table:
         :param new_name:
         :return:
         """
-        idx = self.keys.index(old_name)
-        if new_name not in self.keys:
-            self.keys[idx] = new_name
-        else:
-            raise ValueError('Column names must be unique')
+        self.keys.rename(old_name, new_name)
+
+    @classmethod
+    def from_pandas(cls, dataframe, index=True, copy=False):
+        """
+        Create a table from a pandas dataframe. Nulls (NaN in float columns,
+        NA, NaT and None) are missing values of the columns.
+
+        :param dataframe: A pandas DataFrame
+        :param index: If True, the index of the dataframe is the idx column
+        :param copy: If False, the columns without nulls share memory with
+          the dataframe when possible.
+        :return:
+        """
+        table = cls()
+        columns = list(dataframe.items())
+        if index:
+            columns.insert(0, ('idx', dataframe.index))
+
+        for k, values in columns:
+            values, bitmap = pandas_column(values, copy)
+            table.keys.append(k)
+            table.data.append(values)
+            table.bitmaps.append(bitmap)
+
+        if index and dataframe.index.is_monotonic_increasing:
+            set_order(table.keys, 'idx', 'asc', dataframe.index.is_unique)
+
+        return table
+
+    def save(self, path):
+        """
+        Save the table to a directory, with a raw file for the values and
+        the bitmap of each column.
+
+        :param path: Path of the directory
+        :return:
+        """
+        save_table(self, path)
 
     @classmethod
-    def from_pandas(cls, dataframe):
-        """Create a table from a pandas dataframe"""
-        table = {'idx': dataframe.index.values}
-        table.update({k: dataframe[k].values for k in dataframe})
+    def open(cls, path, mmap=True):
+        """
+        Open a table saved with Table.save
 
-        # Try to reconvert columns of objects
-        for k in table:
-            if table[k].dtype == np.dtype('O'):
-                table[k] = np.array(list(table[k]))
+        :param path: Path of the directory
+        :param mmap: Memory map the columns instead of reading them
+        :return:
+        """
+        table = cls()
+        table.data, table.keys, table.bitmaps = open_table(path, mmap)
+        return table
+
+    def write(self, path, row_group_size=ROW_GROUP_SIZE, compression='zlib'):
+        """
+        Write the table to a compressed columnar file
 
-        return cls(table)
+        :param path: Path of the file
+        :param row_group_size: Number of rows of each row group
+        :param compression: 'zlib', 'lzma' or None
+        :return:
+        """
+        write_table(self, path, row_group_size, compression)
+
+    @classmethod
+    def read(cls, path, columns=None, where=None):
+        """
+        Read a table from a file written with Table.write
+
+        :param path: Path of the file
+        :param columns: List of the columns to read, all if None
+        :param where: Tuple (column, op, value) or list of tuples with the
+          predicate the rows have to satisfy, like ('a', '>=', 3)
+        :return:
+        """
+        table = cls()
+        table.data, table.keys, table.bitmaps = read_table(path, columns,
+                                                           where)
+        return table
 
     @staticmethod
     def from_chunks(chunks):
@@ -301,7 +564,7 @@ class Table:
                 column_type = v.dtype
             else:
                 column_type = 'object'
-            count = np.count_nonzero(self._index_column(k))
+            count = self._bitmap_column(k).count()
             column_info.append('{}[{}] <{}>'.format(k, count, column_type))
 
         return "<Table[ {} ] object at {}>".format(', '.join(column_info),
@@ -315,7 +578,8 @@ class Table:
         return []
     
     def __getattr__(self, key):
-        return Column(self.data[self.keys.index(key)], self._index_column(key))
+        return Column(self.data[self.keys.index(key)],
+                      self._bitmap_column(key), self)
 
     def __getitem__(self, key):
         return self.data[self.keys.index(key)]
@@ -323,6 +587,7 @@ class Table:
     def __setitem__(self, key, value):
         if isinstance(value, np.ndarray):
             self.data[self.keys.index(key)] = value
+            set_order(self.keys, key, None)
         else:
             raise ValueError('Direct assignment only valid with Numpy arrays')
 
@@ -330,15 +595,26 @@ class Table:
         del self.data[self.keys.index(key)]
 
     def __setattr__(self, key, value):
-        if key in ['data', 'keys', 'index']:
-            self.__dict__[key] = value
+        if key == 'keys':
+            object.__setattr__(self, key, Schema(value))
+        elif key in ['data', 'index', 'bitmaps', '_matrix', '_owned']:
+            object.__setattr__(self, key, value)
         else:
+            if type(value) == Expression:
+                value = value.evaluate()
+
+            if key in self.keys:
+                # The new values may be in any order
+                set_order(self.keys, key, None)
+
             if type(value) == Column:
                 if key in self.keys:
                     self.data[self.keys.index(key)] = value.values
-                    self.index[self.keys.index(key), :] = value.index
+                    # Bitmap.update changes the bitmap inplace, so it is
+                    # not shared with the column it comes from
+                    self.bitmaps[self.keys.index(key)] = value.bitmap.copy()
                 else:
-                    self.add_column(key, value.values, value.index)
+                    self.add_column(key, value.values, index=value.bitmap)
 
             elif type(value) == np.ndarray:
                 if key in self.keys:
@@ -354,18 +630,29 @@ class Table:
 
     def __getstate__(self):
 
-        index = self.index.copy()
+        bitmaps = [bitmap.copy() for bitmap in self.bitmaps]
         data = [d.copy() for d in self.data]
-        keys = self.keys[:]
+        keys = self.keys.copy()
 
-        return index, data, keys
+        return bitmaps, data, keys
 
     def __setstate__(self, state):
 
-        index, data, keys = state
-        self.index = index
+        bitmaps, data, keys = state
+        self._matrix = [], None
+        self._owned = weakref.WeakValueDictionary()
+        # Tables pickled before the bitmaps were packed store the index.
+        if isinstance(bitmaps, np.ndarray):
+            self.index = bitmaps
+        else:
+            self.bitmaps = bitmaps
         self.data = data
         self.keys = keys
+        for values in data:
+            self._own(values)
 
     def __len__(self):
-        return self.index.shape[1]
+        if not self.bitmaps:
+            return 0
+
+        return len(self.bitmaps[0])
@@ -0,0 +1,76 @@
+from gtable import Table, Column
+from gtable.bitmap import Bitmap
+import numpy as np
+
+
+def test_pack_unpack():
+    index = np.random.randint(0, 2, 200).astype(np.uint8)
+    bitmap = Bitmap.from_index(index)
+
+    assert bitmap.words.dtype == np.uint64
+    assert len(bitmap.words) == 4
+    assert np.all(bitmap.to_index() == index)
+    assert bitmap.count() == index.sum()
+
+
+def test_range():
+    bitmap = Bitmap.from_range(3, 130, 150)
+    index = np.zeros(150, dtype=np.uint8)
+    index[3:130] = 1
+
+    assert np.all(bitmap.to_index() == index)
+    assert bitmap.rank(100) == 97
+    assert np.all(bitmap.positions() == np.arange(3, 130))
+
+
+def test_concatenate():
+    top = np.random.randint(0, 2, 70).astype(np.uint8)
+    bottom = np.random.randint(0, 2, 100).astype(np.uint8)
+    bitmap = Bitmap.from_index(top).concatenate(Bitmap.from_index(bottom))
+
+    assert len(bitmap) == 170
+    assert np.all(bitmap.to_index() == np.concatenate([top, bottom]))
+
+
+def test_sparse_add_long():
+    t = Table()
+    t.add_column('a', np.arange(200), index=np.arange(400) % 2)
+    t.add_column('b', np.arange(300), index=np.arange(400) < 300)
+    c = t.a + t.b
+
+    assert np.all(c.index == (np.arange(400) % 2) * (np.arange(400) < 300))
+    assert np.all(c.values == np.arange(150) + np.arange(1, 300, 2))
+
+
+def test_rank_select():
+    index = (np.random.rand(3000) < 0.3).astype(np.uint8)
+    index[0] = 1
+    bitmap = Bitmap(Bitmap.from_index(index).words, 3000)
+    positions = np.arange(3000)
+    present = np.flatnonzero(index)
+
+    assert np.all(bitmap.rank(positions) == np.cumsum(index) - index)
+    assert np.all(bitmap.select(np.arange(len(present))) == present)
+    assert bitmap.select(0) == 0
+    assert np.all(bitmap.present(positions) == index.astype(np.bool_))
+
+
+def test_column_take():
+    c = Column(np.array([1, 2, 3]), np.array([1, 0, 1, 1], dtype=np.uint8))
+    taken = c.take(np.array([3, 1, 0, -1]))
+
+    assert np.all(taken.index == np.array([1, 0, 1, 1]))
+    assert np.all(taken.values == np.array([3, 1, 3]))
+
+
+def test_concatenate_bitmaps():
+    from gtable.bitmap import concatenate_bitmaps
+    rs = np.random.RandomState(0)
+    indices = [rs.randint(0, 2, 70), np.ones(64), np.zeros(3),
+               np.r_[np.zeros(10), np.ones(100)], rs.randint(0, 2, 200)]
+    bitmaps = [Bitmap.from_index(index) for index in indices]
+
+    bitmap = concatenate_bitmaps(bitmaps)
+    assert np.all(bitmap.to_index() == np.concatenate(indices))
+    assert concatenate_bitmaps(bitmaps[1:2] * 3).dense
+    assert len(concatenate_bitmaps([])) == 0
@@ -0,0 +1,45 @@
+from gtable import Table
+from gtable.buffer import append, capacity
+import numpy as np
+
+
+def test_append_grows_in_place():
+    values = append(np.arange(3), np.arange(3, 5))
+    assert capacity(values) == 6
+
+    grown = append(values, np.arange(5, 6))
+    assert np.all(grown == np.arange(6))
+    assert np.shares_memory(grown, values)
+    assert np.all(values == np.arange(5))
+
+
+def test_append_shared_view():
+    values = append(np.arange(3), np.arange(3, 5))
+    left = append(values, np.array([10]))
+    # values no longer ends at the last written row, it has to be copied
+    right = append(values, np.array([20]))
+
+    assert np.all(left == np.array([0, 1, 2, 3, 4, 10]))
+    assert np.all(right == np.array([0, 1, 2, 3, 4, 20]))
+    assert not np.shares_memory(left, right)
+
+
+def test_append_promotes():
+    values = append(np.arange(3), np.arange(3, 5))
+    values = append(values, np.array([0.5]))
+
+    assert values.dtype == np.float64
+    assert np.all(values == np.array([0, 1, 2, 3, 4, 0.5]))
+
+
+def test_stack_many():
+    t = Table({'a': np.arange(2), 'b': np.arange(2)})
+    copy = t.copy()
+    for i in range(100):
+        t.stack(Table({'a': np.arange(2)}))
+
+    assert len(t) == 202
+    assert np.all(t.a.values == np.tile(np.arange(2), 101))
+    assert np.all(t.b.index == (np.arange(202) < 2))
+    assert capacity(t['a']) >= 202
+    assert np.all(copy.a.values == np.arange(2))
@@ -1,5 +1,6 @@
 from gtable import Table
 import numpy as np
+import pandas as pd
 
 
 def test_add():
@@ -12,6 +13,21 @@ def test_mul():
     assert np.all((t.a * t.a).values == np.array([1, 4, 9]))
 
 
+def test_reflected():
+    t = Table({'a': [1, 2, 4]})
+    t.add_column('b', [2, 4], index=[1, 0, 1])
+
+    assert np.all((10 - t.a).values == np.array([9, 8, 6]))
+    assert np.all((8 / t.a).values == np.array([8.0, 4.0, 2.0]))
+    assert np.all((9 // t.a).values == np.array([9, 4, 2]))
+    assert np.all((2 ** t.a).values == np.array([2, 4, 16]))
+    assert np.all((7 % t.a).values == np.array([0, 1, 3]))
+
+    c = 1 - t.b
+    assert np.all(c.values == np.array([-1, -3]))
+    assert c.bitmap == t.b.bitmap
+
+
 def test_add_align():
     t = Table()
     t.add_column('a', [1, 2, 3, 4, 5, 6], dtype=np.int64)
@@ -45,3 +61,90 @@ def test_date_range():
         t.a.date_range(fr='1970-01-05').values) == 3
     assert np.count_nonzero(
         t.a.date_range(fr='1970-01-05', include_fr=False).values) == 2
+
+
+def test_column_dtypes():
+    t = Table()
+    t.add_column('a', np.arange(10, dtype=np.float32))
+    t.add_column('b', np.arange(1, 6, dtype=np.float32),
+                 index=np.arange(10) % 2)
+    t.add_column('i', np.arange(10, dtype=np.int32))
+    t.add_column('j', np.arange(1, 6, dtype=np.int32),
+                 index=np.arange(10) % 2)
+
+    assert (t.a + t.b).values.dtype == np.float32
+    assert (t.a * t.a).values.dtype == np.float32
+    assert (t.i + t.j).values.dtype == np.int32
+    assert (t.i // t.j).values.dtype == np.int32
+    assert (t.i / t.j).values.dtype == np.float64
+    assert (t.a + t.i).values.dtype == np.float64
+    assert np.all((t.i - t.j).values == np.array([0, 1, 2, 3, 4]))
+
+
+def test_column_inplace():
+    t = Table({'pnl': np.zeros(10), 'qty': np.arange(10.0),
+               'px': np.full(10, 2.0)})
+    t.add_column('s', np.arange(5.0), index=np.arange(10) % 2)
+
+    # The table does not own the arrays it was built with, so the first
+    # operator allocates the values that the next ones write on
+    t.pnl += t.qty * t.px
+    pnl = t['pnl']
+    t.pnl -= 1
+    t.pnl += t.qty.lazy() * t.px
+    assert t['pnl'] is pnl
+    assert np.all(t['pnl'] == np.arange(10) * 4.0 - 1)
+
+    t.s *= t.qty
+    s = t['s']
+    t.s *= 1
+    assert t['s'] is s
+    assert np.all(t.s.values == np.arange(5) * np.arange(1, 10, 2))
+
+    # The result has less rows, it is a new column
+    t.pnl += t.s
+    assert t['pnl'] is not pnl
+    assert np.all(t.pnl.index == np.arange(10) % 2)
+
+
+def test_column_inplace_dtype():
+    t = Table({'i': np.arange(5, dtype=np.int32)})
+    t.i += 1
+    values = t['i']
+
+    t.i += 1
+    assert t['i'] is values
+    assert np.all(t['i'] == np.arange(2, 7))
+
+    t.i /= 2
+    assert t['i'] is not values
+    assert t['i'].dtype == np.float64
+    assert np.all(t['i'] == np.arange(2, 7) / 2)
+
+
+def test_column_inplace_not_owned():
+    df = pd.DataFrame({'a': np.arange(5), 'b': np.ones(5)})
+    t = Table.from_pandas(df)
+    t.a += 1
+    assert np.all(df.a.values == np.arange(5))
+    assert np.all(t.a.values == np.arange(1, 6))
+
+    values = np.arange(5.0)
+    t = Table({'a': values, 'b': [1.0, 1.0, 1.0, 1.0, 1.0]})
+    t.a *= 2
+    assert np.all(values == np.arange(5.0))
+
+    # Owned after the first operator, until a projection shares it
+    a = t['a']
+    t.a += 1
+    assert t['a'] is a
+    p = t.get(['a'])
+    t.a += t.b
+    assert t['a'] is not a
+    assert np.all(p.a.values == np.arange(5) * 2.0 + 1)
+    assert np.all(t.a.values == np.arange(5) * 2.0 + 2)
+
+    # A column assigned twice is shared by both keys
+    t.c = t.a
+    t.a += 1
+    assert np.all(t.c.values == np.arange(5) * 2.0 + 2)
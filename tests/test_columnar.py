@@ -0,0 +1,64 @@
+from gtable import Table
+from gtable.columnar import read_footer
+import numpy as np
+
+
+def sample_table():
+    t = Table({'a': np.arange(1000), 'b': np.arange(1000.0)})
+    t.add_column('c', np.arange(500), index=np.arange(1000) % 2)
+    t.add_column('d', np.arange(100), align='bottom')
+    t.add_column('e', np.arange('2017-01-01', '2017-01-11',
+                                dtype='datetime64[D]'))
+    return t
+
+
+def test_write_read(tmpdir):
+    t = sample_table()
+    t.schema.metadata['c'] = {'unit': 'EUR'}
+
+    for compression in ['zlib', 'lzma', None]:
+        path = str(tmpdir.join(str(compression)))
+        t.write(path, row_group_size=128, compression=compression)
+        read = Table.read(path)
+
+        assert read.keys == t.keys
+        assert read.schema.metadata == {'c': {'unit': 'EUR'}}
+        for k in t.keys:
+            assert np.all(read[k] == t[k])
+            assert read[k].dtype == t[k].dtype
+            assert np.all(read.get(k).index == t.get(k).index)
+
+
+def test_read_where(tmpdir):
+    t = sample_table()
+    path = str(tmpdir.join('table'))
+    t.write(path, row_group_size=128)
+
+    read = Table.read(path, columns=['b', 'c'], where=('a', '>=', 900))
+    assert read.keys == ['b', 'c']
+    assert np.all(read.b.values == np.arange(900, 1000))
+    assert np.all(read.c.values == np.arange(450, 500))
+    assert np.all(read.c.index == np.arange(100) % 2)
+
+    read = Table.read(path, columns=['a'],
+                      where=[('d', '<', 10), ('c', '>', 0)])
+    assert np.all(read.a.values == np.arange(901, 910, 2))
+
+    read = Table.read(path, where=('a', '==', 5000))
+    assert len(read) == 0
+    assert read.keys == t.keys
+
+
+def test_row_group_statistics(tmpdir):
+    t = sample_table()
+    path = str(tmpdir.join('table'))
+    t.write(path, row_group_size=128)
+
+    with open(path, 'rb') as f:
+        footer = read_footer(f)
+
+    assert len(footer['row_groups']) == 8
+    chunk = footer['row_groups'][7]['chunks'][3]
+    assert chunk['null_count'] == 4
+    assert chunk['min'] == 0 and chunk['max'] == 99
+    assert footer['row_groups'][0]['chunks'][3]['count'] == 0
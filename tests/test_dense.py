@@ -0,0 +1,48 @@
+from gtable import Table
+import numpy as np
+
+
+def test_dense_creation():
+    t = Table({'a': np.arange(10), 'b': np.arange(10)})
+
+    assert t.a.bitmap.dense
+    assert t.a.bitmap.nbytes == 16
+    assert np.all(t.index == np.ones((2, 10), dtype=np.uint8))
+
+
+def test_dense_add():
+    t = Table({'a': np.arange(10), 'b': np.arange(10.0)})
+    c = t.a + t.b
+
+    assert c.bitmap.dense
+    assert c.values.dtype == np.float64
+    assert np.all(c.values == 2 * np.arange(10))
+
+
+def test_dense_filter():
+    t = Table({'a': np.arange(10), 'b': np.arange(10)})
+    t.add_column('c', np.arange(5), align='bottom')
+    f = t.filter(t.a > 3)
+
+    assert f.a.bitmap.dense
+    assert np.all(f.b.values == np.arange(4, 10))
+    assert np.all(f.c.index == np.array([0, 1, 1, 1, 1, 1]))
+
+
+def test_dense_reindex():
+    t = Table({'a': np.arange(10)})
+    c = t.a.reindex(np.array([-1, 3, 5, -1]))
+
+    assert np.all(c.values == np.array([3, 5]))
+    assert np.all(c.index == np.array([0, 1, 1, 0]))
+
+
+def test_reorder():
+    t = Table({'a': np.arange(6)})
+    t.add_column('b', np.arange(3), index=np.array([0, 0, 0, 1, 1, 1]))
+
+    t.a.reorder(np.arange(6)[::-1])
+    t.b.reorder(np.arange(6)[::-1])
+    assert np.all(t.a.values == np.arange(6)[::-1])
+    assert np.all(t.b.index == np.array([1, 1, 1, 0, 0, 0]))
+    assert np.all(t.b.values == np.array([2, 1, 0]))
@@ -0,0 +1,44 @@
+from gtable import Table
+from gtable.expression import Expression, _kernels
+import numpy as np
+
+
+def test_lazy_dense():
+    t = Table({'a': np.arange(1.0, 6.0), 'b': np.arange(5.0),
+               'c': np.arange(5), 'd': np.ones(5)})
+    expression = (t.a.lazy() * t.b + t.c) / t.d > 5
+
+    assert type(expression) == Expression
+    c = expression.evaluate()
+    assert np.all(c.values == ((t.a * t.b + t.c) / t.d > 5).values)
+    assert c.values.dtype == np.bool_
+
+
+def test_lazy_sparse():
+    t = Table({'a': np.arange(10.0)})
+    t.add_column('b', np.arange(5), index=np.arange(10) % 2)
+    t.add_column('c', np.arange(7.0), index=np.arange(10) < 7)
+
+    c = (2 - t.b * t.a.lazy() + t.c / 2).evaluate()
+    assert np.all(c.index == np.array([0, 1, 0, 1, 0, 1, 0, 0, 0, 0]))
+    assert np.all(c.values == 2 - np.array([0, 1, 2]) * np.array([1, 3, 5]) +
+                  np.array([1, 3, 5]) / 2)
+
+
+def test_lazy_cache():
+    t = Table({'a': np.arange(10.0), 'b': np.arange(10)})
+    (t.a.lazy() + t.b * 3).evaluate()
+    kernels = len(_kernels)
+    c = (t.b.lazy() + t.a * 5).evaluate()
+
+    assert len(_kernels) == kernels
+    assert np.all(c.values == np.arange(10) * 6)
+
+
+def test_lazy_assignment():
+    t = Table({'a': np.arange(10.0), 'b': np.arange(10)})
+    t.c = t.a.lazy() * t.b
+    f = t.filter(t.c.lazy() > 10)
+
+    assert np.all(t.c.values == np.arange(10) ** 2)
+    assert np.all(f.b.values == np.arange(4, 10))
@@ -1,6 +1,7 @@
 from gtable import Table
 import numpy as np
 import pandas as pd
+import pytest
 
 
 def test_filter_1():
@@ -113,3 +114,43 @@ def test_sieve():
     assert t1.a.values[0] == 5
     assert t1.b.values[0] == np.datetime64('2000-01-06')
     assert t1.c.values[0] == 'f'
+
+
+def test_filter_where():
+    t = Table({'a': np.arange(10.0), 'b': np.arange(10)})
+    t.add_column('c', np.arange(5.0), index=np.arange(10) % 2)
+
+    f = t.filter_where('a', '>', 2.5)
+    assert np.all(f.b.values == np.arange(3, 10))
+    assert np.all(f.c.values == np.array([1, 2, 3, 4]))
+    assert np.all(f.c.index == np.array([1, 0, 1, 0, 1, 0, 1]))
+
+    f = t.filter_where(('a', '>', 2.5), ('c', '<', 4))
+    assert len(f) == 3
+    assert np.all(f.b.values == np.array([3, 5, 7]))
+    assert np.all(f.c.index == 1)
+
+    f = t.filter_where([('b', '>=', 2), ('b', '!=', 7)])
+    assert np.all(f.b.values == np.array([2, 3, 4, 5, 6, 8, 9]))
+
+
+def test_filter_where_sparse():
+    t = Table()
+    t.add_column('a', np.random.rand(1000))
+    t.add_column('b', np.arange(600), index=np.arange(1000) % 5 < 3)
+    t.add_column('c', np.arange(1000.0))
+    t.add_column('d', np.arange(300), index=np.arange(1000) >= 700)
+
+    f = t.filter_where(('a', '<', 0.7), ('c', '>=', 100))
+    g = t.filter((t.a < 0.7) & (t.c >= 100))
+    for key in t.keys:
+        assert np.all(f[key] == g[key])
+        assert np.all(f.get(key).index == g.get(key).index)
+
+
+def test_filter_where_missing():
+    t = Table({'a': np.arange(10)})
+    with pytest.raises(ValueError):
+        t.filter_where('b', '>', 2)
+    with pytest.raises(ValueError):
+        t.filter_where('a', '~', 2)
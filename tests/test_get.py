@@ -24,3 +24,50 @@ def test_get_table():
 
     assert np.all(t1.a.values == np.array([1, 2, 3, 4, 5]))
     assert np.all(t1.a.index == np.array([1, 1, 1, 1, 1]))
+
+
+def test_get_shares_columns():
+    t = gt.Table({'a': np.arange(5), 'b': np.arange(5.0), 'c': np.arange(5)})
+    t1 = t.get(['a', 'b'])
+
+    assert np.shares_memory(t1['a'], t['a'])
+    assert t1.get('b').bitmap is t.get('b').bitmap
+    assert np.all(t.get(['a'], copy=True)['a'] == t['a'])
+    assert not np.shares_memory(t.get(['a'], copy=True)['a'], t['a'])
+
+
+def test_get_copy_on_write():
+    t = gt.Table({'a': np.arange(5), 'b': np.array([0, np.nan, 2, 3, 4])})
+    t.add_column('c', np.arange(3), index=np.array([1, 0, 1, 0, 1]))
+    t1 = t.get(['a', 'b', 'c'])
+
+    t1['a'] = np.zeros(5, dtype=np.int64)
+    t1.fillna_column('c')
+    t1.sort_by('b')
+    t1.dropnan()
+    t1.stack(gt.Table({'a': np.arange(2)}))
+    t.stack(gt.Table({'a': np.arange(10, 12)}))
+    t1.stack(gt.Table({'a': np.arange(20, 22)}))
+
+    assert np.all(t['a'] == np.array([0, 1, 2, 3, 4, 10, 11]))
+    assert np.all(t.c.values == np.arange(3))
+    assert np.all(t.c.index == np.array([1, 0, 1, 0, 1, 0, 0]))
+    assert np.isnan(t['b'][1])
+    assert np.all(t1['a'] == np.array([0, 0, 0, 0, 0, 0, 1, 20, 21]))
+
+
+def test_get_reorder():
+    t = gt.Table({'a': np.arange(4), 'b': np.arange(4.0)})
+    t.add_column('c', np.arange(2), index=np.array([1, 1, 0, 0]))
+    t.a += 0
+    p = t.get(['a', 'c'])
+
+    t.a.reorder(np.array([3, 2, 1, 0]))
+    t.c.reorder(np.array([3, 2, 1, 0]))
+    assert np.all(t.a.values == np.array([3, 2, 1, 0]))
+    assert np.all(t.c.index == np.array([0, 0, 1, 1]))
+    assert np.all(t.c.values == np.array([1, 0]))
+
+    assert np.all(p.a.values == np.arange(4))
+    assert np.all(p.c.index == np.array([1, 1, 0, 0]))
+    assert np.all(p.c.values == np.arange(2))
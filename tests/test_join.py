@@ -1,5 +1,6 @@
 from gtable import Table
-from gtable.joins import inner_join, full_outer_join
+from gtable.joins import inner_join, full_outer_join, left_join, right_join, \
+    semi_join, anti_join
 import numpy as np
 import pandas as pd
 
@@ -50,9 +51,10 @@ def test_inner_join_3():
 
     t3 = inner_join(t1, t2, 'a')
 
+    # Each pair of rows with the same value gives a row
     assert np.all(t3.a.values == np.array([2, 2, 3, 3, 4]))
-    assert np.all(t3.b.values == np.array([2, 3, 4]))
-    assert np.all(t3.c.values == np.array([5, 6, 6, 7, 8]))
+    assert np.all(t3.b.values == np.array([2, 3, 4, 4]))
+    assert np.all(t3.c.values == np.array([5, 5, 6, 7, 8]))
 
 
 def test_outer_join_1():
@@ -134,3 +136,180 @@ def test_outer_join_4():
 
     assert np.all(t3.a.values == np.array([1, 2, 3, 5, 6, 8, 9, 12, 13, 19]))
     assert np.all(t3.b.values == np.array([1, 1, 2, 1, 2, 1, 1, 2, 1, 1]))
+
+
+def test_join_order():
+    t1 = Table({'a': [1, 2, 3, 4], 'b': [1, 2, 3, 4]})
+    t2 = Table({'a': [2, 4, 5], 'c': [1, 2, 3]})
+
+    t3 = inner_join(t1, t2, 'a')
+    assert t3.keys.metadata['a']['sorted'] == {'order': 'asc', 'strict': True}
+    t4 = full_outer_join(t1, t2, 'a')
+    assert t4.keys.metadata['a']['sorted'] == {'order': 'asc', 'strict': True}
+
+    # Unsorted keys are joined with a hash table, without an order
+    t5 = Table({'a': [2, 1], 'c': [1, 2]})
+    assert 'sorted' not in inner_join(t1, t5, 'a').keys.metadata.get('a', {})
+
+
+def test_join_order_written(monkeypatch):
+    t1 = Table({'a': [1, 2, 3, 4], 'b': [1, 2, 3, 4]})
+    t2 = Table({'a': [-4, -3, -2, -1], 'c': [1, 2, 3, 4]})
+    assert len(inner_join(t1, t2, 'a')) == 0
+
+    # A stored order is used without checking the values again
+    def monotonic_order(values):
+        raise AssertionError('The order is known')
+
+    monkeypatch.setattr('gtable.lib.monotonic_order', monotonic_order)
+    joined = inner_join(t1, t2, 'a')
+    assert joined.keys.metadata['a']['sorted']['order'] == 'asc'
+    monkeypatch.undo()
+
+    # Written in place, the order is forgotten and the keys are hashed
+    col = t1.a
+    col *= -1
+    assert 'sorted' not in t1.keys.metadata['a']
+    joined = inner_join(t1, t2, 'a')
+    assert t1.keys.metadata['a']['sorted']['order'] == 'desc'
+    assert 'sorted' not in joined.keys.metadata.get('a', {})
+    assert np.all(np.sort(joined.a.values) == np.array([-4, -3, -2, -1]))
+
+
+def test_hash_inner_join():
+    t1 = Table({'a': [3, 1, 2, 5], 'b': [30, 10, 20, 50]})
+    t2 = Table({'a': [2, 3, 7], 'c': [200, 300, 700]})
+
+    # The rows follow the order of the larger table
+    t3 = inner_join(t1, t2, 'a')
+    assert np.all(t3.a.values == np.array([3, 2]))
+    assert np.all(t3.b.values == np.array([30, 20]))
+    assert np.all(t3.c.values == np.array([300, 200]))
+
+
+def test_hash_outer_join():
+    t1 = Table({'a': [3, 1, 2, 5], 'b': [30, 10, 20, 50]})
+    t2 = Table({'a': [2., 3., 7.], 'b': [2, 3, 7], 'c': [200, 300, 700]})
+    t2.add_column('d', [1, 2])
+
+    t3 = full_outer_join(t1, t2, 'a')
+    assert np.all(t3.a.values == np.array([3, 1, 2, 5, 7]))
+    assert np.all(t3.b.values == np.array([30, 10, 20, 50, 7]))
+    assert np.all(t3.c.index == np.array([1, 0, 1, 0, 1]))
+    assert np.all(t3.c.values == np.array([300, 200, 700]))
+    assert np.all(t3.d.values == np.array([2, 1]))
+
+
+def test_hash_join_sorted():
+    rs = np.random.RandomState(0)
+    left = Table({'a': np.arange(0, 2000, 2), 'b': np.arange(1000)})
+    right = Table({'a': np.arange(0, 3000, 3), 'c': np.arange(1000)})
+    expected = inner_join(left, right, 'a')
+
+    order = rs.permutation(1000)
+    shuffled = Table({'a': left.a.values[order], 'b': left.b.values[order]})
+    joined = inner_join(shuffled, right, 'a')
+    joined.sort_by('a')
+    for key in ['a', 'b', 'c']:
+        assert np.all(joined[key] == expected[key])
+
+
+def test_left_right_join():
+    t1 = Table({'a': [1, 2, 3, 4], 'b': [10, 20, 30, 40]})
+    t2 = Table({'a': [2, 4, 4, 5], 'c': [200, 400, 401, 500]})
+
+    t3 = left_join(t1, t2, 'a')
+    assert np.all(t3.a.values == np.array([1, 2, 3, 4, 4]))
+    assert np.all(t3.b.values == np.array([10, 20, 30, 40, 40]))
+    assert np.all(t3.c.index == np.array([0, 1, 0, 1, 1]))
+    assert np.all(t3.c.values == np.array([200, 400, 401]))
+
+    t4 = right_join(t1, t2, 'a')
+    assert np.all(t4.a.values == np.array([2, 4, 4, 5]))
+    assert np.all(t4.b.values == np.array([20, 40, 40]))
+    assert np.all(t4.c.values == np.array([200, 400, 401, 500]))
+
+    # Unsorted keys keep the order of the table whose rows are kept
+    u1 = Table({'a': [4, 1, 3, 2], 'b': [40, 10, 30, 20]})
+    u2 = Table({'a': [5, 4, 2, 4], 'c': [500, 400, 200, 401]})
+    t5 = left_join(u1, u2, 'a')
+    assert np.all(t5.a.values == np.array([4, 4, 1, 3, 2]))
+    assert np.all(t5.c.values == np.array([400, 401, 200]))
+    t6 = right_join(u1, u2, 'a')
+    assert np.all(t6.a.values == np.array([5, 4, 2, 4]))
+    assert np.all(t6.b.index == np.array([0, 1, 1, 1]))
+
+
+def test_semi_anti_join():
+    t1 = Table({'b': [10, 20, 30, 40, 50]})
+    t1.add_column('a', [3, 1, 4, 2], align='bottom')
+    whitelist = Table({'a': [4, 1, 7], 'c': [1, 2, 3]})
+
+    t2 = semi_join(t1, whitelist, 'a')
+    assert t2.keys == ['b', 'a']
+    assert np.all(t2.a.values == np.array([1, 4]))
+    assert np.all(t2.b.values == np.array([30, 40]))
+
+    t3 = anti_join(t1, whitelist, 'a')
+    assert np.all(t3.a.values == np.array([3, 2]))
+    assert np.all(t3.b.values == np.array([20, 50]))
+
+
+def test_many_to_many_join():
+    orders = Table({'oid': [1, 1, 2, 3], 'qty': [10, 20, 30, 40]})
+    fills = Table({'oid': [1, 1, 1, 3, 4], 'px': [1., 2., 3., 4., 5.]})
+
+    t1 = inner_join(orders, fills, 'oid')
+    assert np.all(t1.oid.values == np.array([1, 1, 1, 1, 1, 1, 3]))
+    assert np.all(t1.qty.values == np.array([10, 10, 10, 20, 20, 20, 40]))
+    assert np.all(t1.px.values == np.array([1., 2., 3., 1., 2., 3., 4.]))
+    assert not t1.keys.metadata['oid']['sorted']['strict']
+
+    t2 = full_outer_join(orders, fills, 'oid')
+    assert np.all(t2.oid.values == np.array([1, 1, 1, 1, 1, 1, 2, 3, 4]))
+    assert np.all(t2.qty.index == np.array([1, 1, 1, 1, 1, 1, 1, 1, 0]))
+    assert np.all(t2.px.index == np.array([1, 1, 1, 1, 1, 1, 0, 1, 1]))
+
+    # The hash join gives the same pairs
+    shuffled = Table({'oid': [3, 1, 2, 1], 'qty': [40, 20, 30, 10]})
+    t3 = inner_join(shuffled, fills, 'oid')
+    t3.sort_by('qty')
+    assert np.all(t3.qty.values == np.array([10, 10, 10, 20, 20, 20, 40]))
+    assert np.all(np.sort(t3.px.values[:3]) == np.array([1., 2., 3.]))
+
+
+def test_composite_join():
+    dates = np.array(['2020-01-01', '2020-01-02', '2020-01-03'],
+                     dtype='datetime64[ns]')
+    trades = Table({'inst': np.array([1, 1, 2, 2, 3]),
+                    'ts': dates[[0, 2, 0, 1, 1]],
+                    'qty': np.array([10, 20, 30, 40, 50])})
+    quotes = Table({'inst': np.array([1, 2, 2, 3]),
+                    'ts': dates[[2, 0, 1, 2]],
+                    'px': np.array([1.5, 2.0, 2.5, 3.5])})
+
+    t1 = inner_join(trades, quotes, ['inst', 'ts'])
+    assert t1.keys[:2] == ['inst', 'ts']
+    assert np.all(t1.inst.values == np.array([1, 2, 2]))
+    assert np.all(t1.ts.values == dates[[2, 0, 1]])
+    assert np.all(t1.qty.values == np.array([20, 30, 40]))
+    assert np.all(t1.px.values == np.array([1.5, 2.0, 2.5]))
+
+    t2 = full_outer_join(trades, quotes, ['inst', 'ts'])
+    assert np.all(t2.inst.values == np.array([1, 1, 2, 2, 3, 3]))
+    assert np.all(t2.px.index == np.array([0, 1, 1, 1, 0, 1]))
+
+    # Keys not sorted in lexicographic order use the hash join
+    quotes.add_column('venue', np.array(['b', 'a', 'b', 'a']))
+    venues = Table({'venue': np.array(['a', 'a', 'b']),
+                    'inst': np.array([3, 2, 1]),
+                    'fee': np.array([0.3, 0.2, 0.1])})
+    t3 = left_join(quotes, venues, ['venue', 'inst'])
+    assert np.all(t3.inst.values == np.array([1, 2, 2, 3]))
+    assert np.all(t3.fee.index == np.array([1, 1, 0, 1]))
+    assert np.all(t3.fee.values == np.array([0.1, 0.2, 0.3]))
+
+    assert np.all(semi_join(trades, quotes, ['inst', 'ts']).qty.values ==
+                  np.array([20, 30, 40]))
+    assert np.all(anti_join(trades, quotes, ('inst', 'ts')).qty.values ==
+                  np.array([10, 50]))
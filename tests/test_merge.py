@@ -111,3 +111,12 @@ def test_required_columns():
 
     assert table_a.keys == ['a', 'b', 'c']
 
+
+
+def test_merge_composite():
+    table_a = Table({'a': [1, 1, 2], 'b': [1, 3, 1], 'c': [0, 1, 2]})
+    table_b = Table({'a': [1, 2], 'b': [2, 0], 'd': [3, 4]})
+
+    table_a.merge(table_b, ['a', 'b'])
+    assert np.all(table_a.a.values == np.array([1, 1, 1, 2, 2]))
+    assert np.all(table_a.b.values == np.array([1, 2, 3, 0, 1]))
@@ -0,0 +1,87 @@
+from gtable import Table
+import numpy as np
+import pandas as pd
+
+
+def sparse_table():
+    t = Table({'a': np.arange(6.0), 'b': np.array(['x', 'y', 'z', 'x', 'y', 'z'])})
+    t.add_column('c', np.arange(3), index=np.array([1, 0, 1, 0, 1, 0]))
+    t.add_column('d', np.array(['u', 'v']), align='bottom')
+    return t
+
+
+def test_to_pandas():
+    df = sparse_table().to_pandas()
+
+    assert list(df.columns) == ['a', 'b', 'c', 'd']
+    assert np.all(df.a.values == np.arange(6.0))
+    assert np.all(df.c.isnull().values == np.array([0, 1, 0, 1, 0, 1], dtype=np.bool_))
+    assert np.all(df.c.values[::2] == np.arange(3))
+    assert list(df.d.values[4:]) == ['u', 'v']
+    assert df.d.isnull().sum() == 4
+
+
+def test_to_pandas_nullable():
+    df = sparse_table().to_pandas(nullable=True)
+
+    assert df.c.dtype == pd.Int64Dtype()
+    assert df.c.isna().sum() == 3
+    assert df.d.dtype == pd.StringDtype()
+    assert df.a.dtype == pd.Float64Dtype()
+
+
+def test_to_pandas_filtered():
+    t = sparse_table()
+    t.add_column('e', np.arange(6))
+    filtered = t.filter(t.c >= 1)
+
+    assert filtered.bitmaps[0].dense
+    df = filtered.to_pandas()
+    assert df.c.dtype == np.int64
+    assert df.e.dtype == np.int64
+    assert list(df.e.values) == [2, 4]
+
+    full = t.e + t.e
+    assert full.bitmap.dense
+
+
+def test_to_dict_fill():
+    d = sparse_table().to_dict(fill=True)
+
+    assert np.all(d['a'] == np.arange(6.0))
+    assert np.all(np.isnan(d['c'][1::2]))
+    assert np.all(d['c'][::2] == np.arange(3))
+
+
+def test_from_pandas_nulls():
+    df = pd.DataFrame({
+        'a': np.arange(4),
+        'b': [1.0, np.nan, 3.0, np.nan],
+        'c': pd.array([1, None, 3, 4], dtype='Int64'),
+        'd': pd.Categorical(['x', 'y', None, 'x']),
+        'e': ['u', None, 'v', 'w'],
+        'f': pd.to_datetime(['2017-01-01', None, '2017-01-03', None]),
+    })
+    t = Table.from_pandas(df, index=False)
+
+    assert t.keys == ['a', 'b', 'c', 'd', 'e', 'f']
+    assert np.shares_memory(t['a'], df['a'].values)
+    assert np.all(t.b.index == np.array([1, 0, 1, 0]))
+    assert np.all(t.b.values == np.array([1.0, 3.0]))
+    assert t['c'].dtype == np.int64
+    assert np.all(t.c.values == np.array([1, 3, 4]))
+    assert np.all(t.d.index == np.array([1, 1, 0, 1]))
+    assert np.all(t.d.values == np.array(['x', 'y', 'x']))
+    assert t['e'].dtype.kind == 'U'
+    assert np.all(t.e.index == np.array([1, 0, 1, 1]))
+    assert t['f'].dtype == np.dtype('datetime64[ns]')
+    assert np.all(t.f.index == np.array([1, 0, 1, 0]))
+
+
+def test_pandas_roundtrip():
+    df = sparse_table().to_pandas()
+    t = Table.from_pandas(df, index=False)
+
+    assert np.all(t.c.index == np.array([1, 0, 1, 0, 1, 0]))
+    assert np.all(t.c.values == np.arange(3))
+    assert np.all(t.d.values == np.array(['u', 'v']))
@@ -0,0 +1,74 @@
+import gtable.fast
+from gtable import Table
+from gtable.bitmap import Bitmap
+from gtable.fast import apply_fast_add, apply_fast_truediv, apply_fast_gt, \
+    apply_fast_xor, apply_parallel_add, apply_parallel_truediv, \
+    apply_parallel_gt, apply_parallel_xor, apply_mask_column, \
+    apply_mask_column_parallel, gen_column_filter, \
+    gen_column_filter_parallel, reindex, reindex_parallel
+import numpy as np
+
+
+def _bitmaps(rng, n):
+    return (Bitmap.from_index(rng.random(n) < 0.7),
+            Bitmap.from_index(rng.random(n) < 0.8))
+
+
+def test_parallel_binary():
+    rng = np.random.default_rng(0)
+    left, right = _bitmaps(rng, 200000)
+    values_left = rng.random(left.count()).astype(np.float32)
+    values_right = rng.random(right.count())
+
+    for serial, parallel in [(apply_fast_add, apply_parallel_add),
+                             (apply_fast_truediv, apply_parallel_truediv),
+                             (apply_fast_gt, apply_parallel_gt),
+                             (apply_fast_xor, apply_parallel_xor)]:
+        result, index = serial(values_left, values_right, left.words,
+                               right.words)
+        presult, pindex = parallel(values_left, values_right, left.words,
+                                   right.words)
+        assert presult.dtype == result.dtype
+        assert np.array_equal(presult, result)
+        assert np.array_equal(pindex, index)
+
+
+def test_parallel_mask_filter_reindex():
+    rng = np.random.default_rng(1)
+    left, right = _bitmaps(rng, 200000)
+    values = rng.random(left.count())
+    mask = rng.random(left.count()) < 0.5
+
+    for a, b in zip(apply_mask_column(values, left.words, mask),
+                    apply_mask_column_parallel(values, left.words, mask)):
+        assert np.array_equal(a, b)
+
+    for a, b in zip(gen_column_filter(mask, left.words, right.words),
+                    gen_column_filter_parallel(mask, left.words,
+                                               right.words)):
+        assert np.array_equal(a, b)
+
+    global_index = rng.integers(-1, 200000, 150000)
+    for a, b in zip(
+            reindex(left.words, left.rank_directory(), global_index),
+            reindex_parallel(left.words, left.rank_directory(),
+                             global_index)):
+        assert np.array_equal(a, b)
+
+
+def test_parallel_dispatch(monkeypatch):
+    monkeypatch.setattr(gtable.fast, 'PARALLEL_ROWS', 0)
+    monkeypatch.setattr(gtable.fast, 'get_num_threads', lambda: 2)
+
+    t = Table({'a': np.arange(10.0)})
+    t.add_column('b', np.arange(5.0), index=np.arange(10) % 2)
+    t.add_column('c', np.arange(7), index=np.arange(10) < 7)
+
+    c = t.a + t.b
+    assert np.all(c.values == np.array([1, 4, 7, 10, 13]))
+    assert np.all(c.index == np.arange(10) % 2)
+    assert np.all((t.b > t.c).values == np.array([False, False, False]))
+
+    f = t.filter(t.a > 4)
+    assert np.all(f.b.values == np.array([2, 3, 4]))
+    assert np.all(f.c.values == np.array([5, 6]))
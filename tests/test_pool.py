@@ -0,0 +1,52 @@
+import gtable as gt
+import gtable.pool
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    workers = gt.get_workers()
+    monkeypatch.setattr(gtable.pool, 'POOL_ROWS', 0)
+    gt.set_workers(4)
+    yield
+    gt.set_workers(workers)
+
+
+def _table():
+    t = gt.Table({'a': np.arange(10.0)[::-1], 'b': np.arange(10)})
+    t.add_column('c', np.arange(5.0), index=np.arange(10) % 2)
+    t.add_column('d', np.arange(7), index=np.arange(10) < 7)
+    return t
+
+
+def test_pool_filter_sort(pool):
+    t = _table()
+    f = t.filter(t.a > 4.5)
+    assert np.all(f.b.values == np.arange(5))
+    assert np.all(f.c.values == np.array([0, 1]))
+    assert np.all(f.d.index == 1)
+
+    f = t.filter_where('b', '>=', 5)
+    assert np.all(f.c.values == np.array([2, 3, 4]))
+    assert np.all(f.d.values == np.array([5, 6]))
+
+    t.sort_by('a')
+    assert np.all(t.b.values == np.arange(10)[::-1])
+    assert np.all(t.c.values == np.arange(5)[::-1])
+    assert np.all(t.d.index == (np.arange(10) >= 3))
+
+
+def test_pool_join(pool):
+    left = gt.Table({'k': np.arange(10), 'x': np.arange(10.0)})
+    right = gt.Table({'k': np.arange(0, 20, 2), 'y': np.arange(10)})
+    joined = gt.inner_join(left, right, 'k')
+
+    assert np.all(joined.k.values == np.arange(0, 10, 2))
+    assert np.all(joined.x.values == np.arange(0, 10, 2))
+    assert np.all(joined.y.values == np.arange(5))
+
+
+def test_pool_workers():
+    with pytest.raises(ValueError):
+        gt.set_workers(0)
@@ -0,0 +1,99 @@
+from gtable import read_csv
+import gtable.readers
+import numpy as np
+import pytest
+import io
+
+CSV = """a,b,c,d
+1,1.5,x,2017-01-01
+2,,y,
+3,2.5,"z,
+w",2017-01-03
+4,,,
+"""
+
+
+def test_read_csv():
+    t = read_csv(io.StringIO(CSV))
+
+    assert t.keys == ['a', 'b', 'c', 'd']
+    assert len(t) == 4
+    assert t['a'].dtype == np.int64
+    assert np.all(t.a.values == np.array([1, 2, 3, 4]))
+    assert np.all(t.b.values == np.array([1.5, 2.5]))
+    assert np.all(t.b.index == np.array([1, 0, 1, 0]))
+    assert np.all(t.c.values == np.array(['x', 'y', 'z,\nw']))
+    assert t['d'].dtype == np.dtype('datetime64[ns]')
+    assert np.all(t.d.index == np.array([1, 0, 1, 0]))
+
+
+def test_read_csv_chunks():
+    chunks = list(read_csv(io.StringIO(CSV), chunksize=2,
+                           dtypes={'a': np.float64}))
+
+    assert len(chunks) == 2
+    assert chunks[1]['a'].dtype == np.float64
+    assert np.all(chunks[1].b.index == np.array([1, 0]))
+    assert np.all(chunks[1].c.values == np.array(['z,\nw']))
+
+
+def test_read_csv_processes(tmpdir):
+    path = str(tmpdir.join('data.csv'))
+    with open(path, 'w') as f:
+        f.write('a,b\n')
+        for i in range(1000):
+            f.write('{},{}\n'.format(i, i if i % 3 else ''))
+
+    t = read_csv(path, chunksize=None, processes=2)
+    serial = read_csv(path)
+
+    for table in [t, serial]:
+        assert np.all(table.a.values == np.arange(1000))
+        assert np.all(table.b.index == (np.arange(1000) % 3 != 0))
+        assert np.all(table.b.values == np.arange(1000)[np.arange(1000) % 3 != 0])
+
+
+def test_read_csv_widen():
+    csv = 'a,b,c\n1,x,2017-01-01\n2,y,2017-01-02\n3,z,\n1.5,w,soon\n5,v,later\n'
+
+    chunks = list(read_csv(io.StringIO(csv), chunksize=3))
+    assert chunks[0]['a'].dtype == np.int64
+    assert chunks[1]['a'].dtype == np.float64
+    assert chunks[1]['c'].dtype.kind == 'U'
+    assert list(chunks[1]['c']) == ['soon', 'later']
+
+    # Explicit dtypes are not widened
+    with pytest.raises(ValueError):
+        list(read_csv(io.StringIO(csv), chunksize=3, dtypes={'a': np.int64}))
+
+
+@pytest.mark.parametrize('processes', [None, 2])
+def test_read_csv_widen_chunks(tmpdir, monkeypatch, processes):
+    monkeypatch.setattr(gtable.readers, 'CHUNK_SIZE', 2)
+    path = str(tmpdir.join('data.csv'))
+    with open(path, 'w') as f:
+        f.write('i,f,d,e\n'
+                '007,1,2017-01-01,\n'
+                '2,2,2017-01-02,\n'
+                'x,1.5,soon,2017-01-03\n'
+                '4,4,,2017-01-04\n')
+
+    t = read_csv(path, processes=processes)
+
+    # Integers and text, the integers keep their text
+    assert list(t.i.values) == ['007', '2', 'x', '4']
+    # Integers and floats
+    assert t.f.values.dtype == np.float64
+    assert np.all(t.f.values == np.array([1, 2, 1.5, 4]))
+    # Dates and text
+    assert list(t.d.values) == ['2017-01-01', '2017-01-02', 'soon']
+    assert np.all(t.d.index == np.array([1, 1, 1, 0]))
+    # A first chunk without values does not fix the dtype
+    assert t.e.values.dtype == np.dtype('datetime64[ns]')
+    assert np.all(t.e.index == np.array([0, 0, 1, 1]))
+
+    # A file object that can not be read again casts the values
+    with open(path) as f:
+        f.seekable = lambda: False
+        t = read_csv(f, processes=processes)
+    assert list(t.i.values) == ['7', '2', 'x', '4']
@@ -40,6 +40,46 @@ def test_last_record():
     t1 = Table({'a': [1, 2, 3], 'd': np.array([4, 5, 6])})
     t.stack(t1)
 
-    assert t.last_record() == {'a': 1, 'd': 4}
-    assert t.last_record(fill=True) == {'a': 1, 'd': 4, 'b': np.nan}
+    assert t.last_record() == {'a': 3, 'd': 6}
+    assert t.last_record(fill=True) == {'a': 3, 'd': 6, 'b': np.nan}
 
+
+def test_row():
+    t = Table({'a': [1, 2, 3], 'b': np.array([4, 5, 6])})
+    t1 = Table({'a': [1, 2, 3], 'd': np.array([4, 5, 6])})
+    t.stack(t1)
+
+    assert t.row(1) == {'a': 2, 'b': 5}
+    assert t.row(4) == {'a': 2, 'd': 5}
+    assert t.row(-2, fill=True) == {'a': 2, 'b': np.nan, 'd': 5}
+
+
+def test_iter_batches():
+    t = Table({'a': [1, 2, 3], 'b': np.array([4, 5, 6])})
+    t1 = Table({'a': [1, 2, 3], 'd': np.array([4, 5, 6])})
+    t.stack(t1)
+
+    batches = list(t.iter_batches(4))
+    assert [len(b) for b in batches] == [4, 2]
+    assert np.all(batches[1].a.values == np.array([2, 3]))
+    assert np.all(batches[0].d.index == np.array([0, 0, 0, 1]))
+    assert np.all(batches[0].d.values == np.array([4]))
+
+    batches = list(t.iter_batches(4, form='dict'))
+    assert np.all(batches[1]['d'] == np.array([5, 6]))
+    assert np.all(np.isnan(batches[1]['b']))
+
+    batches = list(t.iter_batches(4, form='numpy'))
+    assert batches[0].dtype.names == ('a', 'b', 'd')
+    assert np.all(batches[0]['b'][:3] == np.array([4, 5, 6]))
+
+
+def test_itertuples():
+    t = Table({'a': [1, 2, 3], 'b': np.array([4, 5, 6])})
+    t1 = Table({'a': [1, 2, 3], 'd': np.array([4, 5, 6])})
+    t.stack(t1)
+    rows = list(t.itertuples(size=4))
+
+    assert len(rows) == 6
+    assert rows[0][:2] == (1, 4) and np.isnan(rows[0][2])
+    assert rows[5][0] == 3 and rows[5][2] == 6
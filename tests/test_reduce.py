@@ -94,3 +94,28 @@ def test_reduce_std():
     assert np.all(t1.b.index == np.array([1, 1, 0, 0]))
     assert np.all(t1.c.values == np.array([0.5, 0]))
     assert np.all(t1.c.index == np.array([0, 0, 1, 1]))
+
+
+def test_reduce_dtypes():
+    t = gt.Table()
+    t.add_column('a', [1, 1, 2, 2, 3, 3])
+    t.add_column('f', np.arange(6, dtype=np.float32))
+    t.add_column('i', np.arange(6, dtype=np.int32))
+    t.add_column('s', np.arange(3, dtype=np.float32),
+                 index=np.array([1, 0, 1, 0, 1, 0]))
+
+    t1 = gtable.reduce_by_key(t, 'a', 'sum')
+    assert t1.f.values.dtype == np.float32
+    assert t1.i.values.dtype == np.int64
+    assert t1.s.values.dtype == np.float32
+    assert np.all(t1.i.values == np.array([1, 5, 9]))
+
+    t1 = gtable.reduce_by_key(t, 'a', 'mean')
+    assert t1.f.values.dtype == np.float32
+    assert t1.i.values.dtype == np.float64
+    assert t1.s.values.dtype == np.float32
+    assert np.allclose(t1.s.values, np.array([0, 1, 2]))
+
+    t1 = gtable.reduce_by_key(t, 'a', 'std')
+    assert t1.f.values.dtype == np.float32
+    assert np.allclose(t1.i.values, 0.5)
@@ -0,0 +1,44 @@
+from gtable import Table
+import numpy as np
+
+
+def test_align_runs():
+    t = Table()
+    t.add_column('a', np.arange(10))
+    t.add_column('b', np.arange(4), align='bottom')
+
+    assert np.all(t.b.bitmap.runs == np.array([[6, 10]]))
+    assert np.all(t.b.index == np.array([0, 0, 0, 0, 0, 0, 1, 1, 1, 1]))
+
+
+def test_stack_runs():
+    t = Table({'a': np.arange(100), 'b': np.arange(100)})
+    for i in range(10):
+        if i % 2:
+            t.stack(Table({'a': np.arange(100)}))
+        else:
+            t.stack(Table({'a': np.arange(100), 'b': np.arange(100)}))
+
+    assert t.a.bitmap.dense
+    assert len(t.b.bitmap.runs) == 5
+    assert t.b.bitmap.count() == 600
+
+
+def test_runs_add():
+    t = Table()
+    t.add_column('a', np.arange(10))
+    t.add_column('b', np.arange(4), align='bottom')
+    c = t.a + t.b
+
+    assert np.all(c.values == np.array([6, 8, 10, 12]))
+    assert np.all(c.bitmap.runs == np.array([[6, 10]]))
+
+
+def test_runs_reorder():
+    t = Table({'a': np.arange(6)})
+    t.add_column('b', np.arange(3), align='bottom')
+    assert t.b.bitmap.runs is not None
+
+    t.b.reorder(np.arange(6)[::-1])
+    assert np.all(t.b.index == np.array([1, 1, 1, 0, 0, 0]))
+    assert np.all(t.b.values == np.array([2, 1, 0]))
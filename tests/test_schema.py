@@ -0,0 +1,49 @@
+from gtable import Table
+from gtable.schema import Schema
+import numpy as np
+import pickle
+
+
+def test_schema_lookup():
+    t = Table({'a': np.arange(3), 'b': np.arange(3), 'c': np.arange(3)})
+    t.schema.metadata['b'] = {'unit': 'EUR'}
+
+    assert isinstance(t.keys, Schema)
+    assert t.keys.index('c') == 2
+    assert t.dtypes['a'] == np.arange(3).dtype
+
+    t.del_column('a')
+    assert t.keys == ['b', 'c']
+    assert t.keys.index('c') == 1
+    assert np.all(t.c.values == np.arange(3))
+
+    t.rename_column('b', 'd')
+    assert t.keys.index('d') == 0
+    assert 'b' not in t
+    assert t.schema.metadata == {'d': {'unit': 'EUR'}}
+
+    t.keys = ['x', 'y']
+    assert t.keys.index('y') == 1
+    assert t.schema.metadata == {}
+
+
+def test_schema_stack():
+    t = Table({'a': np.arange(3), 'b': np.arange(3)})
+    t1 = Table({'c': np.arange(2), 'a': np.arange(2)})
+    t1.schema.metadata['c'] = {'source': 'feed'}
+    t.stack(t1)
+
+    assert t.keys == ['a', 'b', 'c']
+    assert t.keys.index('c') == 2
+    assert t.schema.metadata['c'] == {'source': 'feed'}
+    assert np.all(t.c.index == np.array([0, 0, 0, 1, 1]))
+    assert np.all(t.a.values == np.array([0, 1, 2, 0, 1]))
+
+
+def test_schema_pickle():
+    t = Table({'a': np.arange(3)})
+    t.schema.metadata['a'] = {'unit': 'EUR'}
+    t = pickle.loads(pickle.dumps(t))
+
+    assert t.keys.index('a') == 0
+    assert t.schema.metadata == {'a': {'unit': 'EUR'}}
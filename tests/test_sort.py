@@ -30,3 +30,48 @@ def test_sort_1():
         [0, 1, 2, 5, 4, 3, 1, 2, 3, 4]
     ))
 
+
+
+def test_monotonic_order():
+    from gtable.lib import monotonic_order
+
+    def order(values):
+        o = monotonic_order(np.array(values))
+        return o['order'], o['strict']
+
+    assert order([1, 2, 3]) == ('asc', True)
+    assert order([1, 2, 2]) == ('asc', False)
+    assert order([3.0, 2.0, 1.0]) == ('desc', True)
+    assert order([1, 3, 2]) == (None, False)
+    assert order([1.0, np.nan, 2.0]) == (None, False)
+    assert order(['a', 'b', 'b']) == ('asc', False)
+    assert order(np.arange(3).astype('datetime64[s]')) == ('asc', True)
+
+
+def test_sort_order():
+    table = Table({'a': [3, 1, 2], 'b': [1, 2, 3]})
+    assert table.order('b') == {'order': 'asc', 'strict': True}
+    assert table.order('a') == {'order': None, 'strict': False}
+
+    table.sort_by('a')
+    assert table.keys.metadata['a']['sorted']['order'] == 'asc'
+    assert 'sorted' not in table.keys.metadata['b']
+
+    # The order is kept by filters and forgotten when the values change
+    assert table.filter(table.a > 1).order('a')['order'] == 'asc'
+    table.a = np.array([3, 2, 1])
+    assert table.order('a')['order'] == 'desc'
+
+
+def test_stack_order():
+    table = Table({'a': [1, 2, 3]})
+    table.sort_by('a')
+    bottom = Table({'a': [3, 4]})
+    bottom.sort_by('a')
+    table.stack(bottom)
+    assert table.keys.metadata['a']['sorted'] == {'order': 'asc',
+                                                  'strict': False}
+
+    table.stack(Table({'a': [0]}))
+    assert 'sorted' not in table.keys.metadata['a']
+    assert table.order('a')['order'] is None
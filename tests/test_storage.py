@@ -0,0 +1,37 @@
+from gtable import Table
+import numpy as np
+
+
+def test_save_open(tmpdir):
+    t = Table({'a': np.arange(100), 'b': np.arange(100.0)})
+    t.add_column('c', np.arange(50), index=np.arange(100) % 2)
+    t.add_column('d', np.array(['x', 'y']), align='bottom')
+    t.schema.metadata['a'] = {'unit': 'EUR'}
+    t.save(str(tmpdir.join('table')))
+
+    for mmap in [True, False]:
+        opened = Table.open(str(tmpdir.join('table')), mmap=mmap)
+
+        assert opened.keys == ['a', 'b', 'c', 'd']
+        assert opened.schema.metadata == {'a': {'unit': 'EUR'}}
+        assert len(opened) == 100
+        for k in t.keys:
+            assert np.all(opened[k] == t[k])
+            assert opened[k].dtype == t[k].dtype
+            assert np.all(opened.get(k).index == t.get(k).index)
+
+    assert np.all((opened.a + opened.c).values == np.arange(1, 100, 2) +
+                  np.arange(50))
+
+
+def test_open_copy_on_write(tmpdir):
+    t = Table({'a': np.arange(10)})
+    t.save(str(tmpdir))
+
+    opened = Table.open(str(tmpdir))
+    opened.sort_by('a')
+    opened['a'][:] = 0
+    opened.stack(Table({'a': np.arange(2)}))
+
+    assert len(opened) == 12
+    assert np.all(Table.open(str(tmpdir))['a'] == np.arange(10))
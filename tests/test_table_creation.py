@@ -111,3 +111,40 @@ def test_simple_table():
     t.rename_column('a', 'c')
 
     assert t.keys == ['c', 'b']
+
+
+def test_index_view():
+    t = Table({'a': np.arange(4), 'b': np.arange(4)})
+    index = t.index
+
+    assert t.index is index
+    assert not index.flags.writeable
+
+    t.add_column('c', np.arange(2))
+    assert np.all(t.index == np.array([[1, 1, 1, 1],
+                                       [1, 1, 1, 1],
+                                       [1, 1, 0, 0]]))
+
+    t.del_column('a')
+    assert t.index.shape == (2, 4)
+
+    t.b.reorder(np.array([3, 2, 1, 0]))
+    c = t.c
+    c.reorder(np.array([3, 2, 1, 0]))
+    assert np.all(t.index[1] == np.array([0, 0, 1, 1]))
+
+
+def test_reorder_own_bitmap():
+    t = Table({'a': np.arange(4)})
+    t.add_column('c', np.arange(2))
+    t.d = t.c * 2
+    t.add_column('e', t.c.values, index=t.c.bitmap)
+
+    t.c.reorder(np.array([3, 2, 1, 0]))
+    assert np.all(t.c.index == np.array([0, 0, 1, 1]))
+    assert np.all(t.d.index == np.array([1, 1, 0, 0]))
+    assert np.all(t.e.index == np.array([1, 1, 0, 0]))
+
+    f = t.filter(t.a >= 0)
+    f.d.reorder(np.array([3, 2, 1, 0]))
+    assert np.all(f.e.index == np.array([1, 1, 0, 0]))